@@ -1,30 +1,35 @@
-from langgraph.prebuilt import create_react_agent
-from langgraph.checkpoint.memory import MemorySaver
+from services.checkpoints import make_checkpointer
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage
 from tools.mcp_bridge import designer_tools
 from database import log_agent_step
+from services import pending_actions
+from agents.graph import build_gated_agent
+from agents.runtime import ApprovalPolicy, resume_agent, run_agent
 import os
 from dotenv import load_dotenv
-import traceback
 import logging
 
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 
 llm = ChatOpenAI(model="gpt-4o", temperature=0.7)
-memory = MemorySaver()
+memory = make_checkpointer()
 
-# HITL Logic: Stop BEFORE any tool execution (we'll auto-resume non-save tools)
-agent_executor = create_react_agent(
-    llm, 
-    designer_tools, 
-    checkpointer=memory,
-    interrupt_before=["tools"]  # Must use node name, not tool name
+# Tools that wait for a human; design tools run without pausing
+APPROVAL_TOOLS = frozenset({"save_final_design"})
+
+POLICY = ApprovalPolicy(
+    agent="designer",
+    approval_tools=APPROVAL_TOOLS,
+    paused_message="⚠️ PAUSED: Design waiting for Human Approval.",
+    finished_message="✅ Designer finished.",
+    result_keys=pending_actions.DESIGN_RESULT_KEYS    # shown in the review modal
 )
 
+# HITL Logic: Stop only BEFORE save_final_design
+agent_executor = build_gated_agent(llm, designer_tools, APPROVAL_TOOLS, checkpointer=memory)
+
 async def run_designer_agent(lead_id: int, vibe: str, feedback: str = None, thread_id: str = None):
     """
     vibe: The initial style (e.g., 'Retro 80s')
@@ -41,8 +46,6 @@ async def run_designer_agent(lead_id: int, vibe: str, feedback: str = None, thre
     else:
         thread_id = str(lead_id)
     
-    config = {"configurable": {"thread_id": thread_id}}
-    
     if feedback:
         # REJECTION PATH: Fresh start with user's feedback incorporated
         log_agent_step(lead_id, "SYSTEM", f"🔄 User Rejected. Feedback: {feedback}")
@@ -55,7 +58,7 @@ async def run_designer_agent(lead_id: int, vibe: str, feedback: str = None, thre
         
         Follow this process:
         1. Call `generate_apparel_image` with a NEW creative prompt addressing the feedback.
-        2. Call `check_copyright_safety` - if UNSAFE, regenerate.
+        2. Call `check_copyright_safety` - if UNSAFE, regenerate. (Steps 2-4 can go in one turn.)
         3. Call `extract_color_palette` to identify the colors used.
         4. Call `calculate_manufacturing_cost` with the image URL.
         5. Call `recommend_print_technique` based on colors and assumed 100 qty.
@@ -79,6 +82,8 @@ async def run_designer_agent(lead_id: int, vibe: str, feedback: str = None, thre
         - Call `check_copyright_safety` with the generated image URL.
         - If UNSAFE, regenerate with `generate_apparel_image` using a modified prompt.
         
+        STEPS 2-4 only need the image URL: request them together in ONE turn (parallel tool calls).
+        
         STEP 3: COLOR ANALYSIS
         - Call `extract_color_palette` to identify dominant colors and get hex codes.
         - Note the color count for printing decisions.
@@ -107,73 +112,9 @@ async def run_designer_agent(lead_id: int, vibe: str, feedback: str = None, thre
         Begin with Step 1 now. Execute all steps in order.
         """
 
-    try:
-        # Run the Agent
-        logger.info(f"Starting designer for lead {lead_id}, thread {thread_id}")
-        
-        async for event in agent_executor.astream(
-            {"messages": [HumanMessage(content=query)]}, 
-            config=config
-        ):
-            for node, values in event.items():
-                if "messages" in values:
-                    last_msg = values["messages"][-1]
-                    if last_msg.type == "ai" and last_msg.content:
-                        log_agent_step(lead_id, "THOUGHT", last_msg.content)
-        
-        # Auto-resume loop for non-save tools
-        max_iterations = 15
-        for iteration in range(max_iterations):
-            state = agent_executor.get_state(config)
-            logger.info(f"Iteration {iteration + 1}, state.next: {state.next}")
-            
-            if not state.next:
-                log_agent_step(lead_id, "SYSTEM", "✅ Designer finished.")
-                return "Done"
-            
-            # Get pending tool calls
-            last_message = state.values["messages"][-1]
-            
-            tool_calls = []
-            if hasattr(last_message, 'tool_calls') and last_message.tool_calls:
-                tool_calls = last_message.tool_calls
-            elif hasattr(last_message, 'additional_kwargs'):
-                tool_calls = last_message.additional_kwargs.get('tool_calls', [])
-            
-            if not tool_calls:
-                break
-            
-            # Extract tool name
-            first_call = tool_calls[0]
-            if isinstance(first_call, dict):
-                tool_name = first_call.get('function', {}).get('name') or first_call.get('name', 'unknown')
-            else:
-                tool_name = getattr(first_call, 'name', 'unknown')
-            
-            logger.info(f"Pending tool: {tool_name}")
-            
-            # PAUSE for save_final_design (requires human approval)
-            if tool_name == "save_final_design":
-                log_agent_step(lead_id, "SYSTEM", "⚠️ PAUSED: Design waiting for Human Approval.")
-                return "Waiting for Approval"
-            
-            # AUTO-RESUME for other tools
-            log_agent_step(lead_id, "TOOL", f"🔧 Executing: {tool_name}")
-            async for event in agent_executor.astream(None, config=config):
-                for node, values in event.items():
-                    if "messages" in values:
-                        last_msg = values["messages"][-1]
-                        if last_msg.type == "ai" and last_msg.content:
-                            log_agent_step(lead_id, "THOUGHT", last_msg.content)
-                        elif last_msg.type == "tool":
-                            result = str(last_msg.content)[:300] + "..." if len(str(last_msg.content)) > 300 else str(last_msg.content)
-                            log_agent_step(lead_id, "TOOL_RESULT", f"Result: {result}")
-        
-        log_agent_step(lead_id, "SYSTEM", "✅ Designer finished.")
-        return "Done"
-        
-    except Exception as e:
-        error_msg = f"❌ Error: {str(e)}"
-        logger.error(f"Designer error: {traceback.format_exc()}")
-        log_agent_step(lead_id, "SYSTEM", error_msg)
-        return "Error"
\ No newline at end of file
+    logger.info("Starting designer for lead %s, thread %s", lead_id, thread_id)
+    return await run_agent(agent_executor, POLICY, lead_id, thread_id, query)
+
+async def resume_designer(lead_id: int, thread_id: str):
+    """Continues the paused run after the customer approved the design (saves it)."""
+    return await resume_agent(agent_executor, POLICY, lead_id, thread_id)
@@ -0,0 +1,74 @@
+"""
+Tool-calling agent graph that only pauses for approval-gated tools.
+
+The agents used create_react_agent(interrupt_before=["tools"]), which stops
+and checkpoints before *every* tool turn; the Python loops then read the
+state back and resumed unless the turn was a save_*. That was 6-10
+pause / get_state / resume cycles per run for tools nobody reviews.
+
+Here the model's tool calls are routed by name:
+- ungated calls go to "tools" (one Send per call, so a turn's calls run
+  concurrently) and the graph carries on without stopping
+- a turn made only of gated calls goes to "approval", the single node the
+  graph is compiled to interrupt before; resuming it (astream(None)) runs them
+- a gated call proposed alongside ungated ones is answered by "defer" with a
+  note to re-propose it once the other results are in, so a save is never
+  approved on arguments that predate the analysis it depends on
+"""
+from langchain_core.messages import AIMessage, ToolMessage
+from langgraph.graph import StateGraph, END
+from langgraph.prebuilt.chat_agent_executor import AgentState
+from langgraph.prebuilt.tool_node import ToolCallWithContext, ToolNode
+from langgraph.types import Send
+
+APPROVAL_NODE = "approval"
+
+# Graph steps per run (model turns + tool steps); a whole run is now one invocation
+RECURSION_LIMIT = 60
+
+DEFERRED_MESSAGE = (
+    "Not executed: {name} needs human approval and was requested together with other tools. "
+    "Review their results, then call {name} again on its own."
+)
+
+
+def build_gated_agent(llm, tools: list, approval_tools: set, checkpointer):
+    """
+    Compiled graph with the create_react_agent interface (astream / get_state /
+    update_state, {"messages": [...]} state) that interrupts only before approval_tools.
+    """
+    model = llm.bind_tools(tools)
+
+    async def call_model(state: AgentState) -> dict:
+        response = await model.ainvoke(state["messages"])
+        return {"messages": [response]}
+
+    def defer(call: dict) -> dict:
+        return {"messages": [ToolMessage(
+            content=DEFERRED_MESSAGE.format(name=call["name"]), name=call["name"], tool_call_id=call["id"]
+        )]}
+
+    def route_tool_calls(state: AgentState):
+        last_message = state["messages"][-1]
+        if not isinstance(last_message, AIMessage) or not last_message.tool_calls:
+            return END
+        ungated = [c for c in last_message.tool_calls if c["name"] not in approval_tools]
+        if not ungated:
+            return APPROVAL_NODE
+        return [
+            Send("tools", ToolCallWithContext(__type="tool_call_with_context", tool_call=call, state=state))
+            for call in ungated
+        ] + [Send("defer", call) for call in last_message.tool_calls if call["name"] in approval_tools]
+
+    workflow = StateGraph(AgentState)
+    workflow.add_node("agent", call_model)
+    workflow.add_node("tools", ToolNode(tools))
+    workflow.add_node("defer", defer)
+    workflow.add_node(APPROVAL_NODE, ToolNode(tools))
+    workflow.set_entry_point("agent")
+    workflow.add_conditional_edges("agent", route_tool_calls, ["tools", "defer", APPROVAL_NODE, END])
+    for node in ("tools", "defer", APPROVAL_NODE):
+        workflow.add_edge(node, "agent")
+
+    # HITL: the only pause is before a turn of approval-gated tools
+    return workflow.compile(checkpointer=checkpointer, interrupt_before=[APPROVAL_NODE])
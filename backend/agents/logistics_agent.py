@@ -1,47 +1,56 @@
-from langgraph.prebuilt import create_react_agent
-from langgraph.checkpoint.memory import MemorySaver
+from services.checkpoints import make_checkpointer
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage
 from tools.mcp_bridge import logistics_tools
 from database import log_agent_step
+from agents.graph import build_gated_agent
+from agents.runtime import ApprovalPolicy, resume_agent, run_agent
 import os
+import threading
+import weakref
 from dotenv import load_dotenv
 
 load_dotenv()
 
 llm = ChatOpenAI(model="gpt-4o", temperature=0)
-memory = MemorySaver()
+memory = make_checkpointer()
 
-# HITL: Interrupt before executing tools to allow human review
-# Must use node name "tools", not specific tool name
-agent_executor = create_react_agent(
-    llm, 
-    logistics_tools, 
-    checkpointer=memory,
-    interrupt_before=["tools"]
-)
+# Only the final plan waits for a human; other tools run without pausing
+APPROVAL_TOOLS = frozenset({"save_logistics_plan"})
+
+# HITL: the graph interrupts only before save_logistics_plan
+agent_executor = build_gated_agent(llm, logistics_tools, APPROVAL_TOOLS, checkpointer=memory)
+
+# One runner per thread: the background loop and approval never resume the same checkpoint twice.
+# Weak values: a lock lives only while a runner holds it, so rerun thread ids don't pile up.
+_thread_locks: "weakref.WeakValueDictionary[str, threading.Lock]" = weakref.WeakValueDictionary()
+_thread_locks_guard = threading.Lock()
+
+def thread_lock(thread_id: str) -> threading.Lock:
+    with _thread_locks_guard:
+        return _thread_locks.setdefault(thread_id, threading.Lock())
 
 async def run_logistics_agent(lead_id: int, customer_zip: str, order_qty: int, sku: str):
-    config = {"configurable": {"thread_id": str(lead_id)}}
+    thread_id = str(lead_id)
     
     log_agent_step(lead_id, "SYSTEM", f"🚚 Logistics Agent Started. SKU: {sku}")
 
     query = f"""
-    You are a Supply Chain Commander - an advanced logistics AI. 
+    You are a Supply Chain Commander - an advanced logistics AI. Lead ID: {lead_id}.
     Goal: Route {order_qty} units of '{sku}' to Customer ZIP {customer_zip}.
     
     EXECUTE THIS MULTI-STEP ANALYSIS:
+    (Steps 1-3 are independent lookups: request all three tool calls together in your FIRST turn.)
     
     1. INVENTORY CHECK: 
        - Call `scrape_supplier_inventory` to find stock levels at warehouses (NJ, TX, CA).
        - IMPORTANT: If total inventory is less than {order_qty}, you MUST still proceed to step 7 and save a plan with status "INSUFFICIENT_STOCK".
     
     2. RISK ASSESSMENT:
-       - Call `check_weather_risk` for warehouses with stock (use their ZIP codes: NJ=07001, TX=78701, CA=90001).
+       - Call `check_weather_risk_batch` ONCE with the ZIP codes of all warehouses (NJ=07001, TX=78701, CA=90001).
        - If CRITICAL weather, flag that warehouse as HIGH RISK.
     
     3. CAPACITY ANALYSIS:
-       - Call `check_factory_load` for factories: FACTORY_TX, FACTORY_NJ, FACTORY_CA.
+       - Call `check_all_factory_loads` ONCE to get every factory's backlog (least loaded first).
        - If >3 days backlog, consider alternative factories.
     
     4. SHIPPING OPTIMIZATION:
@@ -73,27 +82,10 @@ async def run_logistics_agent(lead_id: int, customer_zip: str, order_qty: int, s
     - `save_logistics_plan` is your FINAL action. Stop immediately after calling it.
     """
     
-    async for event in agent_executor.astream(
-        {"messages": [HumanMessage(content=query)]}, 
-        config=config
-    ):
-        for node, values in event.items():
-            if "messages" in values:
-                last_msg = values["messages"][-1]
-                if last_msg.type == "ai":
-                     log_agent_step(lead_id, "THOUGHT", last_msg.content)
-    
-    # Check for Pause (HITL)
-    state = agent_executor.get_state(config)
-    if state.next:
-        log_agent_step(lead_id, "SYSTEM", "⚠️ PAUSED: High-Stakes Plan needs Approval.")
-        return "Waiting for Approval"
-
-    return "Done"
+    return await _execute_logistics_loop(lead_id, query, thread_id, "⚠️ PAUSED: High-Stakes Plan needs Approval.")
 
 async def run_logistics_agent_with_feedback(lead_id: int, feedback: str, thread_id: str, context: dict = None):
     """Runs the logistics agent with rejection feedback for regeneration."""
-    config = {"configurable": {"thread_id": thread_id}}
     
     log_agent_step(lead_id, "SYSTEM", f"🔄 Regenerating Plan with Feedback...")
     
@@ -103,7 +95,7 @@ async def run_logistics_agent_with_feedback(lead_id: int, feedback: str, thread_
     customer_zip = context.get("customer_zip", "UNKNOWN") if context else "UNKNOWN"
 
     query = f"""
-    You are a Supply Chain Commander. The previous logistics plan was REJECTED.
+    You are a Supply Chain Commander. The previous logistics plan was REJECTED. Lead ID: {lead_id}.
     
     ORIGINAL ORDER DETAILS:
     - SKU: {sku}
@@ -123,20 +115,29 @@ async def run_logistics_agent_with_feedback(lead_id: int, feedback: str, thread_
     - carbon_kg: Estimated carbon (or 0.0)
     """
     
-    async for event in agent_executor.astream(
-        {"messages": [HumanMessage(content=query)]}, 
-        config=config
-    ):
-        for node, values in event.items():
-            if "messages" in values:
-                last_msg = values["messages"][-1]
-                if last_msg.type == "ai":
-                     log_agent_step(lead_id, "THOUGHT", last_msg.content)
-    
-    # Check for Pause (HITL)
-    state = agent_executor.get_state(config)
-    if state.next:
-        log_agent_step(lead_id, "SYSTEM", "⚠️ PAUSED: Revised Plan needs Approval.")
-        return "Waiting for Approval"
-
-    return "Done"
+    return await _execute_logistics_loop(lead_id, query, thread_id, "⚠️ PAUSED: Revised Plan needs Approval.")
+
+
+async def _execute_logistics_loop(lead_id: int, query: str, thread_id: str, paused_message: str):
+    """
+    Runs the agent in the background until it pauses at save_logistics_plan
+    (or finishes), so progress never depends on the plan poller.
+    """
+    lock = thread_lock(thread_id)
+    if not lock.acquire(blocking=False):
+        log_agent_step(lead_id, "SYSTEM", "⚠️ Logistics run already in progress for this thread.")
+        return "Busy"
+    try:
+        return await run_agent(agent_executor, _policy(paused_message), lead_id, thread_id, query)
+    finally:
+        lock.release()
+
+
+def _policy(paused_message: str) -> ApprovalPolicy:
+    return ApprovalPolicy(agent="logistics", approval_tools=APPROVAL_TOOLS, paused_message=paused_message,
+                          finished_message="✅ Logistics agent finished.")
+
+
+async def resume_logistics_agent(lead_id: int, thread_id: str):
+    """Continues the paused run after a human approved the plan; the caller holds thread_lock(thread_id)."""
+    return await resume_agent(agent_executor, _policy("⚠️ PAUSED: Plan needs Approval."), lead_id, thread_id)
@@ -0,0 +1,207 @@
+"""
+Shared run loop for the Scout, Designer and Logistics agents.
+
+Each agent module used to carry its own copy of the astream -> get_state ->
+pause-or-resume loop, with its own truncation length, iteration cap, logging
+and error handling, so a limit or fix landed in one agent and not the others.
+Now an agent declares an ApprovalPolicy (which tools wait for a human and how
+its pauses are reported) and calls run_agent(), and the approval endpoints
+continue a paused run with resume_agent(). Both apply, to every segment:
+- a per-step timeout (no single model call or tool step may hang the run)
+- a total-run deadline
+- a token and USD budget (model usage plus generated images)
+- step-latency instrumentation (RunStats, logged when the run stops) and the
+  per-call accounting in services/metrics.py
+Limits come from the environment so they can be tuned without a deploy.
+"""
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+
+from langchain_core.messages import HumanMessage
+
+from agents.graph import RECURSION_LIMIT
+from database import log_agent_step
+from services import metrics, pending_actions, run_registry, tracing
+
+logger = logging.getLogger(__name__)
+
+AGENT_STEP_TIMEOUT = float(os.environ.get("AGENT_STEP_TIMEOUT", "120"))      # seconds per graph step
+AGENT_RUN_DEADLINE = float(os.environ.get("AGENT_RUN_DEADLINE", "600"))      # seconds per run
+AGENT_TOKEN_BUDGET = int(os.environ.get("AGENT_TOKEN_BUDGET", "200000"))     # input + output tokens per run
+AGENT_COST_BUDGET_USD = float(os.environ.get("AGENT_COST_BUDGET_USD", "1.00"))
+
+RESULT_PREVIEW_CHARS = 300
+
+# run_agent outcomes
+DONE, WAITING, TIMEOUT, OVER_BUDGET, ERROR = "Done", "Waiting for Approval", "Timeout", "Over Budget", "Error"
+
+
+@dataclass(slots=True, frozen=True)
+class ApprovalPolicy:
+    """Which tools pause for a human, and how an agent's pauses are recorded and reported."""
+    agent: str                              # pending_actions key: "scout", "designer", "logistics"
+    approval_tools: frozenset
+    paused_message: str
+    finished_message: str = "✅ Agent finished."
+    result_keys: dict | None = None         # tool results stored with the pending action
+
+    def is_gated(self, tool_name: str) -> bool:
+        return tool_name in self.approval_tools
+
+
+@dataclass(slots=True)
+class RunLimits:
+    step_timeout: float = AGENT_STEP_TIMEOUT
+    run_deadline: float = AGENT_RUN_DEADLINE
+    token_budget: int = AGENT_TOKEN_BUDGET
+    cost_budget_usd: float = AGENT_COST_BUDGET_USD
+
+
+@dataclass(slots=True)
+class RunStats:
+    """Per-step wall time (graph node, seconds) of one run."""
+    steps: list = field(default_factory=list)
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def by_node(self) -> dict:
+        totals = {}
+        for node, seconds in self.steps:
+            count, total = totals.get(node, (0, 0.0))
+            totals[node] = (count + 1, total + seconds)
+        return totals
+
+    def summary(self, usage: dict) -> str:
+        nodes = ", ".join(f"{node} {count}x {total:.1f}s" for node, (count, total) in self.by_node().items())
+        images = f", {usage['images']} images" if usage["images"] else ""
+        return (f"📊 {len(self.steps)} steps in {self.elapsed:.1f}s ({nodes}); "
+                f"{usage['input_tokens'] + usage['output_tokens']:,} tokens{images} (${usage['cost_usd']:.3f})")
+
+
+def _log_messages(lead_id: int, policy: ApprovalPolicy, messages: list):
+    # A tools step carries one ToolMessage per call in the turn
+    for msg in messages:
+        if msg.type == "ai":
+            if msg.content:
+                log_agent_step(lead_id, "THOUGHT", msg.content)
+            tool_names = [c["name"] for c in msg.tool_calls if not policy.is_gated(c["name"])]
+            if tool_names:
+                log_agent_step(lead_id, "TOOL", f"🔧 Executing: {', '.join(tool_names)}")
+        elif msg.type == "tool":
+            result = str(msg.content)
+            if len(result) > RESULT_PREVIEW_CHARS:
+                result = result[:RESULT_PREVIEW_CHARS] + "..."
+            log_agent_step(lead_id, "TOOL_RESULT", f"{msg.name}: {result}")
+
+
+async def run_agent(executor, policy: ApprovalPolicy, lead_id: int, thread_id: str, query: str,
+                    limits: RunLimits = None) -> str:
+    """
+    Runs `query` on the agent's thread until it pauses before an approval-gated
+    tool or finishes, recording the outcome in pending_actions. Returns one of
+    DONE, WAITING, TIMEOUT, OVER_BUDGET or ERROR.
+    """
+    pending_actions.start(policy.agent, lead_id, thread_id)
+    inputs = {"messages": [HumanMessage(content=query)]}
+    return await _segment("agent.run", executor, policy, lead_id, thread_id, inputs, limits)
+
+
+async def resume_agent(executor, policy: ApprovalPolicy, lead_id: int, thread_id: str,
+                       limits: RunLimits = None) -> str:
+    """
+    Continues a run paused before a gated tool once a human approved it (the
+    gated call executes, then the agent goes on until it finishes or pauses
+    again). Recorded as its own agent_runs row. Returns a run_agent outcome.
+
+    The caller has claimed the pending action (WAITING -> RUNNING); if the
+    resume fails or is cancelled it is reopened, so the approval can be retried.
+    """
+    try:
+        outcome = await _segment("agent.resume", executor, policy, lead_id, thread_id, None, limits)
+    except BaseException:
+        pending_actions.reopen(policy.agent, lead_id, thread_id)
+        raise
+    if outcome not in (DONE, WAITING):
+        pending_actions.reopen(policy.agent, lead_id, thread_id)
+    return outcome
+
+
+async def _segment(span_name: str, executor, policy: ApprovalPolicy, lead_id: int, thread_id: str, inputs,
+                   limits: RunLimits = None) -> str:
+    with tracing.span(span_name, "agent", agent=policy.agent, lead_id=lead_id, thread_id=thread_id) as run_span:
+        outcome = await _run(executor, policy, lead_id, thread_id, inputs, limits or RunLimits(), run_span)
+        run_registry.set_status(policy.agent, lead_id, thread_id, outcome)
+        if run_span is not None:
+            run_span.set(outcome=outcome)
+        return outcome
+
+
+async def _run(executor, policy: ApprovalPolicy, lead_id: int, thread_id: str, inputs,
+               limits: RunLimits, run_span) -> str:
+    recorder = metrics.RunRecorder(policy.agent, lead_id, thread_id)
+    callbacks = [recorder, tracing.SpanCallback(run_span)]
+    config = {"configurable": {"thread_id": thread_id}, "recursion_limit": RECURSION_LIMIT, "callbacks": callbacks}
+    stats = RunStats()
+    deadline = time.monotonic() + limits.run_deadline
+
+    # Ungated tools run inside the graph; the stream ends at the approval interrupt.
+    # Its tasks (and the tool threads) inherit the recorder and the run span.
+    # inputs=None continues from the checkpoint (the approved gated call runs first).
+    with recorder.active():
+        stream = executor.astream(inputs, config=config).__aiter__()
+        outcome = None
+        try:
+            while outcome is None:
+                step_started = time.perf_counter()
+                timeout = min(limits.step_timeout, deadline - time.monotonic())
+                try:
+                    event = await asyncio.wait_for(stream.__anext__(), timeout=max(timeout, 0))
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    limit = "run deadline" if deadline - time.monotonic() <= 0 else "step timeout"
+                    log_agent_step(lead_id, "SYSTEM", f"⏱️ Stopped: {limit} exceeded.")
+                    outcome = TIMEOUT
+                    break
+
+                for node, values in event.items():
+                    if node.startswith("__"):    # "__interrupt__" marks the pause, not a step
+                        continue
+                    stats.steps.append((node, time.perf_counter() - step_started))
+                    logger.debug("%s lead %s: %s step %.3fs", policy.agent, lead_id, node, stats.steps[-1][1])
+                    _log_messages(lead_id, policy, values.get("messages", []) if isinstance(values, dict) else [])
+
+                tokens, cost = recorder.input_tokens + recorder.output_tokens, recorder.cost_usd
+                if tokens > limits.token_budget or cost > limits.cost_budget_usd:
+                    log_agent_step(lead_id, "SYSTEM", f"💸 Stopped: budget exceeded ({tokens:,} tokens, ${cost:.2f}).")
+                    outcome = OVER_BUDGET
+
+            if outcome is None:
+                # Records the pending call (and any tool results the review UI shows) for the poller
+                calls = pending_actions.record_interrupt(
+                    policy.agent, lead_id, thread_id, executor, policy.approval_tools, policy.result_keys
+                )
+                outcome = WAITING if calls else DONE
+                log_agent_step(lead_id, "SYSTEM", policy.paused_message if calls else policy.finished_message)
+                return outcome
+
+            pending_actions.finish(policy.agent, lead_id, thread_id, outcome)
+            return outcome
+
+        except Exception as e:
+            logger.exception("%s agent error", policy.agent)
+            log_agent_step(lead_id, "SYSTEM", f"❌ Error: {str(e)}")
+            outcome = ERROR
+            pending_actions.finish(policy.agent, lead_id, thread_id, outcome)
+            return outcome
+        finally:
+            await stream.aclose()
+            summary = stats.summary(recorder.finish(outcome or ERROR))
+            logger.info("%s run for lead %s: %s", policy.agent, lead_id, summary)
+            log_agent_step(lead_id, "SYSTEM", summary)
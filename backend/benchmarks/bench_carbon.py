@@ -0,0 +1,114 @@
+"""
+Throughput of the carbon ledger (services/carbon.py).
+
+Generates N synthetic shipments (3 warehouses -> random US ZIPs, mixed modes,
+spread over 24 months and 500 customers) in a scratch database and times:
+- per-shipment calculation (the old calculate_carbon_footprint path, sampled)
+  vs compute_emissions over the whole batch
+- record_shipments (ledger insert + incremental rollups)
+- an ESG report from the rollups vs the same GROUP BY over the raw ledger
+
+Run from backend/:
+    python -m benchmarks.bench_carbon [--shipments 1000000 --batch 50000]
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+from services import carbon, geo, zip_index
+
+WAREHOUSE_ZIPS = ["07001", "78701", "90001"]
+
+
+def synthetic_shipments(n: int, rng: np.random.Generator) -> list:
+    all_zips = zip_index.get_index().zips
+    dest = rng.choice(all_zips, n)
+    origin = rng.choice(len(WAREHOUSE_ZIPS), n)
+    modes = rng.choice(list(carbon.EMISSION_FACTORS), n, p=[0.8, 0.1, 0.07, 0.03])
+    weight = np.round(rng.gamma(2.0, 25.0, n), 1)
+    day = rng.integers(0, 730, n)
+    customer = rng.integers(0, 500, n)
+    dates = np.datetime64("2025-01-01") + day
+    return [
+        {
+            "origin_zip": WAREHOUSE_ZIPS[origin[i]],
+            "warehouse": WAREHOUSE_ZIPS[origin[i]],
+            "dest_zip": f"{dest[i]:05d}",
+            "weight_lbs": float(weight[i]),
+            "shipping_mode": str(modes[i]),
+            "customer": f"customer-{customer[i]}",
+            "shipped_on": str(dates[i])
+        }
+        for i in range(n)
+    ]
+
+
+def per_shipment(shipment: dict) -> float:
+    """Same arithmetic as estimate_carbon_footprint, one shipment at a time."""
+    a = zip_index.lookup_coords(shipment["origin_zip"])
+    b = zip_index.lookup_coords(shipment["dest_zip"])
+    factor = carbon.EMISSION_FACTORS.get(shipment["shipping_mode"], carbon.EMISSION_FACTORS["ground"])
+    return shipment["weight_lbs"] * carbon.LBS_TO_TONS * geo.distance_km(a, b) * factor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shipments", type=int, default=1_000_000)
+    parser.add_argument("--batch", type=int, default=50_000, help="shipments per record_shipments call")
+    parser.add_argument("--sample", type=int, default=5_000, help="shipments timed on the per-shipment path")
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    shipments = synthetic_shipments(args.shipments, rng)
+    scratch = tempfile.mkdtemp()
+    carbon.DB_NAME = os.path.join(scratch, "carbon_bench.db")
+
+    print(f"=== {args.shipments:,} shipments ===")
+    sample = shipments[:args.sample]
+    start = time.perf_counter()
+    scalar = np.array([per_shipment(s) for s in sample])
+    per_call = (time.perf_counter() - start) / len(sample)
+
+    start = time.perf_counter()
+    _, batch_kg, _ = carbon.compute_emissions(
+        [s["origin_zip"] for s in shipments], [s["dest_zip"] for s in shipments],
+        [s["weight_lbs"] for s in shipments], [s["shipping_mode"] for s in shipments]
+    )
+    batch_time = time.perf_counter() - start
+    print(f"per-shipment calc:   {per_call * 1e6:8.1f} µs/shipment "
+          f"(~{per_call * args.shipments:6.1f} s for all, extrapolated from {len(sample):,})")
+    print(f"batch compute:       {batch_time / args.shipments * 1e6:8.2f} µs/shipment ({batch_time:6.2f} s total)")
+    print(f"max |batch - scalar| on the sample: {np.abs(batch_kg[:len(sample)] - scalar).max():.2e} kg")
+
+    start = time.perf_counter()
+    for i in range(0, len(shipments), args.batch):
+        carbon.record_shipments(shipments[i:i + args.batch])
+    record_time = time.perf_counter() - start
+    print(f"ledger + rollups:    {record_time / args.shipments * 1e6:8.2f} µs/shipment ({record_time:6.2f} s total)")
+
+    print("\n=== ESG report (group by customer) ===")
+    start = time.perf_counter()
+    rolled = carbon.report("customer")
+    rollup_ms = (time.perf_counter() - start) * 1000
+
+    conn = sqlite3.connect(carbon.DB_NAME)
+    start = time.perf_counter()
+    raw = conn.execute(
+        "SELECT customer, COUNT(*), SUM(carbon_kg) FROM carbon_ledger GROUP BY customer ORDER BY 3 DESC"
+    ).fetchall()
+    scan_ms = (time.perf_counter() - start) * 1000
+    conn.close()
+
+    print(f"from rollups:        {rollup_ms:8.1f} ms ({len(rolled['rows'])} rows)")
+    print(f"GROUP BY on ledger:  {scan_ms:8.1f} ms ({len(raw)} rows)")
+    drift = abs(rolled["total"]["carbon_kg"] - sum(r[2] for r in raw))
+    print(f"rollup vs ledger total drift: {drift:.3f} kg of {rolled['total']['carbon_kg']:,.0f} kg")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Backtest of services/forecasting.py on synthetic order history.
+
+Generates N SKUs of daily demand (level, trend, weekly pattern, Poisson noise,
+staggered launch dates), holds out the last --horizon days, and compares the
+vectorized Holt-Winters fit against the old random category forecast and a
+seasonal-naive baseline (same weekday last week).
+
+Run from backend/:
+    python -m benchmarks.bench_forecast [--skus 10000 --days 365 --horizon 28]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from services import forecasting
+
+
+def synthetic_history(n: int, days: int, rng: np.random.Generator):
+    level = rng.gamma(2.0, 15.0, n)                                   # Mean daily orders per SKU
+    trend = rng.normal(0, 0.002, n)                                   # Relative drift per day
+    weekly = 1 + rng.normal(0, 0.15, (n, 7))
+    weekly[:, 5:] *= rng.uniform(1.0, 1.5, (n, 1))                    # Weekend boost
+    t = np.arange(days)
+    rate = level[:, None] * np.maximum(1 + trend[:, None] * t, 0.2) * weekly[:, t % 7]
+
+    start = np.where(rng.random(n) < 0.2, rng.integers(0, days // 2, n), 0)  # 20% launched mid-year
+    rate[t[None, :] < start[:, None]] = 0
+    return rng.poisson(rate).astype(np.float64), start
+
+
+def old_method(n: int, horizon: int, rng: np.random.Generator) -> np.ndarray:
+    """The previous get_demand_forecast: fixed base x weekend boost x uniform(0.8, 1.2)."""
+    base = rng.choice(list(forecasting.CATEGORY_BASE.values()), n)
+    weekend = np.where(np.arange(horizon) % 7 >= 5, forecasting.WEEKEND_MULTIPLIER, 1.0)
+    return base[:, None] * weekend[None, :] * rng.uniform(0.8, 1.2, (n, horizon))
+
+
+def errors(pred: np.ndarray, actual: np.ndarray) -> tuple:
+    mae = np.abs(pred - actual).mean()
+    wape = np.abs(pred - actual).sum() / max(actual.sum(), 1e-9)
+    bias = (pred.sum() - actual.sum()) / max(actual.sum(), 1e-9)
+    return mae, wape, bias
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--skus", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--horizon", type=int, default=28)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    Y, start = synthetic_history(args.skus, args.days, rng)
+    train, actual = Y[:, :-args.horizon], Y[:, -args.horizon:]
+
+    t0 = time.perf_counter()
+    fit = forecasting.fit_holt_winters(train, start)
+    t1 = time.perf_counter()
+    hw, half = fit.forecast(args.horizon)
+    t2 = time.perf_counter()
+
+    # Seasonal naive: repeat the last observed week
+    last_week = train[:, -7:]
+    naive = last_week[:, np.arange(args.horizon) % 7]
+
+    print(f"=== Backtest: {args.skus:,} SKUs, {train.shape[1]} days of history, {args.horizon}-day holdout ===")
+    print(f"{'model':>16} | {'MAE':>8} | {'WAPE':>7} | {'bias':>7}")
+    for name, pred in (("old random", old_method(args.skus, args.horizon, rng)),
+                       ("seasonal naive", naive),
+                       ("holt-winters", hw)):
+        mae, wape, bias = errors(pred, actual)
+        print(f"{name:>16} | {mae:8.2f} | {wape:7.1%} | {bias:+7.1%}")
+
+    covered = ((actual >= hw - half) & (actual <= hw + half)).mean()
+    print(f"\n80% interval coverage: {covered:.1%}")
+    chosen = np.unique(fit.alpha, return_counts=True)
+    print("alpha chosen per SKU: " + ", ".join(f"{a:.1f}={c}" for a, c in zip(*chosen)))
+
+    print(f"\n=== Timing ===")
+    print(f"fit ({len(forecasting.PARAM_GRID)} parameter sets x {args.skus:,} SKUs): {(t1 - t0) * 1000:8.1f} ms")
+    print(f"forecast ({args.horizon} days):{'':>24}{(t2 - t1) * 1000:8.1f} ms")
+    print(f"per SKU:{'':>38}{(t1 - t0) / args.skus * 1e6:8.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Accuracy and throughput of services/geo.py against geopy's geodesic.
+
+Run from backend/:
+    python -m benchmarks.bench_geo [--pairs 20000]
+"""
+import argparse
+import time
+
+import numpy as np
+from geopy.distance import geodesic
+
+from services import geo
+
+# Continental US bounding box
+LAT_RANGE = (24.5, 49.5)
+LNG_RANGE = (-124.8, -66.9)
+
+
+def random_us_points(n: int, rng: np.random.Generator) -> np.ndarray:
+    lat = rng.uniform(*LAT_RANGE, n)
+    lng = rng.uniform(*LNG_RANGE, n)
+    return np.column_stack([lat, lng])
+
+
+def timed(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pairs", type=int, default=20000, help="number of random origin/destination pairs")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    origins = random_us_points(args.pairs, rng)
+    dests = random_us_points(args.pairs, rng)
+
+    # --- Accuracy (pairwise, geopy as ground truth) ---
+    reference = np.array([geodesic(a, b).miles for a, b in zip(origins, dests)])
+    vincenty = np.array([geo.vincenty_matrix(a, b)[0, 0] for a, b in zip(origins[:2000], dests[:2000])])
+    haversine = np.diag(geo.haversine_matrix(origins[:2000], dests[:2000]))
+
+    print(f"=== Accuracy vs geopy.geodesic ({len(vincenty)} US pairs) ===")
+    for name, values in (("vincenty", vincenty), ("haversine", haversine)):
+        err = np.abs(values - reference[:len(values)])
+        rel = err / np.maximum(reference[:len(values)], 1e-9)
+        print(f"{name:>10}: max abs {err.max() * 1609.344:10.4f} m | mean rel {rel.mean():.2e} | max rel {rel.max():.2e}")
+
+    # --- Throughput ---
+    n = args.pairs
+    side = int(np.sqrt(n))
+    grid_o, grid_d = origins[:side], dests[:side]
+
+    results = [
+        ("geopy geodesic loop", n, timed(lambda: [geodesic(a, b).miles for a, b in zip(origins, dests)], repeat=1)),
+        ("vincenty matrix", side * side, timed(lambda: geo.vincenty_matrix(grid_o, grid_d))),
+        ("haversine matrix", side * side, timed(lambda: geo.haversine_matrix(grid_o, grid_d))),
+    ]
+
+    # Memoized pair lookups: 3 warehouses x 50 hot customer ZIPs, hit repeatedly
+    warehouses = [(40.57, -74.29), (30.26, -97.74), (33.97, -118.24)]
+    hot = [tuple(p) for p in origins[:50]]
+    geo._pair_miles.cache_clear()
+    lookups = [(w, c) for _ in range(200) for w in warehouses for c in hot]
+    results.append(("memoized distance_miles", len(lookups), timed(lambda: [geo.distance_miles(w, c) for w, c in lookups])))
+
+    print(f"\n=== Throughput ===")
+    baseline = results[0][1] / results[0][2]
+    for name, count, seconds in results:
+        rate = count / seconds
+        print(f"{name:>24}: {rate:14,.0f} pairs/s  ({count:,} pairs in {seconds * 1000:8.1f} ms, {rate / baseline:7.1f}x geopy)")
+
+
+if __name__ == "__main__":
+    main()
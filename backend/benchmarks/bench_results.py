@@ -0,0 +1,68 @@
+"""
+Cost of passing logistics results around as str(dict) + ast.literal_eval
+versus the typed objects in services/results.py.
+
+Run from backend/:
+    python -m benchmarks.bench_results [--n 20000]
+"""
+import argparse
+import ast
+import json
+import time
+
+from services.results import CarrierRate, RateComparison, ShippingQuote
+
+
+def timed(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def sample_quote() -> ShippingQuote:
+    return ShippingQuote(carrier="FedEx Ground", zone=6, miles=1423, cost=16.25, eta_days=4)
+
+
+def sample_rates() -> RateComparison:
+    rates = [
+        CarrierRate(carrier=c, service=s, price=p, days=d, carrier_logo="📦")
+        for c, s, p, d in (
+            ("USPS", "Priority Mail", 9.85, 3), ("USPS", "Ground Advantage", 7.40, 5),
+            ("FedEx", "Ground", 11.20, 4), ("FedEx", "2Day", 24.60, 2),
+            ("UPS", "Ground", 11.75, 4), ("UPS", "Next Day Air", 48.90, 1),
+        )
+    ]
+    return RateComparison(source="SIMULATED", rates=rates)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=20000, help="round trips per case")
+    args = parser.parse_args()
+    n = args.n
+
+    quote, rates = sample_quote(), sample_rates()
+    quote_dict, rates_dict = quote.to_dict(), rates.to_dict()
+
+    cases = [
+        # What optimize_split_shipment used to do for every leg
+        ("quote: str + literal_eval", lambda: [ast.literal_eval(str(quote_dict))["cost"] for _ in range(n)]),
+        ("quote: attribute access", lambda: [quote.cost for _ in range(n)]),
+        ("quote: to_json (tool boundary)", lambda: [quote.to_json() for _ in range(n)]),
+        # What /logistics-rates used to do per request
+        ("rates: str + literal_eval", lambda: [ast.literal_eval(str(rates_dict)) for _ in range(n)]),
+        ("rates: to_dict (endpoint)", lambda: [rates.to_dict() for _ in range(n)]),
+        ("rates: to_json + json.loads", lambda: [json.loads(rates.to_json()) for _ in range(n)]),
+    ]
+
+    print(f"=== {n:,} round trips per case ===")
+    for name, fn in cases:
+        seconds = timed(fn)
+        print(f"{name:>32}: {seconds / n * 1e6:8.2f} µs/op  ({n / seconds:12,.0f} ops/s)")
+
+
+if __name__ == "__main__":
+    main()
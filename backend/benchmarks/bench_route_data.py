@@ -0,0 +1,146 @@
+"""
+Load test for /logistics-route-data.
+
+Hammers the endpoint with concurrent requests and reports throughput and
+latency for three traffic shapes:
+- cold:        every request a different ZIP (cache misses)
+- warm:        a small set of hot ZIPs (cache hits, full body)
+- revalidate:  hot ZIPs sent with If-None-Match (304, no body)
+plus the server-side cost of one request with and without the payload cache,
+measured in-process so it isn't hidden behind HTTP client overhead.
+
+Run from backend/ against a running server:
+    python -m benchmarks.bench_route_data --url http://localhost:8000
+or let it start the app in-process (needs the usual .env / OPENAI_API_KEY):
+    python -m benchmarks.bench_route_data --concurrency 32 --requests 4000
+"""
+import argparse
+import asyncio
+import logging
+import socket
+import threading
+import time
+
+import httpx
+import numpy as np
+
+from services import zip_index
+
+
+def percentile(values, q) -> float:
+    return float(np.percentile(values, q)) * 1000 if values else 0.0
+
+
+async def run_load(url: str, params_list: list, concurrency: int, etags: dict = None) -> dict:
+    latencies, statuses = [], {}
+    queue = asyncio.Queue()
+    for params in params_list:
+        queue.put_nowait(params)
+
+    async def worker(client: httpx.AsyncClient):
+        while True:
+            try:
+                params = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            headers = {}
+            if etags is not None and params["customer_zip"] in etags:
+                headers["If-None-Match"] = etags[params["customer_zip"]]
+            start = time.perf_counter()
+            response = await client.get(f"{url}/logistics-route-data", params=params, headers=headers)
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "statuses": statuses
+    }
+
+
+def handler_cost(zips: list) -> None:
+    """Per-request server work: old path (build dict + JSON encode) vs cached bytes."""
+    import json
+    from fastapi.encoders import jsonable_encoder
+    from mcp_server import get_route_data
+    from services.route_cache import RoutePayloadCache
+
+    def old_path():
+        for z in zips:
+            json.dumps(jsonable_encoder(get_route_data(z, None)))
+
+    cache = RoutePayloadCache(get_route_data)
+    cache.warm(zips)
+
+    def cached_path():
+        for z in zips:
+            cache.get(z).matches(None)
+
+    for name, fn in (("rebuild + encode", old_path), ("cached payload", cached_path)):
+        start = time.perf_counter()
+        fn()
+        per_request = (time.perf_counter() - start) / len(zips) * 1e6
+        print(f"{name:>18}: {per_request:8.1f} µs/request")
+
+
+def start_server() -> str:
+    import uvicorn
+    from main import app
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(200):
+        try:
+            httpx.get(f"{url}/docs", timeout=1)
+            return url
+        except httpx.TransportError:
+            time.sleep(0.05)
+    raise RuntimeError("Server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="base URL of a running server (default: start one in-process)")
+    parser.add_argument("--requests", type=int, default=4000, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--hot", type=int, default=50, help="distinct ZIPs in the warm scenarios")
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    url = args.url or start_server()
+    for name in ("httpx", "httpcore"):
+        logging.getLogger(name).setLevel(logging.WARNING)  # Per-request logs would dominate the timings
+    rng = np.random.default_rng(args.seed)
+    all_zips = [f"{z:05d}" for z in zip_index.get_index().zips]
+
+    cold = [{"customer_zip": z} for z in rng.choice(all_zips, args.requests, replace=False)]
+    hot_zips = list(rng.choice(all_zips, args.hot, replace=False))
+    warm = [{"customer_zip": z} for z in rng.choice(hot_zips, args.requests)]
+
+    # Prime the hot set and collect ETags
+    etags = {z: httpx.get(f"{url}/logistics-route-data", params={"customer_zip": z}).headers["etag"] for z in hot_zips}
+
+    print(f"=== {args.requests:,} requests per scenario, concurrency {args.concurrency} ===")
+    for name, params_list, tags in (("cold", cold, None), ("warm", warm, None), ("revalidate", warm, etags)):
+        result = asyncio.run(run_load(url, params_list, args.concurrency, tags))
+        print(f"{name:>10}: {result['rps']:8.0f} req/s | p50 {result['p50']:6.1f} ms | "
+              f"p95 {result['p95']:6.1f} ms | p99 {result['p99']:6.1f} ms | {result['statuses']}")
+
+    print("\n=== Server-side cost per request (in-process) ===")
+    handler_cost([z for z in hot_zips for _ in range(20)])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Per-call time and allocations of the CPU-bound tools in mcp_server.py.
+
+Each case calls the tool the way the agent does (string in, string out) and
+reports the median / p95 wall time over --calls calls, plus, from one extra
+call under tracemalloc, the peak Python allocation and what was still held
+afterwards. Inputs come in several sizes:
+- images: generated flat-colour "designs" (N inks, anti-aliased edges, a
+  gradient band) at 256, 1024 and 2048 px, served from a local HTTP server
+  so calculate_manufacturing_cost / extract_color_palette run their usual
+  requests.get -> decode -> resize -> KMeans path
+- inventories: synthetic reports with 3, 30 and 300 warehouses (JSON and
+  the Python-repr form the LLM sometimes echoes), and portal HTML tables of
+  the same sizes for the scraper's parser
+- ZIPs: random pairs from the ZIP index, so distance caches see real misses
+
+Fully offline: the database, chroma_db and stock snapshots go to a scratch
+directory. --json writes the results for comparing runs.
+
+Run from backend/:
+    python -m benchmarks.bench_tools [--calls 50 --only palette,split --json tools.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMAGE_SIZES = (256, 1024, 2048)
+INVENTORY_SIZES = (3, 30, 300)
+
+
+# --- Fixtures ---
+
+def design_image(size: int, inks: int, rng: np.random.Generator) -> bytes:
+    """Flat ink regions on white, blurred edges and one gradient band, as PNG bytes."""
+    palette = rng.integers(0, 256, (inks, 3), dtype=np.uint8)
+    pixels = np.full((size, size, 3), 255, dtype=np.uint8)
+    for color in palette:
+        x, y = rng.integers(0, size * 3 // 4, 2)
+        w, h = rng.integers(size // 8, size // 3, 2)
+        pixels[y:y + h, x:x + w] = color
+    band = slice(size * 7 // 8, size)
+    pixels[band] = np.linspace(0, 255, size, dtype=np.uint8)[None, :, None]
+    img = Image.fromarray(pixels).filter(ImageFilter.GaussianBlur(1))
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def inventory_report(warehouses: int, rng: np.random.Generator) -> dict:
+    stock = {"New Jersey (NJ)": 150, "Texas (TX)": 100, "California (CA)": 50}
+    for i in range(len(stock), warehouses):
+        stock[f"Warehouse {i:03d}"] = int(rng.integers(0, 200))
+    return {"sku": "TSHIRT-BLK-M", "stock": stock, "reserved": {k: 0 for k in stock},
+            "scraped_at": "2026-01-01T00:00:00+00:00", "age_seconds": 0.0, "stale": False}
+
+
+def portal_html(stock: dict) -> str:
+    rows = "".join(f"<tr><td>{name}</td><td>{qty}</td><td>Active</td></tr>" for name, qty in stock.items())
+    return (f"<html><body><h1>Supplier Stock Portal</h1><table id='inventory-table'>"
+            f"<tr><th>Warehouse</th><th>Qty</th><th>Status</th></tr>{rows}</table></body></html>")
+
+
+def serve_images(images: dict) -> str:
+    """Serves {path: png bytes} on a free local port; returns the base URL."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = images.get(self.path)
+            self.send_response(200 if body else 404)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("Content-Length", str(len(body or b"")))
+            self.end_headers()
+            self.wfile.write(body or b"")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+# --- Measurement ---
+
+def measure(fn, inputs: list) -> dict:
+    """
+    Warms up on the first input, times the middle ones and profiles the last,
+    so cases with distinct inputs (fit-on-demand SKUs) never hit a stored result.
+    Stdout is muted: the tools print progress.
+    """
+    times = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn(inputs[0])  # Imports, lazy schema, first-use caches
+        for arg in inputs[1:-1]:
+            start = time.perf_counter()
+            fn(arg)
+            times.append((time.perf_counter() - start) * 1e3)
+
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        fn(inputs[-1])
+        _, peak = tracemalloc.get_traced_memory()
+        retained = sum(s.size_diff for s in tracemalloc.take_snapshot().compare_to(before, "filename"))
+        tracemalloc.stop()
+
+    times.sort()
+    return {
+        "calls": len(times),
+        "median_ms": round(statistics.median(times), 3),
+        "p95_ms": round(times[min(len(times) - 1, int(0.95 * len(times)))], 3),
+        "peak_kib": round(peak / 1024, 1),
+        "retained_kib": round(retained / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=30, help="timed calls per case (image cases use a third)")
+    parser.add_argument("--only", default="", help="comma-separated substrings of case names to run")
+    parser.add_argument("--json", default="", help="write results to this file")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(tempfile.mkdtemp(prefix="fresh_prints_bench_"))
+    os.environ.setdefault("OPENAI_API_KEY", "sk-offline")  # client is constructed at import, never called
+    with contextlib.redirect_stdout(io.StringIO()):
+        import database
+        import mcp_server
+        from services import inventory, zip_index
+        database.init_db()
+
+    all_zips = [f"{z:05d}" for z in zip_index.get_index().zips]
+    n_inputs = args.calls + 2  # + warm-up and profiled call
+    zip_pairs = [(all_zips[i], all_zips[j]) for i, j in rng.integers(0, len(all_zips), (n_inputs, 2))]
+    image_calls = max(3, args.calls // 3) + 2
+
+    images = {f"/{size}_{i}.png": design_image(size, 5, rng) for size in IMAGE_SIZES for i in range(image_calls)}
+    base_url = serve_images(images)
+
+    cases = []
+    for size in IMAGE_SIZES:
+        urls = [f"{base_url}/{size}_{i}.png" for i in range(image_calls)]
+        cases.append(("manufacturing_cost", f"{size}px", mcp_server.calculate_manufacturing_cost, urls))
+        cases.append(("color_palette", f"{size}px", mcp_server.extract_color_palette, urls))
+
+    for n in INVENTORY_SIZES:
+        report = inventory_report(n, rng)
+        total = sum(report["stock"].values())
+        as_json, as_repr = json.dumps(report), repr(report)
+        dests = [dest for _, dest in zip_pairs]
+        cases.append(("split_shipment", f"{n} wh",
+                      lambda dest, data=as_json, qty=total: mcp_server.optimize_split_shipment(qty, data, dest), dests))
+        cases.append(("parse_inventory json", f"{n} wh", mcp_server._parse_inventory_data, [as_json] * n_inputs))
+        cases.append(("parse_inventory repr", f"{n} wh", mcp_server._parse_inventory_data, [as_repr] * n_inputs))
+        cases.append(("parse_portal_html", f"{n} wh", inventory.parse_inventory_html,
+                      [portal_html(report["stock"])] * n_inputs))
+
+    cases.append(("scrape_supplier_inventory", "snapshot", mcp_server.scrape_supplier_inventory,
+                  ["TSHIRT-BLK-M"] * n_inputs))
+    cases.append(("shipping_rates", "random zips",
+                  lambda pair: mcp_server.calculate_shipping_rates(pair[0], pair[1], 25.0), zip_pairs))
+    cases.append(("carbon_footprint", "random zips",
+                  lambda pair: mcp_server.calculate_carbon_footprint(pair[0], pair[1], 25.0), zip_pairs))
+    cases.append(("route_data", "random zips", lambda pair: mcp_server.get_route_data(pair[1]), zip_pairs))
+    cases.append(("demand_forecast", "stored", lambda sku: mcp_server.get_demand_forecast(sku, 7),
+                  ["TSHIRT-BLK-M"] * n_inputs))
+    cases.append(("demand_forecast", "fit on demand", lambda sku: mcp_server.get_demand_forecast(sku, 7),
+                  [f"BENCH-{i}" for i in range(n_inputs)]))
+
+    only = [o.strip() for o in args.only.split(",") if o.strip()]
+    results = []
+    print(f"{'tool':<28}{'input':<16}{'calls':>6}{'median ms':>11}{'p95 ms':>10}{'peak KiB':>11}{'held KiB':>10}")
+    for name, label, fn, inputs in cases:
+        if only and not any(o in name for o in only):
+            continue
+        row = {"tool": name, "input": label, **measure(fn, inputs)}
+        results.append(row)
+        print(f"{name:<28}{label:<16}{row['calls']:>6}{row['median_ms']:>11.3f}{row['p95_ms']:>10.3f}"
+              f"{row['peak_kib']:>11.1f}{row['retained_kib']:>10.1f}")
+
+    if args.json:
+        with open(os.path.join(BACKEND_DIR, args.json) if not os.path.isabs(args.json) else args.json, "w") as f:
+            json.dump({"calls": args.calls, "seed": args.seed, "results": results}, f, indent=2)
+        print(f"\nwrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
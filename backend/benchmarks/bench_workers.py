@@ -0,0 +1,198 @@
+"""
+Throughput of `python main.py --workers N` as N grows.
+
+For each worker count in --workers this starts main.py in multi-worker mode
+(SQLite checkpoints, one leader for background jobs) as a subprocess in a
+fresh scratch directory, with OpenAI / Shippo / weather stubbed as in
+loadtest.py, then:
+1. drives --concurrency clients through a CPU-bound request mix for
+   --duration seconds: per-request ZIP routing and carbon estimates with
+   random ZIPs, batch routing of --batch-size orders, and demand forecasts
+   fitted on demand for new SKUs
+2. triggers --agent-runs designer / logistics runs and approves each one
+   when it pauses (the Scout searches the live web, which can't be stubbed
+   from outside the server process). Trigger, polls and approval go
+   through a connection pool the kernel spreads over the workers, so a run
+   is routinely paused in one worker and resumed in another - every run
+   finishing shows that no sticky routing is needed
+
+and reports requests/s, p50/p99 latency and the speedup over the first
+worker count. Scaling is bounded by the cores the box has (os.cpu_count()
+is printed): to see it linear up to 8 workers, run on 8+ idle cores.
+
+Run from backend/:
+    python -m benchmarks.bench_workers [--workers 1,2,4,8 --duration 20 --concurrency 64]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.loadtest import BACKEND_DIR, LoadTest, percentile, start_stubs
+from stubs.serving import free_port
+
+SKUS = ("TSHIRT-BLK-M", "TSHIRT-WHT-L", "HOODIE-NVY-XL")
+
+
+def prepare_workdir(agent_runs: int) -> tuple[str, list]:
+    """Scratch directory with a fresh database and leads for the agent runs."""
+    workdir = tempfile.mkdtemp(prefix="fresh_prints_workers_")
+    subprocess.run([sys.executable, "-c", "import database; database.init_db()"], cwd=workdir, check=True,
+                   env={**os.environ, "PYTHONPATH": BACKEND_DIR}, stdout=subprocess.DEVNULL)
+    jobs = []
+    conn = sqlite3.connect(os.path.join(workdir, "fresh_prints.db"))
+    for agent in ("designer", "logistics"):
+        for _ in range(agent_runs):
+            cursor = conn.execute("INSERT INTO leads (title, organization) VALUES (?, ?)",
+                                  (f"{agent} worker bench lead", "Bench University"))
+            jobs.append((agent, cursor.lastrowid))
+    conn.commit()
+    conn.close()
+    return workdir, jobs
+
+
+def start_server(workers: int, port: int, workdir: str, env: dict) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, os.path.join(BACKEND_DIR, "main.py"), "--workers", str(workers),
+         "--host", "127.0.0.1", "--port", str(port)],
+        cwd=workdir, env={**os.environ, **env}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+def wait_ready(base_url: str, server: subprocess.Popen, timeout: float = 180.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"server exited with {server.returncode}")
+        try:
+            if httpx.get(f"{base_url}/factory-load", timeout=5).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError("server did not come up")
+
+
+class Mix:
+    """The CPU-bound request mix; each call picks one request at random."""
+
+    def __init__(self, zips: list, batch_size: int, rng: random.Random):
+        self.zips = zips
+        self.batch_size = batch_size
+        self.rng = rng
+        self.forecasts = 0
+
+    def next(self) -> tuple[str, str, str, dict]:
+        """(route label, method, path, request kwargs)"""
+        zip_a, zip_b = self.rng.choice(self.zips), self.rng.choice(self.zips)
+        kind = self.rng.random()
+        if kind < 0.4:
+            return "POST /logistics-route-data", "POST", "/logistics-route-data", {"json": {"customer_zip": zip_a}}
+        if kind < 0.7:
+            return "POST /logistics-carbon", "POST", "/logistics-carbon", {
+                "json": {"origin_zip": zip_a, "dest_zip": zip_b, "weight_lbs": self.rng.uniform(5, 200)}}
+        if kind < 0.9:
+            orders = [{"order_id": f"o{i}", "customer_zip": self.rng.choice(self.zips),
+                       "qty": self.rng.randint(10, 200), "sku": self.rng.choice(SKUS)}
+                      for i in range(self.batch_size)]
+            return "POST /logistics-batch-route", "POST", "/logistics-batch-route", {"json": {"orders": orders}}
+        self.forecasts += 1
+        return "GET /demand-forecast/{sku}", "GET", f"/demand-forecast/BENCH-{os.getpid()}-{self.forecasts}", {}
+
+
+async def drive(base_url: str, mix: Mix, concurrency: int, duration: float) -> tuple[dict, dict, int]:
+    """Closed loop: `concurrency` clients each send the next request as soon as the last one returns."""
+    latencies, errors = {}, {}
+    deadline = time.perf_counter() + duration
+
+    async def client_loop(client: httpx.AsyncClient):
+        while time.perf_counter() < deadline:
+            route, method, path, kwargs = mix.next()
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                response.raise_for_status()
+            except httpx.HTTPError:
+                errors[route] = errors.get(route, 0) + 1
+            latencies.setdefault(route, []).append((time.perf_counter() - started) * 1000)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+    return latencies, errors, sum(len(v) for v in latencies.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4,8", help="comma-separated worker counts")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of measured load per worker count")
+    parser.add_argument("--warmup", type=float, default=5.0, help="seconds of unmeasured load first")
+    parser.add_argument("--concurrency", type=int, default=64, help="concurrent clients")
+    parser.add_argument("--batch-size", type=int, default=50, help="orders per batch-route request")
+    parser.add_argument("--agent-runs", type=int, default=3, help="runs per agent after the mix (0 to skip)")
+    parser.add_argument("--llm-latency-ms", type=float, default=100.0)
+    parser.add_argument("--image-latency-ms", type=float, default=200.0)
+    parser.add_argument("--search-latency-ms", type=float, default=50.0)
+    parser.add_argument("--shippo-latency-ms", type=float, default=50.0)
+    parser.add_argument("--timeout", type=float, default=300.0, help="per agent run limit, seconds")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    args.pollers, args.poll_interval = 0, 0.5  # LoadTest settings: no dashboard pollers here
+    worker_counts = [int(n) for n in args.workers.split(",") if n.strip()]
+
+    sys.path.insert(0, BACKEND_DIR)
+    from services import zip_index
+    zips = [f"{z:05d}" for z in zip_index.get_index().zips]
+    env = start_stubs(args)
+
+    print(f"{os.cpu_count()} CPUs; {args.concurrency} clients, {args.duration:.0f}s per worker count, "
+          f"batch {args.batch_size} orders, {args.agent_runs} runs per agent")
+    results = []
+    for workers in worker_counts:
+        workdir, jobs = prepare_workdir(args.agent_runs)
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        server = start_server(workers, port, workdir, env)
+        try:
+            wait_ready(base_url, server)
+            mix = Mix(zips, args.batch_size, random.Random(args.seed))
+            asyncio.run(drive(base_url, mix, args.concurrency, args.warmup))
+            latencies, errors, total = asyncio.run(drive(base_url, mix, args.concurrency, args.duration))
+
+            finished = 0
+            if jobs:
+                test = LoadTest(base_url, args)
+                asyncio.run(test.run(jobs))
+                finished = len(test.to_finish)
+        finally:
+            server.terminate()
+            server.wait(timeout=60)
+
+        all_latencies = [ms for values in latencies.values() for ms in values]
+        row = {"workers": workers, "rps": total / args.duration, "p50": percentile(all_latencies, 50),
+               "p99": percentile(all_latencies, 99), "errors": sum(errors.values()),
+               "runs": f"{finished}/{len(jobs)}", "latencies": latencies}
+        results.append(row)
+        print(f"  {workers} worker(s): {row['rps']:.1f} req/s, p50 {row['p50']:.0f} ms, p99 {row['p99']:.0f} ms, "
+              f"{row['errors']} errors, agent runs finished {row['runs']}  ({workdir})")
+
+    base = results[0]["rps"] or 1.0
+    print(f"\n{'workers':>8}{'req/s':>10}{'speedup':>9}{'ideal':>7}{'p50 ms':>9}{'p99 ms':>9}{'err':>6}{'runs':>8}")
+    for row in results:
+        print(f"{row['workers']:>8}{row['rps']:>10.1f}{row['rps'] / base:>9.2f}"
+              f"{row['workers'] / results[0]['workers']:>7.1f}{row['p50']:>9.0f}{row['p99']:>9.0f}"
+              f"{row['errors']:>6}{row['runs']:>8}")
+    print(f"\n{'endpoint p50 ms':<30}" + "".join(f"{row['workers']:>8}w" for row in results))
+    for route in sorted({route for row in results for route in row["latencies"]}):
+        print(f"{route:<30}" + "".join(f"{percentile(row['latencies'].get(route, []), 50):>9.0f}" for row in results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+End-to-end load test of the FastAPI app with every external service stubbed.
+
+Starts, in this process:
+- stubs/openai_server.py (chat, images, embeddings) and stubs/shippo_server.py
+  under uvicorn on free ports, with the latencies given below
+- stubs/search.py in place of DuckDuckGo (mcp_server.search)
+- main.py under uvicorn, in a scratch directory (fresh_prints.db, chroma_db
+  and agent_debug.log land there, not in backend/)
+
+then triggers --runs scout, designer and logistics runs at once, approves
+each scout and logistics run when it pauses, and keeps --pollers dashboard
+clients hitting the log / pending / records / metrics endpoints until all
+runs have finished. Reports:
+- throughput (finished runs/s and requests/s) and p50/p99 per endpoint
+- time from trigger to approval pause and from approval to finish
+- DB write contention: a probe thread times small INSERTs against the live
+  database (p50/p99/max) and counts "database is locked" errors
+- memory growth (RSS before/after) and run outcomes from agent_runs (the
+  latest segment of each run)
+
+Run from backend/:
+    python -m benchmarks.loadtest [--runs 10 --pollers 4 --llm-latency-ms 800
+                                   --image-latency-ms 4000 --search-latency-ms 300]
+"""
+import argparse
+import asyncio
+import os
+import resource
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+from stubs.serving import free_port, serve
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AGENTS = ("scout", "designer", "logistics")
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+class WriteProbe(threading.Thread):
+    """Times a small INSERT every `interval` s against the app database while the load runs."""
+
+    def __init__(self, db_path: str, interval: float = 0.05):
+        super().__init__(daemon=True)
+        self.db_path = db_path
+        self.interval = interval
+        self.samples = []
+        self.locked = 0
+        self.stop = threading.Event()
+
+    def run(self):
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        conn.execute("CREATE TABLE IF NOT EXISTS _write_probe (id INTEGER PRIMARY KEY, ts REAL)")
+        conn.commit()
+        while not self.stop.wait(self.interval):
+            started = time.perf_counter()
+            try:
+                conn.execute("INSERT INTO _write_probe (ts) VALUES (?)", (time.time(),))
+                conn.commit()
+                self.samples.append((time.perf_counter() - started) * 1000)
+            except sqlite3.OperationalError as e:
+                if "locked" in str(e):
+                    self.locked += 1
+                else:
+                    raise
+        conn.close()
+
+
+class LoadTest:
+    def __init__(self, base_url: str, args):
+        self.base_url = base_url
+        self.args = args
+        self.latencies: dict[str, list] = {}
+        self.errors: dict[str, int] = {}
+        self.to_pause: list = []
+        self.to_finish: list = []
+        self.done = asyncio.Event()
+
+    async def call(self, client: httpx.AsyncClient, method: str, path: str, route: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, **kwargs)
+            response.raise_for_status()
+            return response.json() if "json" in response.headers.get("content-type", "") else None
+        except httpx.HTTPError:
+            self.errors[route] = self.errors.get(route, 0) + 1
+            return None
+        finally:
+            self.latencies.setdefault(route, []).append((time.perf_counter() - started) * 1000)
+
+    async def run_agent(self, client: httpx.AsyncClient, agent: str, lead_id: int):
+        """Trigger -> wait for the approval pause -> approve -> wait for the run to finish."""
+        started = time.perf_counter()
+        if agent == "scout":
+            await self.call(client, "POST", "/run-scout", "POST /run-scout",
+                            json={"lead_id": lead_id, "title": f"Club {lead_id} wins championship"})
+            pending, approve = "/lead-pending-draft/{id}", "/approve-lead/{id}"
+        elif agent == "designer":
+            await self.call(client, "POST", "/run-designer", "POST /run-designer",
+                            json={"lead_id": lead_id, "vibe": "retro varsity"})
+            pending, approve = "/design-pending-review/{id}", "/approve-design/{id}"
+        else:
+            await self.call(client, "POST", "/run-logistics", "POST /run-logistics",
+                            json={"lead_id": lead_id, "customer_zip": "10001", "order_qty": 120, "sku": "TSHIRT-BLK-M"})
+            pending, approve = "/logistics-pending-plan/{id}", "/approve-logistics/{id}"
+
+        deadline = started + self.args.timeout
+        while time.perf_counter() < deadline:
+            body = await self.call(client, "GET", pending.format(id=lead_id), f"GET {pending}")
+            if body and body.get("status") == "waiting_for_approval":
+                break
+            await asyncio.sleep(0.25)
+        else:
+            return
+        paused = time.perf_counter()
+        self.to_pause.append(paused - started)
+        await self.call(client, "POST", approve.format(id=lead_id), f"POST {approve}")
+        self.to_finish.append(time.perf_counter() - paused)
+
+    async def poll(self, client: httpx.AsyncClient, lead_ids: list):
+        """One dashboard tab: the live log of a lead, then the summary widgets, round-robin."""
+        i = 0
+        while not self.done.is_set():
+            lead_id = lead_ids[i % len(lead_ids)]
+            await self.call(client, "GET", f"/logs/{lead_id}", "GET /logs/{id}")
+            await self.call(client, "GET", "/records/summary", "GET /records/summary")
+            if i % 5 == 0:
+                await self.call(client, "GET", "/metrics", "GET /metrics")
+            i += 1
+            await asyncio.sleep(self.args.poll_interval)
+
+    async def run(self, jobs: list) -> float:
+        limits = httpx.Limits(max_connections=len(jobs) + self.args.pollers + 10)
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=self.args.timeout, limits=limits) as client:
+            pollers = [asyncio.create_task(self.poll(client, [lead_id for _, lead_id in jobs]))
+                       for _ in range(self.args.pollers)]
+            started = time.perf_counter()
+            await asyncio.gather(*(self.run_agent(client, agent, lead_id) for agent, lead_id in jobs))
+            elapsed = time.perf_counter() - started
+            self.done.set()
+            await asyncio.gather(*pollers)
+        return elapsed
+
+
+def start_stubs(args) -> dict:
+    from stubs import openai_server, shippo_server
+
+    openai_port, shippo_port = free_port(), free_port()
+    openai_server.config.update(
+        chat_latency_ms=args.llm_latency_ms, image_latency_ms=args.image_latency_ms,
+        embedding_latency_ms=args.llm_latency_ms / 4, base_url=f"http://127.0.0.1:{openai_port}"
+    )
+    shippo_server.config.update(latency_ms=args.shippo_latency_ms)
+    serve(openai_server.app, openai_port)
+    serve(shippo_server.app, shippo_port)
+    return {
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{openai_port}/v1",
+        "OPENAI_API_KEY": "sk-stub",
+        "SHIPPO_API_URL": f"http://127.0.0.1:{shippo_port}",
+        "SHIPPO_API_KEY": "shippo_test_stub",
+        "WEATHER_PROVIDER": "file",
+        "LOG_LEVEL": "WARNING",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="runs per agent")
+    parser.add_argument("--agents", default=",".join(AGENTS), help="comma-separated subset of scout,designer,logistics")
+    parser.add_argument("--pollers", type=int, default=4, help="concurrent dashboard clients")
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--image-latency-ms", type=float, default=1000.0)
+    parser.add_argument("--search-latency-ms", type=float, default=200.0)
+    parser.add_argument("--shippo-latency-ms", type=float, default=300.0)
+    parser.add_argument("--timeout", type=float, default=300.0, help="per-run limit, seconds")
+    args = parser.parse_args()
+    agents = [a.strip() for a in args.agents.split(",") if a.strip() in AGENTS]
+
+    sys.path.insert(0, BACKEND_DIR)
+    workdir = tempfile.mkdtemp(prefix="fresh_prints_load_")
+    os.chdir(workdir)
+    os.environ.update(start_stubs(args))
+
+    import database
+    import mcp_server
+    from stubs.search import StubSearch
+
+    search = StubSearch(args.search_latency_ms)
+    mcp_server.search = search
+    database.init_db()
+
+    jobs = []
+    conn = sqlite3.connect(database.DB_NAME)
+    for agent in agents:
+        for _ in range(args.runs):
+            cursor = conn.execute("INSERT INTO leads (title, organization) VALUES (?, ?)",
+                                  (f"{agent} load lead", "Load Test University"))
+            jobs.append((agent, cursor.lastrowid))
+    conn.commit()
+    conn.close()
+
+    import main as app_module
+
+    app_port = free_port()
+    server = serve(app_module.app, app_port)
+    rss_before = rss_mb()
+    probe = WriteProbe(os.path.join(workdir, database.DB_NAME))
+    probe.start()
+
+    print(f"{len(jobs)} runs ({', '.join(agents)} x {args.runs}), {args.pollers} pollers, "
+          f"LLM {args.llm_latency_ms:.0f} ms, image {args.image_latency_ms:.0f} ms, "
+          f"search {args.search_latency_ms:.0f} ms, Shippo {args.shippo_latency_ms:.0f} ms; scratch dir {workdir}")
+    test = LoadTest(f"http://127.0.0.1:{app_port}", args)
+    elapsed = asyncio.run(test.run(jobs))
+    probe.stop.set()
+    probe.join()
+    rss_after = rss_mb()
+
+    requests_total = sum(len(v) for v in test.latencies.values())
+    print(f"\nfinished {len(test.to_finish)}/{len(jobs)} runs in {elapsed:.1f}s: "
+          f"{len(test.to_finish) / elapsed:.2f} runs/s, {requests_total / elapsed:.1f} requests/s")
+    print(f"\n{'endpoint':<34}{'n':>6}{'err':>5}{'p50 ms':>10}{'p99 ms':>10}")
+    for route, values in sorted(test.latencies.items()):
+        print(f"{route:<34}{len(values):>6}{test.errors.get(route, 0):>5}"
+              f"{percentile(values, 50):>10.1f}{percentile(values, 99):>10.1f}")
+    print(f"\ntrigger -> pause    p50 {percentile(test.to_pause, 50):.2f}s  p99 {percentile(test.to_pause, 99):.2f}s")
+    print(f"approve -> finish   p50 {percentile(test.to_finish, 50):.2f}s  p99 {percentile(test.to_finish, 99):.2f}s")
+    print(f"DB write probe      p50 {percentile(probe.samples, 50):.1f} ms  p99 {percentile(probe.samples, 99):.1f} ms  "
+          f"max {max(probe.samples, default=0):.1f} ms  locked {probe.locked}")
+    print(f"RSS                 {rss_before:.0f} MB -> {rss_after:.0f} MB (+{rss_after - rss_before:.0f} MB)")
+
+    conn = sqlite3.connect(database.DB_NAME)
+    try:
+        # A run approved mid-way has two rows (up to the pause, then the resume): report its last one
+        outcomes = conn.execute("""
+            SELECT agent, outcome, COUNT(*) FROM agent_runs r
+            WHERE rowid = (SELECT MAX(rowid) FROM agent_runs WHERE agent = r.agent AND thread_id = r.thread_id)
+            GROUP BY agent, outcome
+        """).fetchall()
+    except sqlite3.OperationalError:
+        outcomes = []
+    conn.close()
+    print("runs                " + ", ".join(f"{agent} {outcome}: {n}" for agent, outcome, n in outcomes))
+    print(f"stubs               search {search.calls} calls")
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,51 @@
 import sqlite3
 import os
+import threading
+from services.tracing import traced
 
 DB_NAME = "fresh_prints.db"
 
+_schemas_ready = set()     # (db_path, schema) pairs already applied by this process
+_schemas_lock = threading.Lock()
+
 def get_db_connection():
     conn = sqlite3.connect(DB_NAME)
     conn.row_factory = sqlite3.Row
     return conn
 
+def connect(schema: str = None, *, db_path: str = None, autocommit: bool = False) -> sqlite3.Connection:
+    """
+    Connection for the service modules: Row factory and a 10s busy timeout.
+    `schema` (CREATE ... IF NOT EXISTS statements) runs once per process and
+    database file. autocommit=True is for callers that open BEGIN IMMEDIATE
+    transactions themselves.
+    """
+    path = db_path or DB_NAME
+    conn = sqlite3.connect(path, timeout=10, isolation_level=None if autocommit else "")
+    conn.row_factory = sqlite3.Row
+    if schema is not None and (path, schema) not in _schemas_ready:
+        with _schemas_lock:
+            if (path, schema) not in _schemas_ready:
+                conn.executescript(schema)
+                _schemas_ready.add((path, schema))
+    return conn
+
+def enable_wal(db_path: str = DB_NAME):
+    """
+    WAL journal (persistent in the file): readers no longer block the writer,
+    which matters once several uvicorn workers share the database.
+    """
+    conn = sqlite3.connect(db_path, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.close()
+
 def init_db():
     # 1. Reset DB for the Demo
-    if os.path.exists(DB_NAME):
-        os.remove(DB_NAME)
+    for path in (DB_NAME, DB_NAME + "-wal", DB_NAME + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    with _schemas_lock:
+        _schemas_ready.clear()
         
     conn = get_db_connection()
     cursor = conn.cursor()
@@ -43,8 +77,10 @@ def init_db():
     
     conn.commit()
     conn.close()
+    enable_wal()
     print("✅ Database Initialized")
 
+@traced("db.log_agent_step", kind="db", root=False)
 def log_agent_step(lead_id: int, step_type: str, message: str):
     """
     Saves an agent's thought or action to the database.
@@ -2,6 +2,7 @@ import feedparser
 import time
 import sqlite3
 import requests
+from services import tracing
 
 # Real University News Feeds
 FEEDS = [
@@ -45,10 +46,11 @@ def listen():
                     # 2. Trigger The Sales Agent (The Brain)
                     # Updated endpoint and payload structure to match main.py
                     try:
-                        requests.post("http://localhost:8000/run-scout", json={
-                            "lead_id": lead_id,
-                            "title": title
-                        })
+                        with tracing.span("listener.trigger_scout", "client", lead_id=lead_id):
+                            requests.post("http://localhost:8000/run-scout", json={
+                                "lead_id": lead_id,
+                                "title": title
+                            }, headers=tracing.inject_headers())
                         print(f"🚀 Sales Agent Triggered for Lead {lead_id}!")
                     except Exception as e:
                         print(f"⚠️ Brain is offline. Saved to DB only. Error: {e}")
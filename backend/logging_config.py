@@ -0,0 +1,147 @@
+"""
+Application logging: bounded, rotating, non-blocking.
+
+scout_agent.py used to configure the root logger at DEBUG with an unbounded
+FileHandler('agent_debug.log') and log the full event object on every agent
+step, and designer_agent.py set root DEBUG too, so httpx/openai internals were
+formatted and written on every call. Now:
+- handlers sit behind a QueueHandler; a QueueListener thread does the
+  formatting and disk/console I/O, so agent loops only enqueue records
+- agent_debug.log is a RotatingFileHandler (LOG_MAX_BYTES x LOG_BACKUP_COUNT)
+- per-module levels from LOG_LEVELS ("agents=DEBUG,httpx=WARNING"), changeable
+  at runtime through set_levels() (/logging/levels in main.py)
+- DEBUG records are sampled (LOG_DEBUG_SAMPLE, 0..1); INFO and up always pass
+- LOG_FORMAT=json writes one JSON object per line with the current trace id
+- "{pid}" in LOG_FILE is replaced by the process id: rotation isn't safe with
+  several uvicorn workers on one file, so `main.py --workers N` uses
+  agent_debug.{pid}.log
+Call sites use %-style arguments so disabled levels cost no formatting.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+
+from services import tracing
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.environ.get("LOG_LEVELS", "httpx=WARNING,httpcore=WARNING,openai=WARNING,urllib3=WARNING,chromadb=WARNING")
+LOG_FILE = os.environ.get("LOG_FILE", "agent_debug.log")          # "" disables the file handler; may contain {pid}
+LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.environ.get("LOG_BACKUP_COUNT", "5"))
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text")                 # "text" or "json"
+LOG_DEBUG_SAMPLE = float(os.environ.get("LOG_DEBUG_SAMPLE", "1.0"))
+
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with the trace id attached by TraceContextFilter."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "trace_id": getattr(record, "trace_id", None)
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TraceContextFilter(logging.Filter):
+    """Stamps the current trace id on the record (on the caller's thread, where the contextvar lives)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        current = tracing.current_span()
+        record.trace_id = current.trace_id if current else None
+        return True
+
+
+class DebugSampler(logging.Filter):
+    """Keeps a `rate` fraction of DEBUG records; other levels always pass."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.DEBUG or self.rate >= 1.0 or random.random() < self.rate
+
+
+def parse_levels(spec: str) -> dict:
+    """'agents=DEBUG,httpx=WARNING' -> {'agents': 'DEBUG', 'httpx': 'WARNING'}"""
+    levels = {}
+    for item in (spec or "").split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+_listener: logging.handlers.QueueListener | None = None
+_sampler = DebugSampler(LOG_DEBUG_SAMPLE)
+_setup_lock = threading.Lock()
+
+
+def setup_logging():
+    """Installs the queue-backed handlers on the root logger (idempotent)."""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+        formatter = JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+        handlers = [logging.StreamHandler()]
+        if LOG_FILE:
+            handlers.append(logging.handlers.RotatingFileHandler(
+                LOG_FILE.replace("{pid}", str(os.getpid())), maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+            ))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+        queue_handler.addFilter(_sampler)
+        queue_handler.addFilter(TraceContextFilter())
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.setLevel(LOG_LEVEL.upper())
+        for name, level in parse_levels(LOG_LEVELS).items():
+            logging.getLogger(name).setLevel(level)
+
+        _listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+
+def get_levels() -> dict:
+    """Effective root level, explicitly set module levels and the DEBUG sample rate."""
+    levels = {
+        name: logging.getLevelName(logger.level)
+        for name, logger in sorted(logging.root.manager.loggerDict.items())
+        if isinstance(logger, logging.Logger) and logger.level != logging.NOTSET
+    }
+    return {"root": logging.getLevelName(logging.getLogger().level), "modules": levels, "debug_sample": _sampler.rate}
+
+
+def set_levels(levels: dict, debug_sample: float = None) -> dict:
+    """Changes module levels at runtime ({"root": "INFO", "agents.runtime": "DEBUG"}); raises ValueError on a bad level."""
+    resolved = {}
+    for name, level in levels.items():
+        value = logging.getLevelName(str(level).upper())
+        if not isinstance(value, int):
+            raise ValueError(f"Unknown log level '{level}' for '{name}'")
+        resolved[name] = value
+    for name, value in resolved.items():
+        logging.getLogger(None if name == "root" else name).setLevel(value)
+    if debug_sample is not None:
+        _sampler.rate = min(max(debug_sample, 0.0), 1.0)
+    return get_levels()
@@ -1,15 +1,22 @@
 import json
+from logging_config import setup_logging
+setup_logging()
+
 from fastapi import FastAPI, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware 
-from pydantic import BaseModel
-from agents.scout_agent import run_dynamic_scout, run_scout_with_feedback, agent_executor, scout_thread_map
-from agents.designer_agent import run_designer_agent, agent_executor as designer_executor
-from agents.logistics_agent import run_logistics_agent, run_logistics_agent_with_feedback, agent_executor as logistics_executor
+from pydantic import BaseModel, field_validator
+from agents.scout_agent import run_dynamic_scout, run_scout_with_feedback, resume_scout
+from agents.designer_agent import run_designer_agent, resume_designer
+from agents.logistics_agent import run_logistics_agent, run_logistics_agent_with_feedback, resume_logistics_agent, thread_lock as logistics_thread_lock
 from database import log_agent_step
 from mcp_server import get_demand_forecast
-
-# Track active thread per lead (for rejection flow)
-lead_thread_map: dict[int, str] = {}
+from services.inventory import inventory_store, InsufficientStock
+from services import forecasting
+from services.factory_load import factory_tracker, order_units_for_lead
+from services import pending_actions
+# Current thread / order context per (agent, lead), shared by all workers
+from services import run_registry
+from agents.runtime import DONE
 
 app = FastAPI(title="Fresh Prints OS Brain")
 
@@ -22,6 +29,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 2. Tracing: every request is the root span (or joins the caller's traceparent)
+from fastapi import Request
+from services import tracing
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    if request.url.path.startswith(tracing.TRACE_SKIP_PREFIXES):
+        return await call_next(request)
+    with tracing.span(f"HTTP {request.method}", "server", traceparent=request.headers.get("traceparent"),
+                      path=request.url.path) as request_span:
+        response = await call_next(request)
+        if request_span is not None:
+            route = request.scope.get("route")
+            request_span.name = f"HTTP {request.method} {getattr(route, 'path', request.url.path)}"
+            request_span.set(status_code=response.status_code, **{
+                key: int(value) for key, value in request.scope.get("path_params", {}).items()
+                if key == "lead_id" and str(value).isdigit()
+            })
+            response.headers["traceparent"] = request_span.traceparent
+        return response
+
+# 3. Background jobs that write to the shared DB run in one elected worker (see services/leader.py)
+from services import leader
+
+@app.on_event("startup")
+def elect_background_leader():
+    leader.start_election()
+
 class LeadPayload(BaseModel):
     lead_id: int
     title: str
@@ -62,56 +97,36 @@ def get_forecast(sku: str, days: int = 7):
     result = get_demand_forecast(sku, days)
     return json.loads(result)
 
+@app.post("/demand-forecast/run")
+def run_demand_forecast_batch():
+    """
+    Re-fits every SKU now instead of waiting for the nightly batch.
+    """
+    return forecasting.run_batch()
+
+@app.on_event("startup")
+def start_forecast_scheduler():
+    # Nightly batch that precomputes demand forecasts for all SKUs
+    leader.on_elected(forecasting.start_scheduler)
+
 # --- 3. PEEK AT THE PENDING DRAFT (Before Approval) ---
 @app.get("/lead-pending-draft/{lead_id}")
-async def get_pending_draft(lead_id: int):
+def get_pending_draft(lead_id: int):
     """
     UI calls this to see WHAT the agent wants to save.
     Enhanced to return sentiment and lead_score for display.
+    Reads the action the Scout recorded when it paused (no checkpoint access).
     """
-    # Use tracked thread (handles rejection with new thread)
-    thread_id = scout_thread_map.get(lead_id, str(lead_id))
-    config = {"configurable": {"thread_id": thread_id}}
-    
-    # Get the frozen state from LangGraph
-    state = agent_executor.get_state(config)
-    
-    if state.next:
-        # Dig into the last message to find the tool call
-        last_message = state.values["messages"][-1]
-        
-        # Try to get tool_calls from either location (newer LangChain uses direct attribute)
-        tool_calls = []
-        if hasattr(last_message, 'tool_calls') and last_message.tool_calls:
-            tool_calls = last_message.tool_calls
-        elif hasattr(last_message, 'additional_kwargs') and "tool_calls" in last_message.additional_kwargs:
-            tool_calls = last_message.additional_kwargs['tool_calls']
-        
-        if tool_calls:
-            # Handle both dict format (additional_kwargs) and object format (tool_calls attr)
-            first_call = tool_calls[0]
-            if isinstance(first_call, dict):
-                tool_name = first_call.get('function', {}).get('name') or first_call.get('name', '')
-                raw_args = first_call.get('function', {}).get('arguments') or json.dumps(first_call.get('args', {}))
-            else:
-                # Object format
-                tool_name = getattr(first_call, 'name', '')
-                raw_args = json.dumps(getattr(first_call, 'args', {}))
-            
-            # Check if it's the save_lead_strategy tool (the one requiring approval)
-            if tool_name == "save_lead_strategy":
-                try:
-                    args = json.loads(raw_args) if isinstance(raw_args, str) else raw_args
-                    return {
-                        "status": "waiting_for_approval",
-                        "pending_draft": args.get('email_draft'),
-                        "strategy": args.get('strategy'),
-                        "sentiment": args.get('sentiment', 'NEUTRAL'),
-                        "lead_score": args.get('lead_score', 75)
-                    }
-                except json.JSONDecodeError:
-                    return {"status": "error", "detail": "Could not parse agent arguments"}
-            
+    action = pending_actions.get("scout", lead_id)
+    if action and action["status"] == pending_actions.WAITING:
+        args = action["tool_args"]
+        return {
+            "status": "waiting_for_approval",
+            "pending_draft": args.get('email_draft'),
+            "strategy": args.get('strategy'),
+            "sentiment": args.get('sentiment', 'NEUTRAL'),
+            "lead_score": args.get('lead_score', 75)
+        }
     return {"status": "no_pending_action"}
 
 # --- 4. APPROVE AND EXECUTE ---
@@ -123,17 +138,16 @@ async def approve_lead(lead_id: int):
     print(f"👍 Human Approved Lead {lead_id}. Resuming Agent...")
     
     # Use tracked thread for consistency
-    thread_id = scout_thread_map.get(lead_id, str(lead_id))
-    config = {"configurable": {"thread_id": thread_id}}
-    
-    # Resume the graph (Input None tells it to just proceed with the pending action)
-    async for event in agent_executor.astream(None, config=config):
-        for node, values in event.items():
-            if "messages" in values:
-                last_msg = values["messages"][-1]
-                if last_msg.type == "tool":
-                     # Log the tool output
-                     log_agent_step(lead_id, "TOOL_RESULT", f"Output: {last_msg.content}")
+    thread_id = run_registry.thread_id("scout", lead_id)
+
+    # Atomic WAITING -> RUNNING, so a double click or a second worker can't save the draft twice
+    if not pending_actions.claim("scout", lead_id, thread_id):
+        return {"status": "error", "detail": "No draft is waiting for approval"}
+    
+    # Resume the graph (the pending save runs first), recorded and limited like the first half
+    outcome = await resume_scout(lead_id, thread_id)
+    if outcome != DONE:
+        return {"status": "error", "detail": f"Agent stopped: {outcome}"}
 
     log_agent_step(lead_id, "SYSTEM", "✅ Draft Saved to CRM after Human Approval.")
     
@@ -148,21 +162,17 @@ async def reject_lead(lead_id: int, payload: ScoutRejectionPayload, background_t
     """
     Human rejects the draft. We inject feedback and restart the agent.
     """
-    import asyncio
     import time
     
     # Generate new thread ID for this rejection attempt
     new_thread_id = f"{lead_id}_scout_v{int(time.time())}"
-    scout_thread_map[lead_id] = new_thread_id
+    run_registry.register("scout", lead_id, new_thread_id)
     
     print(f"❌ Scout Draft Rejected for {lead_id}: {payload.feedback} -> New Thread: {new_thread_id}")
     log_agent_step(lead_id, "SYSTEM", f"❌ Draft Rejected. Feedback: {payload.feedback}")
     
-    def run_async_agent_with_feedback(lead_id, feedback, thread_id):
-        """Wrapper to run async agent with feedback in background thread"""
-        asyncio.run(run_scout_with_feedback(lead_id, feedback, thread_id))
-    
-    background_tasks.add_task(run_async_agent_with_feedback, lead_id, payload.feedback, new_thread_id)
+    # Coroutine runs on the server loop (one loop shares the model's connection pool)
+    background_tasks.add_task(run_scout_with_feedback, lead_id, payload.feedback, new_thread_id)
     
     return {"status": "Feedback sent to Agent. Regenerating draft..."}
 
@@ -173,91 +183,37 @@ class DesignPayload(BaseModel):
 # 1. TRIGGER
 @app.post("/run-designer")
 async def trigger_designer(payload: DesignPayload, background_tasks: BackgroundTasks):
-    import asyncio
     
     # Track thread for this lead (initial run uses lead_id as thread)
-    lead_thread_map[payload.lead_id] = str(payload.lead_id)
-    
-    def run_async_agent(lead_id, vibe):
-        """Wrapper to run async agent in background thread"""
-        asyncio.run(run_designer_agent(lead_id, vibe))
+    run_registry.register("designer", payload.lead_id, str(payload.lead_id))
     
-    background_tasks.add_task(run_async_agent, payload.lead_id, payload.vibe)
+    # Coroutine runs on the server loop: asyncio.run() per thread left the model's
+    # pooled async connections bound to another thread's (closed) loop
+    background_tasks.add_task(run_designer_agent, payload.lead_id, payload.vibe)
     return {"status": "Designer Started"}
 
 # 2. GET PENDING DESIGN (For UI) - Enhanced to return tool results
 @app.get("/design-pending-review/{lead_id}")
-async def get_pending_design(lead_id: int):
-    # Use the tracked thread (handles rejection with new thread)
-    thread_id = lead_thread_map.get(lead_id, str(lead_id))
-    config = {"configurable": {"thread_id": thread_id}}
-    state = designer_executor.get_state(config)
-    
-    # Helper to extract tool results from message history
-    def extract_tool_results(messages):
-        results = {
-            "color_palette": None,
-            "print_technique": None,
-            "profitability": None
+def get_pending_design(lead_id: int):
+    """
+    Pending design plus the palette / technique / profitability results,
+    all captured by the Designer when it paused.
+    """
+    action = pending_actions.get("designer", lead_id)
+    if action and action["status"] == pending_actions.WAITING:
+        args, tool_results = action["tool_args"], action["tool_results"]
+        return {
+            "status": "waiting_for_approval",
+            "image_url": args.get('image_url'),
+            "cost_report": args.get('cost_report'),
+            "color_count": args.get('color_count', 5),
+            "print_technique_name": args.get('print_technique', 'Screen Print'),
+            "profit_margin": args.get('profit_margin', 60.0),
+            # Include parsed tool results
+            "color_palette": tool_results.get('color_palette'),
+            "print_technique": tool_results.get('print_technique'),
+            "profitability": tool_results.get('profitability')
         }
-        for msg in messages:
-            if hasattr(msg, 'type') and msg.type == 'tool':
-                content = str(msg.content)
-                try:
-                    # Try to parse as JSON
-                    data = json.loads(content)
-                    if 'palette' in data:
-                        results['color_palette'] = data
-                    elif 'recommended_technique' in data:
-                        results['print_technique'] = data
-                    elif 'margin_percent' in data:
-                        results['profitability'] = data
-                except:
-                    pass
-        return results
-    
-    if state.next:
-        last_message = state.values["messages"][-1]
-        
-        # Try to get tool_calls from either location
-        tool_calls = []
-        if hasattr(last_message, 'tool_calls') and last_message.tool_calls:
-            tool_calls = last_message.tool_calls
-        elif hasattr(last_message, 'additional_kwargs') and "tool_calls" in last_message.additional_kwargs:
-            tool_calls = last_message.additional_kwargs['tool_calls']
-        
-        if tool_calls:
-            first_call = tool_calls[0]
-            # Handle both dict and object formats
-            if isinstance(first_call, dict):
-                tool_name = first_call.get('function', {}).get('name') or first_call.get('name', '')
-                raw_args = first_call.get('function', {}).get('arguments') or json.dumps(first_call.get('args', {}))
-            else:
-                tool_name = getattr(first_call, 'name', '')
-                raw_args = json.dumps(getattr(first_call, 'args', {}))
-            
-            if tool_name == "save_final_design":
-                try:
-                    args = json.loads(raw_args) if isinstance(raw_args, str) else raw_args
-                    
-                    # Extract tool results from message history
-                    tool_results = extract_tool_results(state.values["messages"])
-                    
-                    return {
-                        "status": "waiting_for_approval",
-                        "image_url": args.get('image_url'),
-                        "cost_report": args.get('cost_report'),
-                        "color_count": args.get('color_count', 5),
-                        "print_technique_name": args.get('print_technique', 'Screen Print'),
-                        "profit_margin": args.get('profit_margin', 60.0),
-                        # Include parsed tool results
-                        "color_palette": tool_results.get('color_palette'),
-                        "print_technique": tool_results.get('print_technique'),
-                        "profitability": tool_results.get('profitability')
-                    }
-                except json.JSONDecodeError:
-                    return {"status": "error", "detail": "Could not parse arguments"}
-                    
     return {"status": "no_pending_action"}
 
 # 3. REJECT (Feedback Loop)
@@ -269,20 +225,16 @@ async def reject_design(lead_id: int, payload: RejectionPayload, background_task
     """
     User hates the design. We inject the feedback and restart the agent.
     """
-    import asyncio
     import time
     
     # Generate new thread ID for this rejection attempt
     new_thread_id = f"{lead_id}_v{int(time.time())}"
-    lead_thread_map[lead_id] = new_thread_id
+    run_registry.register("designer", lead_id, new_thread_id)
     
     print(f"X Design Rejected for {lead_id}: {payload.feedback} -> New Thread: {new_thread_id}")
     
-    def run_async_agent_with_feedback(lead_id, feedback, thread_id):
-        """Wrapper to run async agent with feedback in background thread"""
-        asyncio.run(run_designer_agent(lead_id, "", feedback, thread_id))
-    
-    background_tasks.add_task(run_async_agent_with_feedback, lead_id, payload.feedback, new_thread_id)
+    # Coroutine runs on the server loop (one loop shares the model's connection pool)
+    background_tasks.add_task(run_designer_agent, lead_id, "", payload.feedback, new_thread_id)
     
     return {"status": "Feedback sent to Agent. Regenerating..."}
 
@@ -309,8 +261,12 @@ async def approve_design(lead_id: int):
     log_agent_step(lead_id, "SYSTEM", "✅ Art Director Approved. Awaiting Apparel Chair approval.")
     return {"status": "Pending Customer Approval", "message": "Ready to send to Apparel Chair"}
 
-# Storage for customer approval tokens
-customer_approval_tokens: dict[str, dict] = {}
+# Customer approval tokens: expiring, single-use, shared by all workers
+from services import approval_tokens
+
+@app.on_event("startup")
+def start_approval_token_sweeper():
+    leader.on_elected(approval_tokens.start_sweeper)
 
 # 5. SEND TO APPAREL CHAIR (Customer Email)
 class CustomerEmailPayload(BaseModel):
@@ -323,12 +279,8 @@ async def send_to_customer(lead_id: int, payload: CustomerEmailPayload):
     Generates approval token and simulates sending email to Apparel Chair.
     In production, this would actually send email via SendGrid/SES.
     """
-    import uuid
     import sqlite3
     
-    # Generate unique approval token
-    token = str(uuid.uuid4())[:8]
-    
     # Try to get design details from agent_logs (more reliable for Designer)
     conn = sqlite3.connect("fresh_prints.db")
     cursor = conn.cursor()
@@ -350,14 +302,8 @@ async def send_to_customer(lead_id: int, payload: CustomerEmailPayload):
     
     conn.close()
     
-    # Store token with lead info
-    customer_approval_tokens[token] = {
-        "lead_id": lead_id,
-        "customer_email": payload.customer_email,
-        "customer_name": payload.customer_name,
-        "title": title,
-        "created_at": str(datetime.now())
-    }
+    # Generate a single-use approval token (expires after APPROVAL_TOKEN_TTL_HOURS)
+    token = approval_tokens.issue(lead_id, payload.customer_email, payload.customer_name, title)
     
     # Simulated email (in production, use SendGrid/SES)
     approval_url = f"http://localhost:8000/customer-approve/{token}"
@@ -368,7 +314,7 @@ async def send_to_customer(lead_id: int, payload: CustomerEmailPayload):
     print(f"   Approve: {approval_url}")
     print(f"   Reject: {reject_url}")
     
-    log_agent_step(lead_id, "SYSTEM", f"📧 Email sent to {payload.customer_email}. Token: {token}")
+    log_agent_step(lead_id, "SYSTEM", f"📧 Email sent to {payload.customer_email}. Token hash: {approval_tokens.fingerprint(token)}")
     
     return {
         "status": "Email sent (simulated)",
@@ -379,79 +325,96 @@ async def send_to_customer(lead_id: int, payload: CustomerEmailPayload):
     }
 
 # 6. CUSTOMER APPROVES (Stage 2 - External/Final)
-from datetime import datetime
-
-@app.get("/customer-approve/{token}")
-async def customer_approve(token: str):
-    """
-    Public endpoint - Apparel Chair clicks this link to approve.
-    No auth required - token-based validation.
-    """
-    if token not in customer_approval_tokens:
-        return {"error": "Invalid or expired token", "message": "This approval link has already been used or has expired."}
-    
-    token_data = customer_approval_tokens[token]
-    lead_id = token_data["lead_id"]
-    
-    print(f"✅ Customer (Apparel Chair) Approved Design for Lead {lead_id}")
-    
-    # Try to resume the agent to save the final design
-    try:
-        config = {"configurable": {"thread_id": str(lead_id)}}
-        
-        async for event in designer_executor.astream(None, config=config):
-            for node, values in event.items():
-                if "messages" in values:
-                    last_msg = values["messages"][-1]
-                    if last_msg.type == "tool":
-                         log_agent_step(lead_id, "TOOL_RESULT", f"Output: {last_msg.content}")
-    except Exception as e:
-        print(f"Agent resume error (may be expected if no pending action): {e}")
-        # Continue anyway - the design was approved
-    
-    log_agent_step(lead_id, "SYSTEM", f"✅ Apparel Chair ({token_data['customer_name']}) Approved! Design Saved.")
-    
-    # Remove used token
-    del customer_approval_tokens[token]
-    
-    # Return a nice HTML page for the customer
+def _customer_page(title: str, emoji: str, heading: str, color: str, body: str, status_code: int = 200):
+    """The small standalone page the Apparel Chair sees after clicking an email link."""
     from fastapi.responses import HTMLResponse
     html_content = f"""
     <!DOCTYPE html>
     <html>
     <head>
-        <title>Design Approved - Fresh Prints</title>
+        <title>{title} - Fresh Prints</title>
         <style>
             body {{ font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; background: linear-gradient(135deg, #1a1a2e 0%, #16213e 100%); color: white; display: flex; justify-content: center; align-items: center; min-height: 100vh; margin: 0; }}
             .container {{ text-align: center; padding: 40px; background: rgba(255,255,255,0.1); border-radius: 20px; max-width: 500px; }}
-            h1 {{ color: #4ade80; margin-bottom: 20px; }}
+            h1 {{ color: {color}; margin-bottom: 20px; }}
             p {{ color: #94a3b8; line-height: 1.6; }}
             .emoji {{ font-size: 64px; margin-bottom: 20px; }}
         </style>
     </head>
     <body>
         <div class="container">
-            <div class="emoji">✅</div>
-            <h1>Design Approved!</h1>
-            <p>Thank you, <strong>{token_data['customer_name']}</strong>!</p>
-            <p>Your approval has been recorded and the design has been saved. The Fresh Prints team will begin production shortly.</p>
-            <p style="margin-top: 30px; font-size: 12px; color: #64748b;">You can close this tab now.</p>
+            <div class="emoji">{emoji}</div>
+            <h1>{heading}</h1>
+            {body}
         </div>
     </body>
     </html>
     """
-    return HTMLResponse(content=html_content)
+    return HTMLResponse(content=html_content, status_code=status_code)
+
+@app.get("/customer-approve/{token}")
+async def customer_approve(token: str):
+    """
+    Public endpoint - Apparel Chair clicks this link to approve.
+    No auth required - token-based validation.
+    """
+    # Consumed up front, so a double click (or a second worker) can't approve twice
+    token_data = approval_tokens.consume(token)
+    if token_data is None:
+        return {"error": "Invalid or expired token", "message": "This approval link has already been used or has expired."}
+    
+    lead_id = token_data["lead_id"]
+    
+    print(f"✅ Customer (Apparel Chair) Approved Design for Lead {lead_id}")
+    
+    # Resume the agent to save the final design (on the thread that paused, which may be a rerun)
+    action = pending_actions.get("designer", lead_id)
+    thread_id = action["thread_id"] if action else run_registry.thread_id("designer", lead_id)
+
+    # Every /send-to-customer issues a new token, so two links can race for the same design
+    if not pending_actions.claim("designer", lead_id, thread_id):
+        return _customer_page(
+            "Already Handled", "ℹ️", "Already Handled", "#60a5fa",
+            f"""<p>Thanks, <strong>{token_data['customer_name']}</strong> - this design has already been approved or is being saved.</p>
+            <p style="margin-top: 30px; font-size: 12px; color: #64748b;">You can close this tab now.</p>"""
+        )
+    outcome = await resume_designer(lead_id, thread_id)
+    if outcome != DONE:
+        # Nothing was saved: resume_agent reopened the action, and the link works again
+        print(f"Agent resume stopped for lead {lead_id}: {outcome}")
+        approval_tokens.restore(token, token_data)
+        log_agent_step(lead_id, "SYSTEM", f"⚠️ Apparel Chair approval could not be saved ({outcome}). Link re-enabled for a retry.")
+        return _customer_page(
+            "Approval Not Saved", "⚠️", "Please Try Again", "#f59e0b",
+            f"""<p>Sorry, <strong>{token_data['customer_name']}</strong> - we couldn't record your approval just now.</p>
+            <p>Your link still works: please click it again in a few minutes.</p>""",
+            status_code=503
+        )
+    
+    log_agent_step(lead_id, "SYSTEM", f"✅ Apparel Chair ({token_data['customer_name']}) Approved! Design Saved.")
+
+    # Approved designs go straight into the production queue
+    job = factory_tracker.schedule_lead(lead_id, order_units_for_lead(lead_id), "DESIGN")
+    log_agent_step(lead_id, "SYSTEM", f"🏭 Queued at {job['factory_id']}: {job['units']} units")
+    
+    # Return a nice HTML page for the customer
+    return _customer_page(
+        "Design Approved", "✅", "Design Approved!", "#4ade80",
+        f"""<p>Thank you, <strong>{token_data['customer_name']}</strong>!</p>
+            <p>Your approval has been recorded and the design has been saved. The Fresh Prints team will begin production shortly.</p>
+            <p style="margin-top: 30px; font-size: 12px; color: #64748b;">You can close this tab now.</p>"""
+    )
 
 # 7. CUSTOMER REJECTS
 @app.get("/customer-reject/{token}")
-async def customer_reject(token: str, feedback: str = "Customer requested changes"):
+async def customer_reject(token: str, background_tasks: BackgroundTasks, feedback: str = "Customer requested changes"):
     """
     Public endpoint - Apparel Chair clicks this link to reject.
     """
-    if token not in customer_approval_tokens:
+    token_data = approval_tokens.consume(token)
+    if token_data is None:
         return {"error": "Invalid or expired token", "message": "This link has already been used or has expired."}
     
-    token_data = customer_approval_tokens[token]
     lead_id = token_data["lead_id"]
     
     print(f"❌ Customer (Apparel Chair) Rejected Design for Lead {lead_id}")
@@ -472,48 +435,21 @@ async def customer_reject(token: str, feedback: str = "Customer requested change
     # Trigger designer agent to regenerate with feedback
     import time
     new_thread_id = f"{lead_id}_v{int(time.time())}"
-    lead_thread_map[lead_id] = new_thread_id
+    run_registry.register("designer", lead_id, new_thread_id)
     
     log_agent_step(lead_id, "SYSTEM", "🔄 Regenerating Design based on Apparel Chair feedback...")
     
-    import asyncio
-    def run_regeneration():
-        asyncio.run(run_designer_agent_with_feedback(lead_id, f"Apparel Chair feedback: {feedback}", new_thread_id))
-    
-    from threading import Thread
-    Thread(target=run_regeneration).start()
-    
-    # Remove used token
-    del customer_approval_tokens[token]
+    # Coroutine runs on the server loop (one loop shares the model's connection pool)
+    background_tasks.add_task(run_designer_agent, lead_id, "", f"Apparel Chair feedback: {feedback}", new_thread_id)
     
     # Return a nice HTML page
-    from fastapi.responses import HTMLResponse
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Changes Requested - Fresh Prints</title>
-        <style>
-            body {{ font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; background: linear-gradient(135deg, #1a1a2e 0%, #16213e 100%); color: white; display: flex; justify-content: center; align-items: center; min-height: 100vh; margin: 0; }}
-            .container {{ text-align: center; padding: 40px; background: rgba(255,255,255,0.1); border-radius: 20px; max-width: 500px; }}
-            h1 {{ color: #f59e0b; margin-bottom: 20px; }}
-            p {{ color: #94a3b8; line-height: 1.6; }}
-            .emoji {{ font-size: 64px; margin-bottom: 20px; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="emoji">📝</div>
-            <h1>Changes Requested</h1>
-            <p>Thank you, <strong>{token_data['customer_name']}</strong>!</p>
+    return _customer_page(
+        "Changes Requested", "📝", "Changes Requested", "#f59e0b",
+        f"""<p>Thank you, <strong>{token_data['customer_name']}</strong>!</p>
             <p>Your feedback "<em>{feedback}</em>" has been sent to the design team.</p>
             <p>They are now generating a <strong>new design</strong> based on your input.</p>
-            <p style="margin-top: 30px; font-size: 12px; color: #64748b;">You will receive a new email when the updated design is ready.</p>
-        </div>
-    </body>
-    </html>
-    """
-    return HTMLResponse(content=html_content)
+            <p style="margin-top: 30px; font-size: 12px; color: #64748b;">You will receive a new email when the updated design is ready.</p>"""
+    )
 
 # 8. CHECK CUSTOMER APPROVAL STATUS
 @app.get("/customer-approval-status/{lead_id}")
@@ -540,32 +476,23 @@ class LogisticsPayload(BaseModel):
     order_qty: int
     sku: str
 
-# Track active thread per logistics lead (for rejection flow)
-logistics_thread_map: dict[int, str] = {}
-
-# Store original order context for rejection flow
-logistics_order_context: dict[int, dict] = {}
-
 @app.post("/run-logistics")
 async def trigger_logistics(payload: LogisticsPayload, background_tasks: BackgroundTasks):
-    import asyncio
     
-    # Track thread for this lead (initial run uses lead_id as thread)
-    logistics_thread_map[payload.lead_id] = str(payload.lead_id)
-    
-    # Store order context for rejection flow
-    logistics_order_context[payload.lead_id] = {
+    # Track thread for this lead (initial run uses lead_id as thread) with the
+    # order context the approval and rejection flows need
+    run_registry.register("logistics", payload.lead_id, str(payload.lead_id), context={
         "customer_zip": payload.customer_zip,
         "order_qty": payload.order_qty,
         "sku": payload.sku
-    }
-    
-    def run_async_agent(lead_id, customer_zip, order_qty, sku):
-        """Wrapper to run async agent in background thread"""
-        asyncio.run(run_logistics_agent(lead_id, customer_zip, order_qty, sku))
+    })
+
+    # Every routed order feeds the demand forecasting history
+    forecasting.record_order(payload.sku, payload.order_qty, lead_id=payload.lead_id, customer_zip=payload.customer_zip)
     
+    # Coroutine runs on the server loop (one loop shares the model's connection pool)
     background_tasks.add_task(
-        run_async_agent, 
+        run_logistics_agent,
         payload.lead_id, 
         payload.customer_zip, 
         payload.order_qty, 
@@ -575,120 +502,80 @@ async def trigger_logistics(payload: LogisticsPayload, background_tasks: Backgro
 
 # 2. REVIEW PENDING PLAN (The HITL Modal)
 @app.get("/logistics-pending-plan/{lead_id}")
-async def get_logistics_plan(lead_id: int):
-    # Use the tracked thread (handles rejection with new thread)
-    thread_id = logistics_thread_map.get(lead_id, str(lead_id))
-    config = {"configurable": {"thread_id": thread_id}}
-    state = logistics_executor.get_state(config)
-    
-    # Check if save_logistics_plan was already executed by scanning message history
-    # This prevents the infinite "thinking" loop after approval
-    if state.values and "messages" in state.values:
-        for msg in state.values["messages"]:
-            if hasattr(msg, 'type') and msg.type == 'tool':
-                content = str(msg.content) if hasattr(msg, 'content') else ''
-                if 'Logistics Plan Saved' in content:
-                    # Plan was already saved, agent should stop
-                    return {"status": "completed"}
-    
-    if state.next:
-        last_message = state.values["messages"][-1]
-        
-        # Try to get tool_calls from either location (dual-check pattern)
-        tool_calls = []
-        if hasattr(last_message, 'tool_calls') and last_message.tool_calls:
-            tool_calls = last_message.tool_calls
-        elif hasattr(last_message, 'additional_kwargs') and "tool_calls" in last_message.additional_kwargs:
-            tool_calls = last_message.additional_kwargs['tool_calls']
-        
-        if tool_calls:
-            first_call = tool_calls[0]
-            # Handle both dict format (additional_kwargs) and object format (tool_calls attr)
-            if isinstance(first_call, dict):
-                tool_name = first_call.get('function', {}).get('name') or first_call.get('name', '')
-                raw_args = first_call.get('function', {}).get('arguments') or json.dumps(first_call.get('args', {}))
-            else:
-                # Object format
-                tool_name = getattr(first_call, 'name', '')
-                raw_args = json.dumps(getattr(first_call, 'args', {}))
-            
-            # Only pause for the final save_logistics_plan tool
-            if tool_name == "save_logistics_plan":
-                try:
-                    args = json.loads(raw_args) if isinstance(raw_args, str) else raw_args
-                    return {
-                        "status": "waiting_for_approval",
-                        "plan_details": args.get('plan_details'),
-                        "total_cost": args.get('total_cost')
-                    }
-                except json.JSONDecodeError:
-                    return {"status": "error", "detail": "Could not parse arguments"}
-            else:
-                # AUTO-RESUME: For non-save tools, continue the agent automatically
-                # This allows the agent to run through all analysis steps without user intervention
-                print(f"🔄 Auto-resuming logistics agent for tool: {tool_name}")
-                try:
-                    async for event in logistics_executor.astream(None, config=config):
-                        for node, values in event.items():
-                            if "messages" in values:
-                                last_msg = values["messages"][-1]
-                                if last_msg.type == "tool":
-                                    log_agent_step(lead_id, "TOOL_RESULT", f"{tool_name}: {last_msg.content[:200]}...")
-                except Exception as e:
-                    print(f"Auto-resume error: {e}")
-                
-                # Return processing status - frontend will poll again
-                return {"status": "processing"}
-                    
-    return {"status": "no_pending_action"}
+def get_logistics_plan(lead_id: int):
+    """
+    Polled by the logistics page. A plain read of the action recorded when the agent
+    paused - the agent auto-resumes its own analysis tools in the background.
+    """
+    action = pending_actions.get("logistics", lead_id)
+    if action is None:
+        return {"status": "no_pending_action"}
+
+    # Plan already saved (or the run ended) - this prevents the infinite "thinking" loop after approval
+    if action["status"] == pending_actions.DONE:
+        return {"status": "completed"}
+
+    # Stopped early (timeout, budget, error): no plan was saved
+    if action["status"] == pending_actions.FAILED:
+        return {"status": "failed", "outcome": action["outcome"]}
+
+    if action["status"] == pending_actions.WAITING:
+        args = action["tool_args"]
+        return {
+            "status": "waiting_for_approval",
+            "plan_details": args.get('plan_details'),
+            "total_cost": args.get('total_cost')
+        }
+
+    # Return processing status - frontend will poll again
+    return {"status": "processing"}
 
 # 3. APPROVE PLAN
 @app.post("/approve-logistics/{lead_id}")
 async def approve_logistics(lead_id: int):
     print(f"✅ Logistics Plan Approved for {lead_id}")
-    # Use tracked thread for consistency
-    thread_id = logistics_thread_map.get(lead_id, str(lead_id))
-    config = {"configurable": {"thread_id": thread_id}}
+    action = pending_actions.get("logistics", lead_id)
+    # Use the thread that paused (tracked thread as fallback)
+    thread_id = action["thread_id"] if action else run_registry.thread_id("logistics", lead_id)
     
     # Check if this is an insufficient stock case before resuming
-    state = logistics_executor.get_state(config)
-    is_insufficient_stock = False
-    
-    if state.next:
-        last_message = state.values["messages"][-1]
-        tool_calls = []
-        if hasattr(last_message, 'tool_calls') and last_message.tool_calls:
-            tool_calls = last_message.tool_calls
-        elif hasattr(last_message, 'additional_kwargs') and "tool_calls" in last_message.additional_kwargs:
-            tool_calls = last_message.additional_kwargs['tool_calls']
-        
-        if tool_calls:
-            first_call = tool_calls[0]
-            if isinstance(first_call, dict):
-                raw_args = first_call.get('function', {}).get('arguments') or json.dumps(first_call.get('args', {}))
-            else:
-                raw_args = json.dumps(getattr(first_call, 'args', {}))
-            
-            try:
-                args = json.loads(raw_args) if isinstance(raw_args, str) else raw_args
-                plan_details = args.get('plan_details', '').lower()
-                if 'insufficient' in plan_details:
-                    is_insufficient_stock = True
-            except:
-                pass
-    
-    async for event in logistics_executor.astream(None, config=config):
-        for node, values in event.items():
-            if "messages" in values:
-                last_msg = values["messages"][-1]
-                if last_msg.type == "tool":
-                     log_agent_step(lead_id, "TOOL_RESULT", f"Output: {last_msg.content}")
+    is_insufficient_stock = bool(
+        action and action["status"] == pending_actions.WAITING
+        and 'insufficient' in str(action["tool_args"].get('plan_details', '')).lower()
+    )
+    
+    # Same per-thread lock as the background loop, so a double-click can't execute the plan twice
+    lock = logistics_thread_lock(thread_id)
+    if not lock.acquire(blocking=False):
+        return {"status": "error", "detail": "Logistics agent is already running for this lead"}
+    # The lock only covers this worker; the claim covers the others
+    if not pending_actions.claim("logistics", lead_id, thread_id):
+        lock.release()
+        return {"status": "error", "detail": "Logistics agent is already running for this lead"}
+    try:
+        outcome = await resume_logistics_agent(lead_id, thread_id)
+    finally:
+        lock.release()
+    if outcome != DONE:
+        return {"status": "error", "detail": f"Agent stopped: {outcome}"}
 
     # Log appropriate message based on stock status
     if is_insufficient_stock:
         log_agent_step(lead_id, "SYSTEM", "📧 Stock Shortage Notification sent to Apparel Chair.")
         return {"status": "Stock Shortage Notification Sent"}
     else:
+        # Claim the units so a concurrent run can't route the same stock
+        order = run_registry.context("logistics", lead_id)
+        if order:
+            try:
+                reservation = inventory_store.reserve_order(order["sku"], order["order_qty"], reference=f"lead-{lead_id}")
+                log_agent_step(lead_id, "SYSTEM", f"🔒 Reserved {order['order_qty']} units of {order['sku']}: {reservation['allocations']}")
+                emissions = record_lead_emissions(lead_id, order, reservation)
+                log_agent_step(lead_id, "SYSTEM", f"🌱 Carbon ledger: {emissions['carbon_kg']:.2f}kg CO2 across {emissions['recorded']} shipment(s)")
+            except InsufficientStock as e:
+                log_agent_step(lead_id, "SYSTEM", f"⚠️ Could not reserve stock: {e}")
+            job = factory_tracker.schedule_lead(lead_id, order["order_qty"], "PRINT")
+            log_agent_step(lead_id, "SYSTEM", f"🏭 Production at {job['factory_id']}: {job['units']} units")
         log_agent_step(lead_id, "SYSTEM", "✅ Order Routed & Saved.")
         return {"status": "Plan Executed"}
 
@@ -702,24 +589,20 @@ async def reject_logistics(lead_id: int, payload: LogisticsRejectionPayload, bac
     """
     User rejects the logistics plan. We inject the feedback and restart the agent.
     """
-    import asyncio
     import time
     
     # Get original order context
-    order_context = logistics_order_context.get(lead_id, {})
+    order_context = run_registry.context("logistics", lead_id)
     
-    # Generate new thread ID for this rejection attempt
+    # Generate new thread ID for this rejection attempt (the registry keeps the order context)
     new_thread_id = f"{lead_id}_logistics_v{int(time.time())}"
-    logistics_thread_map[lead_id] = new_thread_id
+    run_registry.register("logistics", lead_id, new_thread_id)
     
     print(f"❌ Logistics Plan Rejected for {lead_id}: {payload.feedback} -> New Thread: {new_thread_id}")
     log_agent_step(lead_id, "SYSTEM", f"❌ Plan Rejected. Feedback: {payload.feedback}")
     
-    def run_async_agent_with_feedback(lead_id, feedback, thread_id, context):
-        """Wrapper to run async agent with feedback in background thread"""
-        asyncio.run(run_logistics_agent_with_feedback(lead_id, feedback, thread_id, context))
-    
-    background_tasks.add_task(run_async_agent_with_feedback, lead_id, payload.feedback, new_thread_id, order_context)
+    # Coroutine runs on the server loop (one loop shares the model's connection pool)
+    background_tasks.add_task(run_logistics_agent_with_feedback, lead_id, payload.feedback, new_thread_id, order_context)
     
     return {"status": "Feedback sent to Agent. Regenerating plan..."}
 
@@ -728,19 +611,44 @@ async def reject_logistics(lead_id: int, payload: LogisticsRejectionPayload, bac
 # ==========================================
 
 # Import the helper functions
-from mcp_server import get_route_data, get_live_shipping_rates, calculate_carbon_footprint
+from mcp_server import get_route_data, compare_carrier_rates, estimate_carbon_footprint
+
+from fastapi import Header
+from fastapi.responses import Response
+from services.route_cache import RoutePayloadCache
+
+# Serialized map payloads keyed on (ZIP, active warehouse set)
+route_payload_cache = RoutePayloadCache(get_route_data)
 
 class RouteDataPayload(BaseModel):
     customer_zip: str
     active_warehouses: list[str] | None = None
 
+def _route_response(customer_zip: str, active_warehouses, if_none_match: str | None) -> Response:
+    payload = route_payload_cache.get(customer_zip, active_warehouses)
+    # no-cache = browsers may keep it but must revalidate (cheap 304) before reuse
+    headers = {"ETag": payload.etag, "Cache-Control": "no-cache"}
+    if payload.matches(if_none_match):
+        return Response(status_code=304, headers=headers)
+    return Response(content=payload.body, media_type="application/json", headers=headers)
+
 @app.post("/logistics-route-data")
-async def get_logistics_route_data(payload: RouteDataPayload):
+async def get_logistics_route_data(payload: RouteDataPayload, if_none_match: str | None = Header(default=None)):
     """
     Returns all warehouse/route data for map visualization.
+    Served from a precomputed cache; If-None-Match with the current ETag returns 304.
     """
-    route_data = get_route_data(payload.customer_zip, payload.active_warehouses)
-    return route_data
+    return _route_response(payload.customer_zip, payload.active_warehouses, if_none_match)
+
+@app.get("/logistics-route-data")
+async def get_logistics_route_data_cached(customer_zip: str, active: str | None = None,
+                                          if_none_match: str | None = Header(default=None)):
+    """
+    GET variant so browsers can revalidate with ETags on their own.
+    active: comma-separated warehouse codes (omit for all).
+    """
+    active_warehouses = active.split(",") if active is not None else None
+    return _route_response(customer_zip, active_warehouses, if_none_match)
 
 class RatesPayload(BaseModel):
     origin_zip: str
@@ -752,10 +660,8 @@ async def get_logistics_rates(payload: RatesPayload):
     """
     Returns carrier rate comparison from Shippo (or simulated).
     """
-    import ast
-    rates_str = get_live_shipping_rates(payload.origin_zip, payload.dest_zip, payload.weight_lbs)
-    rates_data = ast.literal_eval(rates_str)
-    return rates_data
+    rates = compare_carrier_rates(payload.origin_zip, payload.dest_zip, payload.weight_lbs)
+    return rates.to_dict()
 
 class CarbonPayload(BaseModel):
     origin_zip: str
@@ -768,16 +674,403 @@ async def get_logistics_carbon(payload: CarbonPayload):
     """
     Returns carbon footprint calculation for a shipment.
     """
-    import ast
-    carbon_str = calculate_carbon_footprint(
+    carbon = estimate_carbon_footprint(
         payload.origin_zip, 
         payload.dest_zip, 
         payload.weight_lbs, 
         payload.shipping_mode
     )
-    carbon_data = ast.literal_eval(carbon_str)
-    return carbon_data
+    return carbon.to_dict()
+
+# --- CARBON LEDGER & ESG REPORTING ---
+from services import carbon as carbon_ledger
+from services.batch_routing import WAREHOUSE_CODES, UNIT_WEIGHT_LBS
+from mcp_server import WAREHOUSE_DATA
+from database import get_db_connection
+
+def _lead_customer(lead_id: int) -> str:
+    conn = get_db_connection()
+    row = conn.execute("SELECT organization, title FROM leads WHERE id = ?", (lead_id,)).fetchone()
+    conn.close()
+    if row and (row["organization"] or row["title"]):
+        return row["organization"] or row["title"]
+    return f"lead-{lead_id}"
+
+def record_lead_emissions(lead_id: int, order: dict, reservation: dict, shipping_mode: str = "ground") -> dict:
+    """
+    Books one ledger shipment per warehouse leg of an approved order.
+    reservation: as returned by inventory_store.reserve_order; its id keys the legs,
+    so a later order for the same lead isn't dropped as a duplicate, and releasing
+    or expiring the reservation voids them
+    """
+    customer = _lead_customer(lead_id)
+    shipments = []
+    for label, qty in reservation["allocations"].items():
+        code = WAREHOUSE_CODES.get(label, label)
+        shipments.append({
+            "shipment_ref": f"{reservation['reservation_id']}:{code}",
+            "lead_id": lead_id,
+            "customer": customer,
+            "warehouse": code,
+            "origin_zip": WAREHOUSE_DATA[code]["zip"] if code in WAREHOUSE_DATA else code,
+            "dest_zip": order["customer_zip"],
+            "weight_lbs": qty * UNIT_WEIGHT_LBS,
+            "shipping_mode": shipping_mode
+        })
+    return carbon_ledger.record_shipments(shipments)
+
+class CarbonShipment(BaseModel):
+    origin_zip: str
+    dest_zip: str
+    weight_lbs: float
+    shipping_mode: str = "ground"
+    customer: str | None = None
+    warehouse: str | None = None
+    lead_id: int | None = None
+    shipped_on: str | None = None  # YYYY-MM-DD, defaults to today
+    shipment_ref: str | None = None
+
+class CarbonShipmentsPayload(BaseModel):
+    shipments: list[CarbonShipment]
+
+@app.post("/carbon/shipments")
+def record_carbon_shipments(payload: CarbonShipmentsPayload):
+    """
+    Bulk-loads shipments into the carbon ledger (emissions computed as one batch).
+    """
+    return carbon_ledger.record_shipments([s.model_dump() for s in payload.shipments])
+
+@app.get("/carbon/report")
+def get_carbon_report(group_by: str = "customer", limit: int | None = None):
+    """
+    ESG report from the pre-aggregated rollups: group_by=customer|warehouse|month|mode
+    """
+    try:
+        return carbon_ledger.report(group_by, limit)
+    except ValueError as e:
+        return {"status": "error", "detail": str(e)}
+
+@app.get("/carbon/summary")
+def get_carbon_summary():
+    return carbon_ledger.summary()
+
+@app.get("/carbon/leads/{lead_id}")
+def get_lead_carbon(lead_id: int):
+    shipments = carbon_ledger.shipments_for_lead(lead_id)
+    return {"lead_id": lead_id, "shipments": shipments,
+            "carbon_kg": round(sum(s["carbon_kg"] for s in shipments), 3)}
+
+@app.post("/carbon/rebuild")
+def rebuild_carbon_rollups():
+    """
+    Recomputes the rollups from the ledger (repair path; normal writes keep them current).
+    """
+    return {"status": "ok", "rollup_rows": carbon_ledger.rebuild_rollups()}
+
+# --- WEATHER RISK ---
+from services.weather import weather_cache
+
+@app.on_event("startup")
+def start_weather_refresher():
+    # Keeps the alert cache warm so risk checks never wait on the provider (per worker: in-process cache)
+    weather_cache.start_refresher()
+
+@app.get("/weather-risk")
+def get_weather_risk(zips: str):
+    """
+    Batch risk lookup: /weather-risk?zips=07001,78701
+    """
+    risks = weather_cache.risk_for_zips(z.strip() for z in zips.split(",") if z.strip())
+    return {"risks": {z: risk.to_dict() for z, risk in risks.items()}, "cache": weather_cache.status()}
+
+@app.get("/weather-risk/warehouses")
+def get_warehouse_weather_risk():
+    """
+    Risk for every warehouse in one call (keyed by warehouse code).
+    """
+    risks = weather_cache.risk_for_zips(wh["zip"] for wh in WAREHOUSE_DATA.values())
+    return {
+        "warehouses": {code: risks[wh["zip"]].to_dict() for code, wh in WAREHOUSE_DATA.items()},
+        "cache": weather_cache.status()
+    }
+
+# --- FACTORY LOAD ---
+
+@app.get("/factory-load")
+def get_factory_loads():
+    """
+    Every factory's backlog in one call, least loaded first.
+    """
+    return {"factories": factory_tracker.get_all_loads(), "least_loaded": factory_tracker.least_loaded()}
+
+@app.get("/factory-load/{factory_id}")
+def get_factory_load(factory_id: str):
+    """
+    One factory's backlog plus its queued jobs.
+    """
+    load = factory_tracker.get_load(factory_id)
+    if load is None:
+        return {"status": "error", "detail": f"Unknown factory: {factory_id}"}
+    return {**load, "queue": factory_tracker.queue(factory_id)}
+
+class ProductionJobPayload(BaseModel):
+    units: int
+    job_type: str = "PRINT"
+    lead_id: int | None = None
+    factory_id: str | None = None  # None = least loaded
+
+@app.post("/factory-load/jobs")
+def enqueue_production_job(payload: ProductionJobPayload):
+    """
+    Adds a job to a factory queue and returns its projected completion.
+    """
+    try:
+        return factory_tracker.enqueue(payload.units, payload.job_type, payload.lead_id, payload.factory_id)
+    except ValueError as e:
+        return {"status": "error", "detail": str(e)}
+
+@app.post("/factory-load/jobs/{job_id}/complete")
+def complete_production_job(job_id: int):
+    """
+    Marks a job done; later jobs in that factory's queue move up.
+    The lead's order ships with it, so its stock reservations are fulfilled.
+    """
+    job = factory_tracker.job(job_id)
+    completed = factory_tracker.finish(job_id)
+    shipped = 0
+    if completed and job["lead_id"] is not None:
+        shipped = inventory_store.fulfil_reference(f"lead-{job['lead_id']}")
+    return {"job_id": job_id, "completed": completed, "shipped_units": shipped}
+
+# --- BATCH ROUTING (Many orders, one pass) ---
+from services.batch_routing import route_orders
+
+class BatchOrder(BaseModel):
+    order_id: str
+    customer_zip: str
+    qty: int
+    sku: str
+    customer: str | None = None  # For the carbon ledger; defaults to the ZIP
+
+class BatchRoutingPayload(BaseModel):
+    orders: list[BatchOrder]
+    shipping_mode: str = "ground"
+    reserve: bool = False
+
+    @field_validator("orders")
+    @classmethod
+    def unique_order_ids(cls, orders: list[BatchOrder]) -> list[BatchOrder]:
+        # order_id keys the plans and the ledger refs of a batch
+        seen, duplicates = set(), set()
+        for order in orders:
+            (duplicates if order.order_id in seen else seen).add(order.order_id)
+        if duplicates:
+            raise ValueError(f"duplicate order_id: {', '.join(sorted(duplicates))}")
+        return orders
+
+@app.post("/logistics-batch-route")
+def batch_route_orders(payload: BatchRoutingPayload):
+    """
+    Routes a whole batch of orders at once.
+    Stock is shared jointly across the batch; returns per-order plans plus totals.
+    With reserve=true the planned units are also claimed in the inventory store.
+    """
+    orders = [order.model_dump() for order in payload.orders]
+    try:
+        result = route_orders(orders, payload.shipping_mode, reserve=payload.reserve)
+    except InsufficientStock as e:
+        return {"status": "error", "detail": str(e)}
+
+    if payload.reserve and result["summary"].get("reservation_id"):
+        # Book the reserved legs in the carbon ledger as one batch (voided again if the reservation is released or expires)
+        customers = {o["order_id"]: o["customer"] or o["customer_zip"] for o in orders}
+        reservation_id = result["summary"]["reservation_id"]
+        try:
+            carbon_ledger.record_shipments([
+                {
+                    "shipment_ref": f"{reservation_id}:{plan['order_id']}:{leg['from']}",
+                    "customer": customers.get(plan["order_id"]),
+                    "warehouse": leg["from"],
+                    "origin_zip": WAREHOUSE_DATA[leg["from"]]["zip"],
+                    "dest_zip": plan["customer_zip"],
+                    "weight_lbs": leg["qty"] * UNIT_WEIGHT_LBS,
+                    "shipping_mode": payload.shipping_mode
+                }
+                for plan in result["orders"] for leg in plan["shipments"]
+            ])
+        except Exception:
+            # Don't leave stock claimed for a batch the caller sees as failed
+            inventory_store.release(reservation_id)
+            raise
+    return result
+
+# --- INVENTORY SNAPSHOT & RESERVATIONS ---
+
+@app.on_event("startup")
+def start_inventory_refresher():
+    # Re-scrapes tracked SKUs in the background so logistics runs read a warm snapshot
+    leader.on_elected(inventory_store.start_refresher)
+
+@app.get("/inventory/{sku}")
+def get_inventory(sku: str):
+    """
+    Returns available/reserved/on-hand stock per warehouse with freshness metadata.
+    """
+    return inventory_store.snapshot(sku)
+
+@app.post("/inventory/{sku}/refresh")
+def refresh_inventory(sku: str):
+    """
+    Forces a re-scrape of one SKU.
+    """
+    inventory_store.refresh_sku(sku)
+    return inventory_store.snapshot(sku)
+
+class ReservationPayload(BaseModel):
+    sku: str
+    qty: int
+    reference: str | None = None
+    preference: list[str] | None = None  # Warehouse labels to draw from first
+
+@app.post("/inventory/reservations")
+def create_reservation(payload: ReservationPayload):
+    """
+    Atomically reserves units of a SKU across warehouses.
+    """
+    try:
+        return inventory_store.reserve_order(payload.sku, payload.qty, payload.reference, payload.preference)
+    except InsufficientStock as e:
+        return {"status": "error", "detail": str(e), "available": e.available}
+
+@app.post("/inventory/reservations/{reservation_id}/release")
+def release_reservation(reservation_id: str):
+    """
+    Returns a reservation's units to available stock.
+    """
+    return {"reservation_id": reservation_id, "released_units": inventory_store.release(reservation_id)}
+
+@app.post("/inventory/reservations/{reservation_id}/fulfil")
+def fulfil_reservation(reservation_id: str):
+    """
+    The reserved units shipped: they leave on-hand and reserved stock together.
+    """
+    return {"reservation_id": reservation_id, "shipped_units": inventory_store.fulfil(reservation_id)}
+
+# --- LEAD RECORDS (typed strategy / design / logistics rows for dashboards) ---
+from services import lead_records
+
+@app.get("/leads/{lead_id}/records")
+def get_lead_records(lead_id: int, history: bool = False):
+    """
+    Current strategy, design and logistics plan for a lead (history=true adds earlier versions).
+    """
+    return lead_records.lead_records(lead_id, history)
+
+@app.get("/records/strategies")
+def list_strategies(min_score: int | None = None, sentiment: str | None = None, limit: int = 100):
+    return {"strategies": lead_records.query_strategies(min_score, sentiment, limit)}
+
+@app.get("/records/designs")
+def list_designs(min_margin: float | None = None, max_cost: float | None = None,
+                 technique: str | None = None, limit: int = 100):
+    return {"designs": lead_records.query_designs(min_margin, max_cost, technique, limit)}
+
+@app.get("/records/logistics-plans")
+def list_logistics_plans(max_carbon: float | None = None, max_cost: float | None = None,
+                         insufficient_stock: bool | None = None, limit: int = 100):
+    return {"plans": lead_records.query_logistics_plans(max_carbon, max_cost, insufficient_stock, limit)}
+
+@app.get("/records/summary")
+def get_pipeline_summary():
+    """
+    Dashboard aggregates: average lead score, design cost/margin, total logistics cost and carbon.
+    """
+    return lead_records.pipeline_summary()
+
+# --- RUN METRICS (tokens, latency and cost per agent run) ---
+from services import metrics
+
+@app.get("/metrics")
+def get_metrics():
+    """
+    Prometheus scrape endpoint: runs, model calls/tokens/cost, tool wall time and images per agent.
+    """
+    return Response(content=metrics.prometheus_text(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/runs/{lead_id}/profile")
+def get_run_profile(lead_id: int, limit: int = 10):
+    """
+    Latest agent runs for a lead, each broken down by model and tool (slowest first).
+    """
+    return metrics.run_profile(lead_id, limit)
+
+# --- TRACES (request -> agent run -> model / tool calls -> DB writes) ---
+@app.get("/traces")
+def list_traces(limit: int = 50, lead_id: int | None = None):
+    """
+    Newest traces in this process (root span, duration, span count, errors, leads touched).
+    With --workers > 1 each worker keeps its own traces; this shows the one that served the request.
+    """
+    return {"traces": tracing.recent_traces(limit, lead_id)}
+
+@app.get("/traces/{trace_id}")
+def get_trace(trace_id: str):
+    """
+    One trace as a waterfall: spans in start order with depth, offset and duration.
+    """
+    trace = tracing.trace_tree(trace_id)
+    if trace is None:
+        return {"status": "error", "detail": "Trace not found (or evicted)"}
+    return trace
+
+# --- LOGGING (per-module levels and DEBUG sampling, changeable at runtime) ---
+import logging_config
+
+class LogLevelsPayload(BaseModel):
+    levels: dict[str, str] = {}
+    debug_sample: float | None = None
+
+@app.get("/logging/levels")
+def get_log_levels():
+    return logging_config.get_levels()
+
+@app.put("/logging/levels")
+def set_log_levels(payload: LogLevelsPayload):
+    """
+    e.g. {"levels": {"agents.runtime": "DEBUG", "httpx": "WARNING"}, "debug_sample": 0.1}
+    """
+    try:
+        return logging_config.set_levels(payload.levels, payload.debug_sample)
+    except ValueError as e:
+        return {"status": "error", "detail": str(e)}
 
 if __name__ == "__main__":
+    import argparse
+    import os
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+
+    parser = argparse.ArgumentParser(description="Fresh Prints OS API server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", "1")),
+                        help="uvicorn worker processes (default $WEB_CONCURRENCY or 1)")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        # Every piece of shared state must live in SQLite: agent checkpoints move out of
+        # MemorySaver so any worker can resume any paused run (no sticky routing needed).
+        # Workers import this module fresh, so the environment is how they see it.
+        import sys
+        os.environ["AGENT_CHECKPOINTER"] = "sqlite"
+        os.environ.setdefault("LOG_FILE", "agent_debug.{pid}.log")
+        from database import enable_wal
+        enable_wal()
+        # Through the uvicorn CLI rather than uvicorn.run(): spawned workers would re-import this
+        # script as __mp_main__ before the app, doubling the (slow) startup the healthcheck waits on
+        os.execv(sys.executable, [
+            sys.executable, "-m", "uvicorn", "main:app", "--host", args.host, "--port", str(args.port),
+            "--workers", str(args.workers), "--app-dir", os.path.dirname(os.path.abspath(__file__)),
+            "--timeout-worker-healthcheck", os.environ.get("WORKER_STARTUP_TIMEOUT", "120")
+        ])
+    else:
+        uvicorn.run(app, host=args.host, port=args.port)
\ No newline at end of file
@@ -1,10 +1,14 @@
 from mcp.server.fastmcp import FastMCP
 from langchain_community.tools import DuckDuckGoSearchRun
 from langchain_community.utilities import DuckDuckGoSearchAPIWrapper
-from bs4 import BeautifulSoup
-from geopy.distance import geodesic
+from services import geo, zip_index, forecasting, lead_records, metrics
+from services.carbon import EMISSION_FACTORS, LBS_TO_TONS, TREE_KG_PER_YEAR, eco_rating
+from services.rate_cache import live_rate_cache, quote_key
+from services.inventory import inventory_store
+from services.weather import weather_cache
+from services.factory_load import factory_tracker
+from services.results import InventoryReport, ShippingQuote, CarbonEstimate, CarrierRate, RateComparison
 import sys
-import sqlite3
 import random # For simulating factory queue times
 
 # Fix UnicodeEncodeError on Windows 
@@ -128,14 +132,7 @@ def save_lead_strategy(lead_id: int, strategy: str, email_draft: str, sentiment:
     Also stores sentiment analysis and lead score.
     """
     print(f"💾 SCOUT: Saving Strategy for Lead {lead_id}")
-    conn = sqlite3.connect("fresh_prints.db")
-    cursor = conn.cursor()
-    cursor.execute(
-        "UPDATE leads SET status='DRAFTED', vibe_tags=?, draft_email=? WHERE id=?",
-        (f"{strategy} | Sentiment: {sentiment} | Score: {lead_score}", email_draft, lead_id)
-    )
-    conn.commit()
-    conn.close()
+    lead_records.save_strategy(lead_id, strategy, email_draft, sentiment, lead_score)
     return f"Success - Lead Score: {lead_score}, Sentiment: {sentiment}"
 
 @mcp.tool()
@@ -239,6 +236,7 @@ News: {news_content[:1000]}"""
             }],
             max_tokens=100
         )
+        metrics.record_completion(response)
         return response.choices[0].message.content
     except Exception as e:
         return f"SENTIMENT: NEUTRAL\nREASONING: Could not analyze - {e}\nRECOMMENDED_TONE: formal"
@@ -282,6 +280,7 @@ def generate_apparel_image(prompt: str) -> str:
             quality="standard",
             n=1,
         )
+        metrics.record_images(len(response.data))
         url = response.data[0].url
         return url
     except Exception as e:
@@ -323,6 +322,7 @@ def check_copyright_safety(image_url: str) -> str:
             ],
             max_tokens=50,
         )
+        metrics.record_completion(response)
         return response.choices[0].message.content
     except Exception as e:
         return f"Vision Check Error: {e}"
@@ -376,14 +376,7 @@ def save_final_design(lead_id: int, image_url: str, cost_report: str, color_coun
     Saves the approved design to the database with full metadata.
     """
     print(f"💾 DESIGNER: Saving Final Design for Lead {lead_id}")
-    conn = sqlite3.connect("fresh_prints.db")
-    cursor = conn.cursor()
-    cursor.execute(
-        "UPDATE leads SET status='DESIGN_READY', draft_email=? WHERE id=?",
-        (f"Design: {image_url} | {cost_report} | Colors: {color_count} | Technique: {print_technique} | Margin: {profit_margin}%", lead_id)
-    )
-    conn.commit()
-    conn.close()
+    lead_records.save_design(lead_id, image_url, cost_report, color_count, print_technique, profit_margin)
     return json.dumps({
         "status": "Design Saved",
         "colors": color_count,
@@ -418,6 +411,7 @@ def generate_design_variations(prompt: str, num_variations: int = 3) -> str:
                 quality="standard",
                 n=1,
             )
+            metrics.record_images(len(response.data))
             variations.append({
                 "style": style_name,
                 "description": style_desc,
@@ -448,6 +442,7 @@ def render_on_mockup(design_url: str, shirt_color: str = "white") -> str:
             quality="standard",
             n=1,
         )
+        metrics.record_images(len(response.data))
         return json.dumps({
             "mockup_url": response.data[0].url,
             "shirt_color": shirt_color,
@@ -528,6 +523,7 @@ def apply_style_reference(design_prompt: str, reference_style: str) -> str:
             quality="standard",
             n=1,
         )
+        metrics.record_images(len(response.data))
         return json.dumps({
             "url": response.data[0].url,
             "applied_style": reference_style,
@@ -656,15 +652,8 @@ def recommend_print_technique(num_colors: int, order_qty: int, has_gradients: bo
 
 import json  # Ensure json is imported for the new tools
 
-# In a real app, you'd load a massive ZIP database. 
-# For this demo, we mock the 'Geocoding' of a few key Zips to prove the Math works.
-ZIP_COORDS = {
-    "07001": (40.57, -74.29), # NJ Warehouse (Avenel)
-    "78701": (30.26, -97.74), # TX Warehouse (Austin)
-    "90001": (33.97, -118.24),# CA Warehouse (Los Angeles)
-    "10001": (40.71, -74.00), # NYC (Customer)
-    "94043": (37.42, -122.08) # Mountain View (Customer)
-}
+# Geocoding comes from the full US ZIP index (services/zip_index.py).
+# Unknown ZIPs fall back to their ZIP3 centroid, then to the center of the US.
 
 # --- 1. THE INVENTORY SCRAPER (Handling Legacy Data) ---
 @mcp.tool()
@@ -673,53 +662,49 @@ def scrape_supplier_inventory(sku: str) -> str:
     Scrapes the (simulated) 'Legacy Supplier Portal' to find stock levels 
     at NJ, TX, and CA warehouses.
     """
-    print(f"📦 LOGISTICS: Scraping Supplier Portal for {sku}...")
-    
-    # 1. Simulate fetching raw HTML from a legacy intranet site (no API available)
-    # This represents the "Real World" messiness of logistics
-    raw_html = f"""
-    <html>
-        <body>
-            <h1>Supplier Stock Portal - {sku}</h1>
-            <table id="inventory-table">
-                <tr><th>Warehouse</th><th>Qty</th><th>Status</th></tr>
-                <tr class="row-nj"><td>New Jersey (NJ)</td><td>150</td><td>Active</td></tr>
-                <tr class="row-tx"><td>Texas (TX)</td><td>100</td><td>Active</td></tr>
-                <tr class="row-ca"><td>California (CA)</td><td>50</td><td>Active</td></tr>
-            </table>
-        </body>
-    </html>
+    return get_supplier_inventory(sku).to_json()
+
+def get_supplier_inventory(sku: str) -> InventoryReport:
+    """Typed inventory lookup, served from the snapshot store (services/inventory.py)."""
+    print(f"📦 LOGISTICS: Reading Supplier Inventory for {sku}...")
+    snap = inventory_store.snapshot(sku)
+    report = InventoryReport(
+        sku=sku,
+        stock=snap["available"],
+        reserved=snap["reserved"],
+        scraped_at=snap["scraped_at"],
+        age_seconds=snap["age_seconds"],
+        stale=snap["stale"]
+    )
+    print(f"   Inventory Found: {report.stock} (as of {report.scraped_at})")
+    return report
+
+def fetch_supplier_stock(sku: str) -> dict:
     """
-    
-    # 2. Parse it with BeautifulSoup (The Skill you need to show)
-    soup = BeautifulSoup(raw_html, 'html.parser')
-    stock_report = {}
-    
-    rows = soup.find_all('tr')
-    for row in rows[1:]: # Skip header
-        cols = row.find_all('td')
-        loc = cols[0].text.strip()
-        qty = int(cols[1].text.strip())
-        stock_report[loc] = qty
-        
-    print(f"   Inventory Found: {stock_report}")
-    return str(stock_report)
+    Returns {warehouse label: available qty} from the inventory snapshot.
+    Shared by the scraper tool and the batch routing engine.
+    """
+    return inventory_store.snapshot(sku)["available"]
 
 # --- 2. THE ZONE-BASED RATE ENGINE (Real Math) ---
 @mcp.tool()
 def calculate_shipping_rates(origin_zip: str, dest_zip: str, weight_lbs: float) -> str:
     """
     Calculates Real Shipping Cost based on Distance (Zones) and Weight.
-    Uses Haversine formula via Geopy.
+    Uses the memoized Vincenty distance engine (services/geo.py).
     """
+    return quote_shipping_rate(origin_zip, dest_zip, weight_lbs).to_json()
+
+def quote_shipping_rate(origin_zip: str, dest_zip: str, weight_lbs: float) -> ShippingQuote:
+    """Typed zone-based rate quote used by internal callers."""
     print(f"🚚 LOGISTICS: Calculating Rates {origin_zip} -> {dest_zip}")
     
     # 1. Get Coordinates (In prod, query a SQL DB of Zips)
-    coord_a = ZIP_COORDS.get(origin_zip, (40.0, -100.0)) # Default to center US
-    coord_b = ZIP_COORDS.get(dest_zip, (40.0, -100.0))
+    coord_a = zip_index.lookup_coords(origin_zip)
+    coord_b = zip_index.lookup_coords(dest_zip)
     
     # 2. Calculate Distance in Miles (The Hard Math)
-    miles = geodesic(coord_a, coord_b).miles
+    miles = geo.distance_miles(coord_a, coord_b)
     
     # 3. Determine Zone (Industry Standard Logic)
     if miles < 150: zone = 2
@@ -734,15 +719,29 @@ def calculate_shipping_rates(origin_zip: str, dest_zip: str, weight_lbs: float)
     
     days_in_transit = zone // 2 + 1 # Rough estimate: Zone 8 = 5 days
     
-    result = {
-        "carrier": "FedEx Ground",
-        "zone": zone,
-        "miles": int(miles),
-        "cost": round(total_rate, 2),
-        "eta_days": days_in_transit
-    }
-    print(f"   {result}")
-    return str(result)
+    quote = ShippingQuote(
+        carrier="FedEx Ground",
+        zone=zone,
+        miles=int(miles),
+        cost=round(total_rate, 2),
+        eta_days=days_in_transit
+    )
+    print(f"   {quote}")
+    return quote
+
+def _parse_inventory_data(inventory_data: str) -> dict:
+    """
+    The LLM passes the scraper output back as text: JSON normally, but it
+    sometimes echoes a Python dict repr instead, so accept both.
+    """
+    try:
+        data = json.loads(inventory_data)
+    except json.JSONDecodeError:
+        import ast
+        data = ast.literal_eval(inventory_data)
+    # Full inventory report -> just the available stock
+    stock = data.get("stock")
+    return stock if isinstance(stock, dict) else data
 
 # --- 3. THE SPLIT-SHIPMENT OPTIMIZER (The Algorithm) ---
 @mcp.tool()
@@ -750,11 +749,10 @@ def optimize_split_shipment(order_qty: int, inventory_data: str, customer_zip: s
     """
     Solves the Split-Inventory Problem.
     Compares Cost of Split vs. Backorder.
-    inventory_data: string representation of dict from scraper.
+    inventory_data: the JSON inventory report from scrape_supplier_inventory.
     """
     print(f"🧠 LOGISTICS: Solving Split-Shipment Algorithm...")
-    import ast
-    stock = ast.literal_eval(inventory_data) # Safely parse the scraper output
+    stock = _parse_inventory_data(inventory_data)
     
     # Hardcoded Warehouse Zips for calculation
     warehouse_zips = {
@@ -777,18 +775,16 @@ def optimize_split_shipment(order_qty: int, inventory_data: str, customer_zip: s
         if qty > 0:
             take = min(qty, order_qty - current_fill)
             
-            # Calculate cost for this partial shipment
-            # We call our OWN rate tool logic internally here
-            # (In a real class structure, we'd reuse the function directly)
+            # Calculate cost for this partial shipment using the typed rate engine
             w_zip = warehouse_zips.get(loc, "07001")
             
             # Mocking the weight for the partial
-            rate_info = calculate_shipping_rates(w_zip, customer_zip, take * 0.5) 
+            quote = quote_shipping_rate(w_zip, customer_zip, take * 0.5)
             
             shipments.append({
                 "from": loc,
                 "qty": take,
-                "cost_info": rate_info
+                "quote": quote
             })
             current_fill += take
             
@@ -799,12 +795,9 @@ def optimize_split_shipment(order_qty: int, inventory_data: str, customer_zip: s
     total_cost = 0
     plan_details = []
     for s in shipments:
-        # Extract cost from the string/dict we got back
-        # This is a bit messy because of the string passing in tools, but works for the agent
-        import ast
-        cost_dict = ast.literal_eval(s['cost_info'])
-        total_cost += cost_dict['cost']
-        plan_details.append(f"Ship {s['qty']} from {s['from']} (${cost_dict['cost']})")
+        cost = s['quote'].cost
+        total_cost += cost
+        plan_details.append(f"Ship {s['qty']} from {s['from']} (${cost})")
         
     return f"OPTIMAL PLAN: Split Shipment. { ' + '.join(plan_details) }. TOTAL COST: ${total_cost:.2f}"
 
@@ -813,45 +806,47 @@ def optimize_split_shipment(order_qty: int, inventory_data: str, customer_zip: s
 def check_weather_risk(location_zip: str) -> str:
     """
     Checks for severe weather events (Hurricanes, Blizzards) at a location.
-    Uses DuckDuckGo to find active alerts since we don't have a Weather API key.
+    Reads the structured alert cache (services/weather.py), refreshed in the background.
     """
     print(f"⛈️ LOGISTICS: Checking Weather Risk for Zip {location_zip}...")
-    
-    # In a real app, you'd hit OpenWeatherMap API. 
-    # Here, we show "Agentic Reasoning" by searching news.
-    query = f"Severe weather warning alert {location_zip} current"
-    try:
-        search_result = search.run(query)
-        
-        # Simple Sentiment Analysis on the search result
-        risks = ["hurricane", "blizzard", "flood", "tornado", "severe thunderstorm"]
-        found_risks = [r for r in risks if r in search_result.lower()]
-        
-        if found_risks:
-            return f"CRITICAL: Weather Alert Detected ({', '.join(found_risks)}). Shipping delays likely."
-        return "CLEAR: No major alerts found."
-    except Exception:
-        return "WARNING: Could not verify weather."
+    return weather_cache.risk_for_zip(location_zip).message()
+
+@mcp.tool()
+def check_weather_risk_batch(location_zips: list[str]) -> str:
+    """
+    Checks weather risk for several ZIPs (e.g. every warehouse) in one call.
+    Returns one line per ZIP: '<zip>: <CRITICAL/CLEAR message>'.
+    """
+    print(f"⛈️ LOGISTICS: Checking Weather Risk for {len(location_zips)} ZIPs...")
+    risks = weather_cache.risk_for_zips(location_zips)
+    return "\n".join(f"{zip_code}: {risk.message()}" for zip_code, risk in risks.items())
 
 # --- 5. PRODUCTION LOAD BALANCER ---
 @mcp.tool()
 def check_factory_load(factory_id: str) -> str:
     """
-    Simulates querying the Production Database for queue times.
+    Queries the production queue (services/factory_load.py) for a factory's backlog.
     Returns the 'Days to Print'.
     """
     print(f"🏭 LOGISTICS: Checking Load for Factory {factory_id}...")
-    
-    # Simulate Real-Time DB Query
-    # Factory A (Austin) is busy. Factory B (New Jersey) is empty.
-    loads = {
-        "FACTORY_TX": {"queue_days": 5, "status": "OVERLOADED"},
-        "FACTORY_NJ": {"queue_days": 0, "status": "IDLE"},
-        "FACTORY_CA": {"queue_days": 2, "status": "NORMAL"}
-    }
-    
-    data = loads.get(factory_id, {"queue_days": 3, "status": "UNKNOWN"})
-    return f"Factory {factory_id}: {data['queue_days']} day backlog ({data['status']})."
+    load = factory_tracker.get_load(factory_id)
+    if load is None:
+        return f"Factory {factory_id}: 3 day backlog (UNKNOWN)."
+    return f"Factory {factory_id}: {load['queue_days']} day backlog ({load['status']})."
+
+@mcp.tool()
+def check_all_factory_loads() -> str:
+    """
+    Backlog of EVERY factory in one call, least loaded first,
+    with the projected date each queue clears.
+    """
+    print(f"🏭 LOGISTICS: Checking Load for All Factories...")
+    lines = [
+        f"Factory {load['factory_id']}: {load['queue_days']} day backlog ({load['status']}). "
+        f"Free from {load['projected_free_at']}."
+        for load in factory_tracker.get_all_loads()
+    ]
+    return "\n".join(lines)
 
 # --- 6. THE SAVER ---
 @mcp.tool()
@@ -860,14 +855,7 @@ def save_logistics_plan(lead_id: int, plan_details: str, total_cost: float, carb
     Saves the Final Routing Plan with carbon footprint data.
     """
     print(f"💾 LOGISTICS: Saving Plan for Lead {lead_id}")
-    conn = sqlite3.connect("fresh_prints.db")
-    cursor = conn.cursor()
-    cursor.execute(
-        "UPDATE leads SET status='SHIPPING_PLANNED', draft_email=? WHERE id=?",
-        (f"Logistics Plan: {plan_details} | Cost: ${total_cost} | Carbon: {carbon_kg:.2f}kg CO2", lead_id)
-    )
-    conn.commit()
-    conn.close()
+    lead_records.save_logistics_plan(lead_id, plan_details, total_cost, carbon_kg)
     return "Logistics Plan Saved"
 
 # --- 7. DEMAND FORECASTING ---
@@ -878,78 +866,16 @@ def get_demand_forecast(sku: str, days_ahead: int = 7) -> str:
     Returns daily forecasts with confidence intervals.
     Useful for proactive inventory management.
     """
-    import json
-    import random
-    from datetime import datetime, timedelta
-    
     print(f"📈 LOGISTICS: Forecasting demand for {sku} ({days_ahead} days)")
-    
-    # Simulated forecast based on SKU category
-    base_demand = {
-        "CREW-NECK": 45,
-        "HOODIE": 30,
-        "POLO": 20,
-        "TANK": 35,
-        "LONG-SLEEVE": 25
-    }
-    
-    # Get base for this SKU
-    sku_base = 30
-    for key, val in base_demand.items():
-        if key in sku.upper():
-            sku_base = val
-            break
-    
-    # Generate daily forecasts with variance
-    forecasts = []
-    today = datetime.now()
-    
-    for i in range(days_ahead):
-        day = today + timedelta(days=i+1)
-        
-        # Weekend boost (Sat/Sun)
-        day_multiplier = 1.3 if day.weekday() >= 5 else 1.0
-        
-        # Random variance ±20%
-        variance = random.uniform(0.8, 1.2)
-        predicted = int(sku_base * day_multiplier * variance)
-        
-        forecasts.append({
-            "date": day.strftime("%Y-%m-%d"),
-            "day_name": day.strftime("%A"),
-            "predicted_orders": predicted,
-            "confidence": random.randint(75, 95)
-        })
-    
-    total_predicted = sum(f["predicted_orders"] for f in forecasts)
-    peak_day = max(forecasts, key=lambda x: x["predicted_orders"])
-    
-    result = {
-        "sku": sku,
-        "forecast_period": f"Next {days_ahead} days",
-        "total_predicted_orders": total_predicted,
-        "avg_daily": round(total_predicted / days_ahead, 1),
-        "peak_day": peak_day["day_name"],
-        "peak_orders": peak_day["predicted_orders"],
-        "daily_forecast": forecasts,
-        "recommendation": "STOCK UP" if total_predicted > 200 else "NORMAL LEVELS"
-    }
-    
-    print(f"   Forecast: {total_predicted} orders over {days_ahead} days")
+    result = forecasting.get_forecast(sku, days_ahead)
+    print(f"   Forecast: {result['total_predicted_orders']} orders over {days_ahead} days ({result['model']})")
     return json.dumps(result)
 
 # ==========================================
 # 🌱 CARBON FOOTPRINT CALCULATOR
 # ==========================================
 
-# Emission factors (kg CO2 per ton-km)
-# Source: EPA & DEFRA guidelines
-EMISSION_FACTORS = {
-    "ground": 0.062,    # Truck/FedEx Ground
-    "air": 0.602,       # Air freight (10x more than ground)
-    "rail": 0.022,      # Rail freight (most eco-friendly)
-    "ocean": 0.008      # Ocean freight
-}
+# Emission factors live in services/carbon.py (shared with the carbon ledger)
 
 @mcp.tool()
 def calculate_carbon_footprint(origin_zip: str, dest_zip: str, weight_lbs: float, shipping_mode: str = "ground") -> str:
@@ -958,15 +884,19 @@ def calculate_carbon_footprint(origin_zip: str, dest_zip: str, weight_lbs: float
     Uses EPA emission factors for different transport modes.
     Returns kg of CO2 emitted.
     """
+    return estimate_carbon_footprint(origin_zip, dest_zip, weight_lbs, shipping_mode).to_json()
+
+def estimate_carbon_footprint(origin_zip: str, dest_zip: str, weight_lbs: float, shipping_mode: str = "ground") -> CarbonEstimate:
+    """Typed carbon estimate used by internal callers and the HTTP endpoint."""
     print(f"🌱 LOGISTICS: Calculating Carbon Footprint {origin_zip} -> {dest_zip}")
     
     # Get coordinates and calculate distance
-    coord_a = ZIP_COORDS.get(origin_zip, (40.0, -100.0))
-    coord_b = ZIP_COORDS.get(dest_zip, (40.0, -100.0))
-    distance_km = geodesic(coord_a, coord_b).km
+    coord_a = zip_index.lookup_coords(origin_zip)
+    coord_b = zip_index.lookup_coords(dest_zip)
+    distance_km = geo.distance_km(coord_a, coord_b)
     
     # Convert weight to metric tons
-    weight_tons = weight_lbs * 0.000453592
+    weight_tons = weight_lbs * LBS_TO_TONS
     
     # Get emission factor
     factor = EMISSION_FACTORS.get(shipping_mode.lower(), EMISSION_FACTORS["ground"])
@@ -975,18 +905,18 @@ def calculate_carbon_footprint(origin_zip: str, dest_zip: str, weight_lbs: float
     carbon_kg = weight_tons * distance_km * factor
     
     # Calculate equivalent (for context)
-    trees_offset = carbon_kg / 21.77  # Avg tree absorbs 21.77 kg CO2/year
+    trees_offset = carbon_kg / TREE_KG_PER_YEAR
     
-    result = {
-        "carbon_kg": round(carbon_kg, 2),
-        "distance_km": round(distance_km, 1),
-        "shipping_mode": shipping_mode,
-        "trees_to_offset": round(trees_offset, 2),
-        "eco_rating": "🌱 LOW" if carbon_kg < 5 else ("🌿 MODERATE" if carbon_kg < 20 else "🔥 HIGH")
-    }
+    result = CarbonEstimate(
+        carbon_kg=round(carbon_kg, 2),
+        distance_km=round(distance_km, 1),
+        shipping_mode=shipping_mode,
+        trees_to_offset=round(trees_offset, 2),
+        eco_rating=eco_rating(carbon_kg)
+    )
     
     print(f"   Carbon: {result}")
-    return str(result)
+    return result
 
 # ==========================================
 # 📦 LIVE SHIPPING RATES (Shippo API)
@@ -999,72 +929,33 @@ def get_live_shipping_rates(origin_zip: str, dest_zip: str, weight_lbs: float, l
     Falls back to simulated rates if API key not configured.
     Returns comparison of USPS, FedEx, and UPS rates.
     """
+    return compare_carrier_rates(origin_zip, dest_zip, weight_lbs, length, width, height).to_json()
+
+def compare_carrier_rates(origin_zip: str, dest_zip: str, weight_lbs: float, length: float = 12, width: float = 10, height: float = 8) -> RateComparison:
+    """Typed carrier comparison used by internal callers and the HTTP endpoint."""
     print(f"📦 LOGISTICS: Fetching Live Rates {origin_zip} -> {dest_zip}")
     
     SHIPPO_API_KEY = os.environ.get("SHIPPO_API_KEY")
     
     if SHIPPO_API_KEY and SHIPPO_API_KEY.startswith("shippo"):
-        try:
-            # Real Shippo API call
-            headers = {
-                "Authorization": f"ShippoToken {SHIPPO_API_KEY}",
-                "Content-Type": "application/json"
-            }
-            
-            shipment_data = {
-                "address_from": {
-                    "zip": origin_zip,
-                    "country": "US"
-                },
-                "address_to": {
-                    "zip": dest_zip,
-                    "country": "US"
-                },
-                "parcels": [{
-                    "length": str(length),
-                    "width": str(width),
-                    "height": str(height),
-                    "distance_unit": "in",
-                    "weight": str(weight_lbs),
-                    "mass_unit": "lb"
-                }],
-                "async": False
-            }
-            
-            response = requests.post(
-                "https://api.goshippo.com/shipments/",
-                headers=headers,
-                json=shipment_data,
-                timeout=10
-            )
-            
-            if response.status_code == 201:
-                shipment = response.json()
-                rates = []
-                for rate in shipment.get("rates", [])[:6]:  # Top 6 rates
-                    rates.append({
-                        "carrier": rate.get("provider", "Unknown"),
-                        "service": rate.get("servicelevel", {}).get("name", "Standard"),
-                        "price": float(rate.get("amount", 0)),
-                        "currency": rate.get("currency", "USD"),
-                        "days": rate.get("estimated_days", "N/A"),
-                        "carrier_logo": get_carrier_logo(rate.get("provider", ""))
-                    })
-                
-                if rates:
-                    print(f"   ✓ Got {len(rates)} live rates from Shippo")
-                    return str({"source": "LIVE_API", "rates": sorted(rates, key=lambda x: x["price"])})
-        
-        except Exception as e:
-            print(f"   ⚠️ Shippo API error: {e}")
+        # Quotes are cached per (origin, dest ZIP3, weight bucket, dims bucket)
+        key = quote_key(origin_zip, dest_zip, weight_lbs, length, width, height)
+        _, _, bucket_weight, bucket_dims = key
+        rates, cache_status = live_rate_cache.get(
+            key,
+            lambda: _fetch_shippo_rates(SHIPPO_API_KEY, origin_zip, dest_zip, bucket_weight, *bucket_dims)
+        )
+        if rates:
+            print(f"   ✓ {len(rates)} live rates (cache: {cache_status})")
+            return RateComparison(source="LIVE_API", rates=list(rates))
     
     # Fallback: Simulated realistic rates
     print(f"   📊 Using simulated carrier rates")
     
     # Calculate base distance for pricing
-    coord_a = ZIP_COORDS.get(origin_zip, (40.0, -100.0))
-    coord_b = ZIP_COORDS.get(dest_zip, (40.0, -100.0))
-    miles = geodesic(coord_a, coord_b).miles
+    coord_a = zip_index.lookup_coords(origin_zip)
+    coord_b = zip_index.lookup_coords(dest_zip)
+    miles = geo.distance_miles(coord_a, coord_b)
     
     # Simulated carrier rates (realistic pricing formulas)
     simulated_rates = [
@@ -1112,7 +1003,69 @@ def get_live_shipping_rates(origin_zip: str, dest_zip: str, weight_lbs: float, l
         }
     ]
     
-    return str({"source": "SIMULATED", "rates": sorted(simulated_rates, key=lambda x: x["price"])})
+    rates = [CarrierRate(**rate) for rate in simulated_rates]
+    return RateComparison(source="SIMULATED", rates=sorted(rates, key=lambda r: r.price))
+
+def _fetch_shippo_rates(api_key: str, origin_zip: str, dest_zip: str, weight_lbs: float,
+                        length: float, width: float, height: float) -> list[CarrierRate] | None:
+    """
+    One Shippo shipment quote. Returns rates sorted by price, or None on failure.
+    SHIPPO_API_URL can point at a stand-in server (stubs/shippo_server.py).
+    """
+    api_url = os.environ.get("SHIPPO_API_URL", "https://api.goshippo.com").rstrip("/")
+    try:
+        # Real Shippo API call
+        headers = {
+            "Authorization": f"ShippoToken {api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        shipment_data = {
+            "address_from": {
+                "zip": origin_zip,
+                "country": "US"
+            },
+            "address_to": {
+                "zip": dest_zip,
+                "country": "US"
+            },
+            "parcels": [{
+                "length": str(length),
+                "width": str(width),
+                "height": str(height),
+                "distance_unit": "in",
+                "weight": str(weight_lbs),
+                "mass_unit": "lb"
+            }],
+            "async": False
+        }
+        
+        response = requests.post(
+            f"{api_url}/shipments/",
+            headers=headers,
+            json=shipment_data,
+            timeout=10
+        )
+        
+        if response.status_code == 201:
+            shipment = response.json()
+            rates = []
+            for rate in shipment.get("rates", [])[:6]:  # Top 6 rates
+                rates.append(CarrierRate(
+                    carrier=rate.get("provider", "Unknown"),
+                    service=rate.get("servicelevel", {}).get("name", "Standard"),
+                    price=float(rate.get("amount", 0)),
+                    currency=rate.get("currency", "USD"),
+                    days=rate.get("estimated_days", "N/A"),
+                    carrier_logo=get_carrier_logo(rate.get("provider", ""))
+                ))
+            if rates:
+                return sorted(rates, key=lambda r: r.price)
+        print(f"   ⚠️ Shippo API returned {response.status_code}")
+    
+    except Exception as e:
+        print(f"   ⚠️ Shippo API error: {e}")
+    return None
 
 def get_carrier_logo(carrier: str) -> str:
     """Returns emoji logo for carrier."""
@@ -1157,26 +1110,18 @@ WAREHOUSE_DATA = {
     }
 }
 
-# Common destination cities for demo
-CITY_COORDS = {
-    "10001": {"city": "New York, NY", "lat": 40.71, "lng": -74.00},
-    "94043": {"city": "Mountain View, CA", "lat": 37.42, "lng": -122.08},
-    "78701": {"city": "Austin, TX", "lat": 30.26, "lng": -97.74},
-    "60601": {"city": "Chicago, IL", "lat": 41.88, "lng": -87.63},
-    "98101": {"city": "Seattle, WA", "lat": 47.60, "lng": -122.33},
-    "33101": {"city": "Miami, FL", "lat": 25.76, "lng": -80.19},
-    "02101": {"city": "Boston, MA", "lat": 42.36, "lng": -71.06},
-}
-
 def get_route_data(customer_zip: str, active_warehouses: list = None) -> dict:
     """
     Returns all data needed for map visualization.
     """
     # Get customer coordinates
-    if customer_zip in CITY_COORDS:
-        customer = CITY_COORDS[customer_zip]
-    else:
+    found = zip_index.lookup(customer_zip)
+    if found and found["city"]:
+        customer = {"city": f"{found['city']}, {found['state']}", "lat": found["lat"], "lng": found["lng"]}
+    elif found:
         # Approximate location from ZIP (first 3 digits = region)
+        customer = {"city": f"ZIP {customer_zip} ({found['state']})", "lat": found["lat"], "lng": found["lng"]}
+    else:
         customer = {"city": f"ZIP {customer_zip}", "lat": 40.0, "lng": -100.0}
     
     customer["zip"] = customer_zip
@@ -1194,7 +1139,7 @@ def get_route_data(customer_zip: str, active_warehouses: list = None) -> dict:
     routes = []
     for wh in warehouses:
         if wh["active"]:
-            dist = geodesic((wh["lat"], wh["lng"]), (customer["lat"], customer["lng"])).miles
+            dist = geo.distance_miles((wh["lat"], wh["lng"]), (customer["lat"], customer["lng"]))
             routes.append({
                 "from": wh["id"],
                 "from_lat": wh["lat"],
@@ -0,0 +1,151 @@
+"""
+Customer approval links (the Apparel Chair's approve / reject URLs).
+
+Tokens used to live in a module-level dict in main.py: never expired unless
+clicked, lost on restart, invisible to a second uvicorn worker, and 8 hex
+characters of a uuid. Now:
+- one row per outstanding link in `approval_tokens`, keyed by the SHA-256
+  of the token (primary-key lookup; a leaked table reveals no usable links)
+- tokens are secrets.token_urlsafe and expire after APPROVAL_TOKEN_TTL_HOURS
+- consume() is a single DELETE ... RETURNING, so a link works exactly once
+  even with double clicks or several workers racing on it; restore() puts it
+  back if the approval it triggered failed
+- a background sweep deletes expired rows (indexed on expires_at) in batches
+"""
+import hashlib
+import os
+import secrets
+import threading
+import time
+
+from database import connect
+from services.tracing import traced
+
+APPROVAL_TOKEN_TTL_HOURS = float(os.environ.get("APPROVAL_TOKEN_TTL_HOURS", "168"))      # 7 days
+APPROVAL_TOKEN_SWEEP_SECONDS = int(os.environ.get("APPROVAL_TOKEN_SWEEP_SECONDS", "3600"))
+SWEEP_BATCH = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS approval_tokens (
+    token_hash TEXT PRIMARY KEY,
+    lead_id INTEGER NOT NULL,
+    customer_email TEXT,
+    customer_name TEXT,
+    title TEXT,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_approval_tokens_expires ON approval_tokens(expires_at);
+"""
+
+
+def _hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def fingerprint(token: str) -> str:
+    """Short prefix of the stored hash: safe to log, and enough to find the row."""
+    return _hash(token)[:10]
+
+
+@traced("db.approval_tokens.issue", kind="db", root=False)
+def issue(lead_id: int, customer_email: str, customer_name: str, title: str, ttl_hours: float = None) -> str:
+    """Creates an approval link token for a lead; returns the token (only its hash is stored)."""
+    token = secrets.token_urlsafe(16)
+    now = time.time()
+    conn = connect(SCHEMA)
+    try:
+        conn.execute(
+            "INSERT INTO approval_tokens (token_hash, lead_id, customer_email, customer_name, title, created_at, expires_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (_hash(token), lead_id, customer_email, customer_name, title, now,
+             now + (ttl_hours or APPROVAL_TOKEN_TTL_HOURS) * 3600)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    return token
+
+
+@traced("db.approval_tokens.consume", kind="db", root=False)
+def consume(token: str) -> dict | None:
+    """
+    Uses up a token: returns its lead info, or None if it is unknown, expired
+    or already used. Atomic, so only one caller ever gets the row.
+    """
+    conn = connect(SCHEMA)
+    try:
+        row = conn.execute(
+            "DELETE FROM approval_tokens WHERE token_hash = ? AND expires_at > ? "
+            "RETURNING lead_id, customer_email, customer_name, title, created_at, expires_at",
+            (_hash(token), time.time())
+        ).fetchone()
+        conn.commit()
+    finally:
+        conn.close()
+    return dict(row) if row else None
+
+
+@traced("db.approval_tokens.restore", kind="db", root=False)
+def restore(token: str, token_data: dict):
+    """
+    Puts a consumed token back with its original expiry, for a link whose
+    action failed after consume() so the customer can click it again.
+    """
+    conn = connect(SCHEMA)
+    try:
+        conn.execute(
+            "INSERT OR IGNORE INTO approval_tokens (token_hash, lead_id, customer_email, customer_name, title, created_at, expires_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (_hash(token), token_data["lead_id"], token_data["customer_email"], token_data["customer_name"],
+             token_data["title"], token_data["created_at"], token_data["expires_at"])
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def sweep(now: float = None) -> int:
+    """Deletes expired tokens in batches (short write transactions); returns how many."""
+    now = now or time.time()
+    deleted = 0
+    conn = connect(SCHEMA)
+    try:
+        while True:
+            count = conn.execute(
+                "DELETE FROM approval_tokens WHERE token_hash IN "
+                "(SELECT token_hash FROM approval_tokens WHERE expires_at <= ? LIMIT ?)",
+                (now, SWEEP_BATCH)
+            ).rowcount
+            conn.commit()
+            deleted += count
+            if count < SWEEP_BATCH:
+                return deleted
+    finally:
+        conn.close()
+
+
+# --- Sweeper ---
+
+_sweeper = None
+
+
+def _sweep_loop(stop: threading.Event):
+    while not stop.wait(APPROVAL_TOKEN_SWEEP_SECONDS):
+        try:
+            count = sweep()
+            if count:
+                print(f"🔑 Swept {count} expired approval tokens")
+        except Exception as e:
+            print(f"⚠️ Approval token sweep failed: {e}")
+
+
+def start_sweeper() -> threading.Event:
+    """Starts the expiry sweep thread (idempotent). Set the returned event to stop it."""
+    global _sweeper
+    if _sweeper is None or not _sweeper[0].is_alive():
+        stop = threading.Event()
+        thread = threading.Thread(target=_sweep_loop, args=(stop,), name="approval-token-sweep", daemon=True)
+        thread.start()
+        _sweeper = (thread, stop)
+    return _sweeper[1]
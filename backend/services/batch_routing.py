@@ -0,0 +1,209 @@
+"""
+Batch multi-order routing engine.
+
+Routes many orders in one pass instead of one agent run per order:
+- warehouse stock is allocated jointly across all orders of a SKU, so the
+  first orders in the list can't drain a warehouse that later orders need
+- every origin -> destination distance, zone, rate and carbon figure is
+  computed as a matrix rather than via per-pair `calculate_shipping_rates`
+"""
+import numpy as np
+
+from mcp_server import WAREHOUSE_DATA, EMISSION_FACTORS, fetch_supplier_stock
+from services.geo import distance_matrix, KM_PER_MILE
+from services.inventory import inventory_store
+from services.zip_index import bulk_lookup
+
+# Supplier portal labels -> WAREHOUSE_DATA keys
+WAREHOUSE_CODES = {
+    "New Jersey (NJ)": "NJ",
+    "Texas (TX)": "TX",
+    "California (CA)": "CA"
+}
+
+UNIT_WEIGHT_LBS = 0.5            # Same per-unit weight optimize_split_shipment uses
+LBS_TO_TONS = 0.000453592
+
+# Zone thresholds (miles) and rate card - mirrors calculate_shipping_rates
+ZONE_BOUNDS = np.array([150, 600, 1800])
+ZONES = np.array([2, 4, 6, 8])
+
+
+def _warehouse_arrays():
+    codes = list(WAREHOUSE_DATA.keys())
+    coords = np.array([(WAREHOUSE_DATA[c]["lat"], WAREHOUSE_DATA[c]["lng"]) for c in codes])
+    return codes, coords
+
+
+def _ration(demand: np.ndarray, supply: int) -> np.ndarray:
+    """
+    Caps each order's target quantity when total demand exceeds supply.
+    Shortage is shared proportionally (largest-remainder rounding) instead of
+    hitting whichever orders happen to come last.
+    """
+    total = int(demand.sum())
+    if total <= supply:
+        return demand.copy()
+
+    exact = demand * (supply / total)
+    target = np.floor(exact).astype(np.int64)
+    leftover = supply - int(target.sum())
+    if leftover > 0:
+        # Hand the remaining units to the largest fractional parts
+        order = np.argsort(-(exact - target), kind="stable")[:leftover]
+        target[order] += 1
+    return target
+
+
+def _allocate(targets: np.ndarray, stock: np.ndarray, fixed_cost: np.ndarray) -> np.ndarray:
+    """
+    Greedy joint allocation for one SKU.
+    Orders with the highest regret (cost gap between their best and second
+    best warehouse) pick first, each filling from its cheapest warehouse.
+    Returns an (orders, warehouses) matrix of units shipped.
+    """
+    n_orders, n_wh = fixed_cost.shape
+    alloc = np.zeros((n_orders, n_wh), dtype=np.int64)
+    remaining = stock.astype(np.int64).copy()
+
+    preference = np.argsort(fixed_cost, axis=1, kind="stable")
+    if n_wh > 1:
+        ranked = np.take_along_axis(fixed_cost, preference, axis=1)
+        regret = ranked[:, 1] - ranked[:, 0]
+    else:
+        regret = np.zeros(n_orders)
+    # Highest regret first, larger orders break ties
+    sequence = np.lexsort((-targets, -regret))
+
+    for i in sequence:
+        need = int(targets[i])
+        for w in preference[i]:
+            if need == 0:
+                break
+            take = min(need, int(remaining[w]))
+            if take > 0:
+                alloc[i, w] = take
+                remaining[w] -= take
+                need -= take
+    return alloc
+
+
+def route_orders(orders: list, shipping_mode: str = "ground", reserve: bool = False) -> dict:
+    """
+    Plans shipments for a batch of orders.
+    orders: list of {"order_id", "customer_zip", "qty", "sku"}
+    reserve: also claim the planned units in the inventory store (all or nothing);
+             raises InsufficientStock if another run took them first.
+    Returns per-order plans plus aggregate cost, carbon and warehouse usage.
+    """
+    if not orders:
+        return {"orders": [], "summary": {"order_count": 0, "units_requested": 0, "units_allocated": 0,
+                                          "total_cost": 0.0, "total_carbon_kg": 0.0}}
+
+    codes, wh_coords = _warehouse_arrays()
+    factor = EMISSION_FACTORS.get(shipping_mode.lower(), EMISSION_FACTORS["ground"])
+
+    n = len(orders)
+    qty = np.array([max(int(o["qty"]), 0) for o in orders], dtype=np.int64)
+
+    # Geocode each distinct ZIP once, then one distance matrix for the whole batch
+    zips = [o["customer_zip"] for o in orders]
+    unique_zips, zip_index = np.unique(np.array(zips, dtype=str), return_inverse=True)
+    dest_coords, _ = bulk_lookup(unique_zips)
+    miles = distance_matrix(dest_coords, wh_coords)[zip_index]         # (orders, warehouses)
+
+    zones = ZONES[np.searchsorted(ZONE_BOUNDS, miles, side="right")]
+    fixed_cost = 6.00 + zones * 1.50
+    eta_days = zones // 2 + 1
+
+    # Joint allocation per SKU (stock is tracked per SKU)
+    alloc = np.zeros((n, len(codes)), dtype=np.int64)
+    usage = {code: {"stock": 0, "allocated": 0} for code in codes}
+    skus = np.array([o["sku"] for o in orders], dtype=str)
+    for sku in np.unique(skus):
+        rows = np.flatnonzero(skus == sku)
+        stock_by_label = fetch_supplier_stock(str(sku))
+        stock = np.zeros(len(codes), dtype=np.int64)
+        for label, units in stock_by_label.items():
+            code = WAREHOUSE_CODES.get(label)
+            if code in usage:
+                stock[codes.index(code)] = units
+
+        targets = _ration(qty[rows], int(stock.sum()))
+        # Nearer warehouse wins when two sit in the same zone
+        rank_cost = fixed_cost[rows] + miles[rows] * 1e-6
+        alloc[rows] = _allocate(targets, stock, rank_cost)
+        for w, code in enumerate(codes):
+            usage[code]["stock"] += int(stock[w])
+            usage[code]["allocated"] += int(alloc[rows, w].sum())
+
+    # Rates and carbon for every (order, warehouse) leg at once
+    shipped = alloc > 0
+    weight_lbs = alloc * UNIT_WEIGHT_LBS
+    leg_cost = np.where(shipped, fixed_cost + weight_lbs * 0.50, 0.0)
+    leg_carbon = weight_lbs * LBS_TO_TONS * miles * KM_PER_MILE * factor
+
+    plans = []
+    for i, order in enumerate(orders):
+        legs = np.flatnonzero(shipped[i])
+        fulfilled = int(alloc[i].sum())
+        if fulfilled == qty[i] and fulfilled > 0:
+            status = "FULFILLED"
+        elif fulfilled > 0:
+            status = "PARTIAL"
+        else:
+            status = "UNFILLED"
+        plans.append({
+            "order_id": order.get("order_id", i),
+            "sku": order["sku"],
+            "customer_zip": order["customer_zip"],
+            "qty": int(qty[i]),
+            "fulfilled_qty": fulfilled,
+            "shortfall": int(qty[i]) - fulfilled,
+            "status": status,
+            "shipments": [
+                {
+                    "from": codes[w],
+                    "qty": int(alloc[i, w]),
+                    "miles": int(miles[i, w]),
+                    "zone": int(zones[i, w]),
+                    "cost": round(float(leg_cost[i, w]), 2),
+                    "eta_days": int(eta_days[i, w]),
+                    "carbon_kg": round(float(leg_carbon[i, w]), 3)
+                }
+                for w in legs
+            ],
+            "total_cost": round(float(leg_cost[i].sum()), 2),
+            "carbon_kg": round(float(leg_carbon[i].sum()), 3),
+            "eta_days": int(eta_days[i, legs].max()) if len(legs) else None
+        })
+
+    for code in codes:
+        usage[code]["remaining"] = usage[code]["stock"] - usage[code]["allocated"]
+
+    reservation_id = None
+    if reserve:
+        labels = {code: label for label, code in WAREHOUSE_CODES.items()}
+        legs = [
+            (str(orders[i]["sku"]), labels[codes[w]], int(alloc[i, w]))
+            for i, w in zip(*np.nonzero(alloc))
+        ]
+        if legs:
+            reservation_id = inventory_store.reserve(legs, reference="batch")
+
+    return {
+        "orders": plans,
+        "summary": {
+            "order_count": n,
+            "units_requested": int(qty.sum()),
+            "units_allocated": int(alloc.sum()),
+            "fulfilled_orders": sum(1 for p in plans if p["status"] == "FULFILLED"),
+            "partial_orders": sum(1 for p in plans if p["status"] == "PARTIAL"),
+            "unfilled_orders": sum(1 for p in plans if p["status"] == "UNFILLED"),
+            "total_cost": round(float(leg_cost.sum()), 2),
+            "total_carbon_kg": round(float(leg_carbon.sum()), 2),
+            "shipping_mode": shipping_mode,
+            "warehouses": usage,
+            "reservation_id": reservation_id
+        }
+    }
@@ -0,0 +1,352 @@
+"""
+Carbon accounting ledger.
+
+Every shipment that actually leaves a warehouse gets a row in `carbon_ledger`
+instead of a CO2 figure buried in the lead's draft_email text:
+- emissions are computed for a whole batch at once (one distance matrix per
+  origin, emission factor per mode from EMISSION_FACTORS)
+- `carbon_rollups` holds running totals per customer, warehouse, month and
+  mode, updated in the same transaction as the ledger insert, so ESG reports
+  read a handful of pre-aggregated rows however many shipments there are
+- rows booked for a stock reservation (shipment_ref "{reservation_id}:...")
+  are voided again if the reservation is released or expires unshipped
+- `rebuild_rollups` recomputes the totals from the ledger if they ever drift
+
+See benchmarks/bench_carbon.py for throughput at 1M shipments.
+"""
+import sqlite3
+from datetime import date
+
+import numpy as np
+
+from database import connect
+from services.geo import distance_matrix, KM_PER_MILE
+from services.zip_index import bulk_lookup
+from services.tracing import traced
+
+# Emission factors (kg CO2 per ton-km)
+# Source: EPA & DEFRA guidelines
+EMISSION_FACTORS = {
+    "ground": 0.062,    # Truck/FedEx Ground
+    "air": 0.602,       # Air freight (10x more than ground)
+    "rail": 0.022,      # Rail freight (most eco-friendly)
+    "ocean": 0.008      # Ocean freight
+}
+DEFAULT_MODE = "ground"
+LBS_TO_TONS = 0.000453592
+TREE_KG_PER_YEAR = 21.77     # Avg tree absorbs 21.77 kg CO2/year
+
+# Rollup dimensions maintained on every insert
+DIMENSIONS = ("customer", "warehouse", "month", "mode")
+UNKNOWN = "UNKNOWN"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS carbon_ledger (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    shipment_ref TEXT UNIQUE,
+    lead_id INTEGER,
+    customer TEXT NOT NULL,
+    warehouse TEXT NOT NULL,
+    origin_zip TEXT NOT NULL,
+    dest_zip TEXT NOT NULL,
+    shipping_mode TEXT NOT NULL,
+    weight_lbs REAL NOT NULL,
+    distance_km REAL NOT NULL,
+    carbon_kg REAL NOT NULL,
+    shipped_on DATE NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_carbon_ledger_lead ON carbon_ledger(lead_id);
+CREATE TABLE IF NOT EXISTS carbon_rollups (
+    dimension TEXT NOT NULL,
+    key TEXT NOT NULL,
+    shipments INTEGER NOT NULL,
+    weight_lbs REAL NOT NULL,
+    distance_km REAL NOT NULL,
+    carbon_kg REAL NOT NULL,
+    PRIMARY KEY (dimension, key)
+);
+"""
+
+ROLLUP_UPSERT = """
+    INSERT INTO carbon_rollups (dimension, key, shipments, weight_lbs, distance_km, carbon_kg)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(dimension, key) DO UPDATE SET
+        shipments = shipments + excluded.shipments,
+        weight_lbs = weight_lbs + excluded.weight_lbs,
+        distance_km = distance_km + excluded.distance_km,
+        carbon_kg = carbon_kg + excluded.carbon_kg
+"""
+
+
+def eco_rating(carbon_kg: float) -> str:
+    return "🌱 LOW" if carbon_kg < 5 else ("🌿 MODERATE" if carbon_kg < 20 else "🔥 HIGH")
+
+
+# --- Batch calculator ---
+
+def normalize_modes(modes) -> np.ndarray:
+    """Lower-cased modes; anything unknown is billed as ground (same as the single-shipment tool)."""
+    modes = np.char.lower(np.char.strip(np.asarray(modes, dtype=str)))
+    return np.where(np.isin(modes, list(EMISSION_FACTORS)), modes, DEFAULT_MODE)
+
+
+def compute_emissions(origin_zips, dest_zips, weight_lbs, modes=DEFAULT_MODE):
+    """
+    Distance and CO2 for many shipments in one pass.
+    Distinct ZIPs are geocoded once and each origin gets a single distance
+    row against its distinct destinations (origins are a few warehouses).
+    Returns (distance_km (N,), carbon_kg (N,), modes (N,)).
+    """
+    origin_zips = np.asarray(origin_zips, dtype=str)
+    dest_zips = np.asarray(dest_zips, dtype=str)
+    weight_lbs = np.asarray(weight_lbs, dtype=np.float64)
+    n = len(origin_zips)
+    modes = normalize_modes(np.broadcast_to(np.asarray(modes, dtype=str), (n,)))
+    if n == 0:
+        return np.zeros(0), np.zeros(0), modes
+
+    origins, origin_idx = np.unique(origin_zips, return_inverse=True)
+    dests, dest_idx = np.unique(dest_zips, return_inverse=True)
+    origin_coords, _ = bulk_lookup(origins)
+    dest_coords, _ = bulk_lookup(dests)
+
+    miles = np.empty(n)
+    by_origin = np.argsort(origin_idx, kind="stable")
+    bounds = np.searchsorted(origin_idx[by_origin], np.arange(len(origins) + 1))
+    for o in range(len(origins)):
+        rows = by_origin[bounds[o]:bounds[o + 1]]
+        cols, inverse = np.unique(dest_idx[rows], return_inverse=True)
+        miles[rows] = distance_matrix(origin_coords[o:o + 1], dest_coords[cols])[0, inverse]
+
+    mode_names, mode_idx = np.unique(modes, return_inverse=True)
+    factor = np.array([EMISSION_FACTORS[m] for m in mode_names])[mode_idx]
+    distance_km = miles * KM_PER_MILE
+    carbon_kg = weight_lbs * LBS_TO_TONS * distance_km * factor
+    return distance_km, carbon_kg, modes
+
+
+def _rollup_rows(columns: dict, weight: np.ndarray, distance: np.ndarray, carbon: np.ndarray, sign: int = 1) -> list:
+    """Per-dimension sums of a batch, as carbon_rollups upsert rows (sign=-1 takes them back out)."""
+    rows = []
+    for dimension in DIMENSIONS:
+        keys, inverse = np.unique(columns[dimension], return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(keys))
+        sums = [np.bincount(inverse, weights=values, minlength=len(keys)) for values in (weight, distance, carbon)]
+        rows.extend(
+            (dimension, str(key), sign * int(counts[k]),
+             sign * float(sums[0][k]), sign * float(sums[1][k]), sign * float(sums[2][k]))
+            for k, key in enumerate(keys)
+        )
+    return rows
+
+
+# --- Storage ---
+
+def _existing_refs(conn: sqlite3.Connection, refs: list) -> set:
+    found = set()
+    for i in range(0, len(refs), 500):
+        chunk = refs[i:i + 500]
+        placeholders = ",".join("?" * len(chunk))
+        found.update(r[0] for r in conn.execute(
+            f"SELECT shipment_ref FROM carbon_ledger WHERE shipment_ref IN ({placeholders})", chunk
+        ))
+    return found
+
+
+@traced("db.record_shipments", kind="db", root=False)
+def record_shipments(shipments: list) -> dict:
+    """
+    Adds shipments to the ledger and folds them into the rollups atomically.
+    shipments: list of {"origin_zip", "dest_zip", "weight_lbs"} plus optional
+               "shipping_mode", "customer", "warehouse", "lead_id",
+               "shipped_on" (date or ISO string) and "shipment_ref"
+    Shipments whose shipment_ref is already in the ledger (or earlier in the
+    same batch) are skipped, so re-approving the same plan doesn't count its
+    emissions twice.
+    Returns {"recorded", "skipped", "carbon_kg"}.
+    """
+    if not shipments:
+        return {"recorded": 0, "skipped": 0, "carbon_kg": 0.0}
+
+    conn = connect(SCHEMA, autocommit=True)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        refs = [s["shipment_ref"] for s in shipments if s.get("shipment_ref")]
+        seen = _existing_refs(conn, refs) if refs else set()
+        batch = []
+        for s in shipments:
+            ref = s.get("shipment_ref")
+            if ref:
+                if ref in seen:
+                    continue
+                seen.add(ref)
+            batch.append(s)
+        if batch:
+            distance, carbon, modes = compute_emissions(
+                [s["origin_zip"] for s in batch],
+                [s["dest_zip"] for s in batch],
+                [float(s["weight_lbs"]) for s in batch],
+                [s.get("shipping_mode") or DEFAULT_MODE for s in batch]
+            )
+            weight = np.array([float(s["weight_lbs"]) for s in batch])
+            today = date.today().isoformat()
+            shipped_on = [str(s.get("shipped_on") or today)[:10] for s in batch]
+            columns = {
+                "customer": np.array([s.get("customer") or UNKNOWN for s in batch], dtype=str),
+                "warehouse": np.array([s.get("warehouse") or str(s["origin_zip"]) for s in batch], dtype=str),
+                "month": np.array([d[:7] for d in shipped_on], dtype=str),
+                "mode": modes
+            }
+            conn.executemany("""
+                INSERT INTO carbon_ledger (shipment_ref, lead_id, customer, warehouse, origin_zip, dest_zip,
+                                           shipping_mode, weight_lbs, distance_km, carbon_kg, shipped_on)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                (s.get("shipment_ref"), s.get("lead_id"), str(columns["customer"][i]), str(columns["warehouse"][i]),
+                 str(s["origin_zip"]), str(s["dest_zip"]), str(modes[i]), float(weight[i]),
+                 float(distance[i]), float(carbon[i]), shipped_on[i])
+                for i, s in enumerate(batch)
+            ))
+            conn.executemany(ROLLUP_UPSERT, _rollup_rows(columns, weight, distance, carbon))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+    return {
+        "recorded": len(batch),
+        "skipped": len(shipments) - len(batch),
+        "carbon_kg": round(float(carbon.sum()), 3) if batch else 0.0
+    }
+
+
+@traced("db.void_reservation", kind="db", root=False)
+def void_reservation(reservation_id: str) -> int:
+    """
+    Removes the rows booked for a stock reservation and takes them out of the
+    rollups, for a reservation released or expired before it shipped.
+    Returns the number of rows removed.
+    """
+    conn = connect(SCHEMA, autocommit=True)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        rows = conn.execute(
+            "SELECT * FROM carbon_ledger WHERE shipment_ref LIKE ?", (f"{reservation_id}:%",)
+        ).fetchall()
+        if rows:
+            columns = {
+                "customer": np.array([r["customer"] for r in rows], dtype=str),
+                "warehouse": np.array([r["warehouse"] for r in rows], dtype=str),
+                "month": np.array([r["shipped_on"][:7] for r in rows], dtype=str),
+                "mode": np.array([r["shipping_mode"] for r in rows], dtype=str)
+            }
+            conn.executemany(ROLLUP_UPSERT, _rollup_rows(
+                columns,
+                np.array([r["weight_lbs"] for r in rows]),
+                np.array([r["distance_km"] for r in rows]),
+                np.array([r["carbon_kg"] for r in rows]),
+                sign=-1
+            ))
+            conn.execute("DELETE FROM carbon_rollups WHERE shipments <= 0")
+            conn.executemany("DELETE FROM carbon_ledger WHERE id = ?", [(r["id"],) for r in rows])
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    return len(rows)
+
+
+def rebuild_rollups() -> int:
+    """Recomputes every rollup from the ledger. Returns the number of rollup rows."""
+    conn = connect(SCHEMA, autocommit=True)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM carbon_rollups")
+        for dimension, column in (("customer", "customer"), ("warehouse", "warehouse"),
+                                  ("month", "substr(shipped_on, 1, 7)"), ("mode", "shipping_mode")):
+            conn.execute(f"""
+                INSERT INTO carbon_rollups (dimension, key, shipments, weight_lbs, distance_km, carbon_kg)
+                SELECT ?, {column}, COUNT(*), SUM(weight_lbs), SUM(distance_km), SUM(carbon_kg)
+                FROM carbon_ledger GROUP BY {column}
+            """, (dimension,))
+        count = conn.execute("SELECT COUNT(*) FROM carbon_rollups").fetchone()[0]
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    return count
+
+
+# --- Reporting ---
+
+def _report_row(row) -> dict:
+    return {
+        "key": row["key"],
+        "shipments": row["shipments"],
+        "weight_lbs": round(row["weight_lbs"], 1),
+        "distance_km": round(row["distance_km"], 1),
+        "carbon_kg": round(row["carbon_kg"], 2),
+        "kg_per_shipment": round(row["carbon_kg"] / row["shipments"], 3) if row["shipments"] else 0.0,
+        "trees_to_offset": round(row["carbon_kg"] / TREE_KG_PER_YEAR, 2)
+    }
+
+
+def report(group_by: str, limit: int = None) -> dict:
+    """
+    ESG report from the rollups: one row per customer / warehouse / month / mode.
+    Months come back in calendar order, everything else by emissions (highest first).
+    """
+    if group_by not in DIMENSIONS:
+        raise ValueError(f"group_by must be one of {', '.join(DIMENSIONS)}")
+    order = "key" if group_by == "month" else "carbon_kg DESC"
+    conn = connect(SCHEMA, autocommit=True)
+    try:
+        # LIMIT -1 is SQLite for "no limit"
+        rows = conn.execute(
+            f"SELECT * FROM carbon_rollups WHERE dimension = ? ORDER BY {order} LIMIT ?",
+            (group_by, -1 if limit is None else max(limit, 0))
+        ).fetchall()
+        totals = conn.execute(
+            "SELECT COALESCE(SUM(shipments), 0) AS shipments, COALESCE(SUM(carbon_kg), 0) AS carbon_kg "
+            "FROM carbon_rollups WHERE dimension = ?", (group_by,)
+        ).fetchone()
+    finally:
+        conn.close()
+
+    total_kg = totals["carbon_kg"]
+    entries = [_report_row(row) for row in rows]
+    for entry, row in zip(entries, rows):
+        entry["share"] = round(row["carbon_kg"] / total_kg, 4) if total_kg else 0.0
+    return {
+        "group_by": group_by,
+        "rows": entries,
+        "total": {
+            "shipments": totals["shipments"],
+            "carbon_kg": round(total_kg, 2),
+            "trees_to_offset": round(total_kg / TREE_KG_PER_YEAR, 2)
+        }
+    }
+
+
+def summary() -> dict:
+    """Ledger-wide totals plus the per-mode breakdown."""
+    by_mode = report("mode")
+    return {**by_mode["total"], "by_mode": by_mode["rows"]}
+
+
+def shipments_for_lead(lead_id: int) -> list:
+    conn = connect(SCHEMA, autocommit=True)
+    try:
+        rows = conn.execute(
+            "SELECT * FROM carbon_ledger WHERE lead_id = ? ORDER BY id", (lead_id,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+    finally:
+        conn.close()
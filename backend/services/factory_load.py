@@ -0,0 +1,346 @@
+"""
+Production capacity tracker.
+
+Each factory has a daily capacity and a FIFO queue of print jobs in
+`production_queue`. A factory's state is a single number, `free_at` (when
+its queue clears): enqueueing N units pushes it out by N / capacity days and
+time passing drains it, so backlogs and projected completion dates stay
+current without a sweeper.
+
+Factories are also kept in a min-heap keyed by `free_at` with lazy
+invalidation (stale entries are skipped on pop), so picking the least-loaded
+factory and assigning a job to it are O(log n) however many factories exist.
+
+With several uvicorn workers each process has its own heap, so the DB stays
+the authority: a job's start is read from production_queue inside the write
+transaction that queues it, and the in-memory view re-syncs every
+FACTORY_SYNC_SECONDS to pick up other workers' jobs.
+"""
+import heapq
+import math
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from database import connect
+
+SECONDS_PER_DAY = 86400
+OVERLOADED_DAYS = 3                  # Backlog above this is OVERLOADED (agent prompt threshold)
+DEFAULT_RUN_UNITS = int(os.environ.get("FACTORY_DEFAULT_RUN_UNITS", "100"))  # Design approved, qty not known yet
+FACTORY_SYNC_SECONDS = float(os.environ.get("FACTORY_SYNC_SECONDS", "5"))    # Re-read other workers' jobs
+
+# Seeded on first use; more factories can be added with add_factory()
+DEFAULT_FACTORIES = [
+    ("FACTORY_TX", "Austin Print Works", "78701", 200),
+    ("FACTORY_NJ", "Avenel Print Works", "07001", 300),
+    ("FACTORY_CA", "Los Angeles Print Works", "90001", 250)
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS factories (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    zip TEXT,
+    daily_capacity INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS production_queue (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    factory_id TEXT NOT NULL,
+    lead_id INTEGER,
+    job_type TEXT NOT NULL,
+    units INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'QUEUED',
+    projected_start REAL NOT NULL,
+    projected_completion REAL NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_production_queue_factory ON production_queue(factory_id, status);
+"""
+
+
+def load_status(backlog_days: float) -> str:
+    if backlog_days <= 0:
+        return "IDLE"
+    if backlog_days > OVERLOADED_DAYS:
+        return "OVERLOADED"
+    return "NORMAL"
+
+
+class FactoryLoadTracker:
+    """In-memory view of every factory's queue, kept in sync with production_queue."""
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._synced_at = None   # monotonic time of the last load from the DB
+        self._factories = {}     # id -> {"name", "zip", "daily_capacity"}
+        self._free_at = {}       # id -> unix time the queue clears
+        self._version = {}       # id -> bumped on every change (heap entries carry it)
+        self._heap = []          # (free_at, factory_id, version)
+
+    # --- Loading ---
+
+    def _ensure_loaded(self):
+        if self._synced_at is not None and time.monotonic() - self._synced_at < FACTORY_SYNC_SECONDS:
+            return
+        conn = connect(SCHEMA)
+        try:
+            if self._synced_at is None:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO factories (id, name, zip, daily_capacity) VALUES (?, ?, ?, ?)",
+                    DEFAULT_FACTORIES
+                )
+                conn.commit()
+            factories = conn.execute("SELECT * FROM factories").fetchall()
+            queues = conn.execute("""
+                SELECT factory_id, MAX(projected_completion) AS free_at FROM production_queue
+                WHERE status = 'QUEUED' GROUP BY factory_id
+            """).fetchall()
+        finally:
+            conn.close()
+
+        now = self.clock()
+        free_at = {row["factory_id"]: row["free_at"] for row in queues}
+        for row in factories:
+            self._factories[row["id"]] = {"name": row["name"], "zip": row["zip"],
+                                          "daily_capacity": row["daily_capacity"]}
+            self._set_free_at(row["id"], max(free_at.get(row["id"], now), now))
+        self._synced_at = time.monotonic()
+
+    @staticmethod
+    def _db_free_at(conn: sqlite3.Connection, factory_id: str, now: float) -> float:
+        """When the factory's queue clears per production_queue (includes other workers' jobs)."""
+        row = conn.execute(
+            "SELECT MAX(projected_completion) FROM production_queue WHERE factory_id = ? AND status = 'QUEUED'",
+            (factory_id,)
+        ).fetchone()
+        return max(row[0] or now, now)
+
+    def _set_free_at(self, factory_id: str, free_at: float):
+        version = self._version.get(factory_id, 0) + 1
+        self._version[factory_id] = version
+        self._free_at[factory_id] = free_at
+        heapq.heappush(self._heap, (free_at, factory_id, version))
+        if len(self._heap) > 4 * len(self._version) + 16:
+            # Too many stale entries: rebuild from the live versions
+            self._heap = [(self._free_at[f], f, v) for f, v in self._version.items()]
+            heapq.heapify(self._heap)
+
+    def _peek_least_loaded(self) -> str | None:
+        # Lazy invalidation: drop entries superseded by a newer version
+        while self._heap:
+            free_at, factory_id, version = self._heap[0]
+            if self._version.get(factory_id) == version:
+                return factory_id
+            heapq.heappop(self._heap)
+        return None
+
+    # --- Queries ---
+
+    def _load(self, factory_id: str, now: float) -> dict:
+        info = self._factories[factory_id]
+        free_at = max(self._free_at[factory_id], now)
+        backlog_days = (free_at - now) / SECONDS_PER_DAY
+        return {
+            "factory_id": factory_id,
+            "name": info["name"],
+            "zip": info["zip"],
+            "daily_capacity": info["daily_capacity"],
+            "backlog_days": round(backlog_days, 2),
+            "backlog_units": int(round(backlog_days * info["daily_capacity"])),
+            "queue_days": math.ceil(round(backlog_days, 6)),
+            "status": load_status(backlog_days),
+            "projected_free_at": datetime.fromtimestamp(free_at).isoformat(timespec="minutes")
+        }
+
+    def get_load(self, factory_id: str) -> dict | None:
+        with self._lock:
+            self._ensure_loaded()
+            if factory_id not in self._factories:
+                return None
+            return self._load(factory_id, self.clock())
+
+    def get_all_loads(self) -> list:
+        """Every factory's load in one pass, least loaded first."""
+        with self._lock:
+            self._ensure_loaded()
+            now = self.clock()
+            loads = [self._load(fid, now) for fid in self._factories]
+        return sorted(loads, key=lambda load: (load["backlog_days"], load["factory_id"]))
+
+    def least_loaded(self) -> dict | None:
+        """O(log n) amortized: the factory whose queue clears first."""
+        with self._lock:
+            self._ensure_loaded()
+            factory_id = self._peek_least_loaded()
+            return self._load(factory_id, self.clock()) if factory_id else None
+
+    # --- Updates ---
+
+    def enqueue(self, units: int, job_type: str, lead_id: int = None, factory_id: str = None) -> dict:
+        """
+        Appends a job to a factory's queue (the least-loaded one if factory_id is None).
+        Returns the job with its projected start/completion.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            conn = connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                job = self._insert_job(conn, units, job_type, lead_id, factory_id)
+                conn.commit()
+            finally:
+                conn.close()
+            self._set_free_at(job["factory_id"], job.pop("free_at"))
+        return job
+
+    def finish(self, job_id: int, status: str = "DONE") -> bool:
+        """
+        Marks a job DONE or CANCELLED and gives its unfinished time back to the
+        factory (later jobs in that queue move up). Returns False if the job isn't queued.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            conn = connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                job = conn.execute(
+                    "SELECT * FROM production_queue WHERE id = ? AND status = 'QUEUED'", (job_id,)
+                ).fetchone()
+                if job is None:
+                    conn.rollback()
+                    return False
+                free_at = self._release_job(conn, job, status)
+                conn.commit()
+            finally:
+                conn.close()
+            self._set_free_at(job["factory_id"], free_at)
+        return True
+
+    def schedule_lead(self, lead_id: int, units: int, job_type: str) -> dict:
+        """
+        Queues the production run for a lead, or resizes it if one is already queued
+        (design approval queues it, the saved logistics plan fixes the quantity).
+        Lookup, replace and insert share one write transaction, so concurrent
+        approvals (in this or another worker) can't queue the lead twice.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            released = None
+            conn = connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                existing = conn.execute(
+                    "SELECT * FROM production_queue WHERE lead_id = ? AND status = 'QUEUED'", (lead_id,)
+                ).fetchone()
+                if existing is not None and existing["units"] == units:
+                    conn.rollback()
+                    return {"job_id": existing["id"], "factory_id": existing["factory_id"], "units": units, "unchanged": True}
+                if existing is not None:
+                    released = (existing["factory_id"], self._release_job(conn, existing, "REPLACED"))
+                    # Lets the replaced job's factory compete for the new one
+                    self._set_free_at(*released)
+                job = self._insert_job(conn, units, job_type, lead_id)
+                conn.commit()
+            except BaseException:
+                if released is not None:
+                    self._synced_at = time.monotonic() - FACTORY_SYNC_SECONDS  # Rolled back: re-read the DB
+                raise
+            finally:
+                conn.close()
+            self._set_free_at(job["factory_id"], job.pop("free_at"))
+        return job
+
+    # --- Queue writes (caller holds self._lock and a BEGIN IMMEDIATE transaction) ---
+
+    def _insert_job(self, conn: sqlite3.Connection, units: int, job_type: str, lead_id: int = None,
+                    factory_id: str = None) -> dict:
+        if factory_id is None:
+            factory_id = self._peek_least_loaded()
+        if factory_id not in self._factories:
+            raise ValueError(f"Unknown factory: {factory_id}")
+        # The write lock serializes enqueues across workers, so the start read here can't go stale
+        start = self._db_free_at(conn, factory_id, self.clock())
+        completion = start + units / self._factories[factory_id]["daily_capacity"] * SECONDS_PER_DAY
+        cursor = conn.execute("""
+            INSERT INTO production_queue (factory_id, lead_id, job_type, units, projected_start, projected_completion)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (factory_id, lead_id, job_type, units, start, completion))
+        return {
+            "job_id": cursor.lastrowid,
+            "factory_id": factory_id,
+            "lead_id": lead_id,
+            "job_type": job_type,
+            "units": units,
+            "projected_start": datetime.fromtimestamp(start).isoformat(timespec="minutes"),
+            "projected_completion": datetime.fromtimestamp(completion).isoformat(timespec="minutes"),
+            "free_at": completion
+        }
+
+    def _release_job(self, conn: sqlite3.Connection, job, status: str) -> float:
+        """Closes a queued job and moves later jobs up; returns when its factory is free now."""
+        now = self.clock()
+        # Time this job still had left in the queue
+        remaining = max(job["projected_completion"] - max(job["projected_start"], now), 0.0)
+        conn.execute("UPDATE production_queue SET status = ? WHERE id = ?", (status, job["id"]))
+        if remaining > 0:
+            conn.execute("""
+                UPDATE production_queue
+                SET projected_start = projected_start - ?, projected_completion = projected_completion - ?
+                WHERE factory_id = ? AND status = 'QUEUED' AND projected_start >= ?
+            """, (remaining, remaining, job["factory_id"], job["projected_completion"]))
+        return self._db_free_at(conn, job["factory_id"], now)
+
+    def add_factory(self, factory_id: str, name: str, zip_code: str, daily_capacity: int):
+        with self._lock:
+            self._ensure_loaded()
+            conn = connect()
+            try:
+                conn.execute("""
+                    INSERT INTO factories (id, name, zip, daily_capacity) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(id) DO UPDATE SET name = excluded.name, zip = excluded.zip,
+                                                  daily_capacity = excluded.daily_capacity
+                """, (factory_id, name, zip_code, daily_capacity))
+                conn.commit()
+            finally:
+                conn.close()
+            self._factories[factory_id] = {"name": name, "zip": zip_code, "daily_capacity": daily_capacity}
+            self._set_free_at(factory_id, self._free_at.get(factory_id, self.clock()))
+
+    def job(self, job_id: int) -> dict | None:
+        conn = connect()
+        try:
+            row = conn.execute("SELECT * FROM production_queue WHERE id = ?", (job_id,)).fetchone()
+            return dict(row) if row else None
+        finally:
+            conn.close()
+
+    def queue(self, factory_id: str) -> list:
+        """Jobs still queued at a factory, in order."""
+        conn = connect()
+        try:
+            rows = conn.execute("""
+                SELECT * FROM production_queue WHERE factory_id = ? AND status = 'QUEUED' AND projected_completion > ?
+                ORDER BY projected_start
+            """, (factory_id, self.clock())).fetchall()
+            return [dict(row) for row in rows]
+        finally:
+            conn.close()
+
+
+def order_units_for_lead(lead_id: int) -> int:
+    """Units ordered for a lead so far (order_history), or DEFAULT_RUN_UNITS if none yet."""
+    conn = connect()
+    try:
+        row = conn.execute("SELECT SUM(qty) AS units FROM order_history WHERE lead_id = ?", (lead_id,)).fetchone()
+    except sqlite3.OperationalError:
+        row = None  # order_history not created yet
+    finally:
+        conn.close()
+    return int(row["units"]) if row and row["units"] else DEFAULT_RUN_UNITS
+
+
+# Process-wide tracker used by check_factory_load and the approval endpoints
+factory_tracker = FactoryLoadTracker()
@@ -0,0 +1,407 @@
+"""
+Demand forecasting engine.
+
+Trains on real order history (`order_history`, one row per order) instead of
+a hardcoded base times random noise:
+- every SKU gets an additive Holt-Winters model (damped trend + weekly
+  seasonality), fitted for ALL SKUs at once with numpy; the smoothing
+  parameters are picked per SKU from a small grid by in-sample one-step error
+- `run_batch` precomputes the next FORECAST_HORIZON days for every SKU into
+  `demand_forecasts`, nightly, so reads are a single indexed query
+- SKUs with too little history fall back to a deterministic baseline
+
+See benchmarks/bench_forecast.py for a 10k-SKU backtest.
+"""
+import itertools
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from database import connect
+
+SEASON_LENGTH = 7                                                     # Weekly seasonality
+MIN_HISTORY_DAYS = 2 * SEASON_LENGTH                                  # Needed to initialise the model
+FORECAST_HORIZON = int(os.environ.get("FORECAST_HORIZON", "28"))      # Days precomputed per SKU
+FORECAST_HISTORY_DAYS = int(os.environ.get("FORECAST_HISTORY_DAYS", "365"))
+FORECAST_RUN_HOUR = int(os.environ.get("FORECAST_RUN_HOUR", "2"))     # Local hour of the nightly batch
+
+DAMPING = 0.98
+PARAM_GRID = list(itertools.product(
+    (0.1, 0.3, 0.5),    # alpha - level
+    (0.0, 0.05),        # beta - trend
+    (0.05, 0.2)         # gamma - seasonality
+))
+Z_80 = 1.2816           # 80% prediction interval
+
+# Baseline daily demand by SKU category (used until a SKU has enough history)
+CATEGORY_BASE = {
+    "CREW-NECK": 45,
+    "HOODIE": 30,
+    "POLO": 20,
+    "TANK": 35,
+    "LONG-SLEEVE": 25
+}
+DEFAULT_BASE = 30
+WEEKEND_MULTIPLIER = 1.3
+BASELINE_CONFIDENCE = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS order_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sku TEXT NOT NULL,
+    qty INTEGER NOT NULL,
+    order_date DATE NOT NULL,
+    lead_id INTEGER,
+    customer_zip TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_order_history_date ON order_history(order_date, sku);
+CREATE TABLE IF NOT EXISTS demand_forecasts (
+    sku TEXT NOT NULL,
+    forecast_date DATE NOT NULL,
+    predicted REAL NOT NULL,
+    lower REAL NOT NULL,
+    upper REAL NOT NULL,
+    confidence INTEGER NOT NULL,
+    model TEXT NOT NULL,
+    generated_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (sku, forecast_date)
+);
+"""
+
+
+# --- Model ---
+
+@dataclass(slots=True)
+class HoltWintersFit:
+    """Final smoothing state for N series; season slots are indexed by absolute day % SEASON_LENGTH."""
+    level: np.ndarray       # (N,)
+    trend: np.ndarray       # (N,)
+    season: np.ndarray      # (N, m)
+    alpha: np.ndarray       # (N,)
+    sigma: np.ndarray       # (N,) one-step residual std
+    n_obs: int              # Length of the fitted history (T)
+
+    def forecast(self, horizon: int):
+        """Returns (mean, half_width) arrays of shape (N, horizon); mean is clipped at 0."""
+        m = self.season.shape[1]
+        steps = np.arange(1, horizon + 1)
+        damp = np.cumsum(DAMPING ** steps)                                   # sum_{i<=h} phi^i
+        slots = (self.n_obs + steps - 1) % m
+        mean = self.level[:, None] + self.trend[:, None] * damp[None, :] + self.season[:, slots]
+        spread = np.sqrt(1 + (steps[None, :] - 1) * self.alpha[:, None] ** 2)
+        return np.maximum(mean, 0.0), Z_80 * self.sigma[:, None] * spread
+
+
+def fit_holt_winters(history: np.ndarray, start: np.ndarray = None, m: int = SEASON_LENGTH) -> HoltWintersFit:
+    """
+    Fits additive damped Holt-Winters to every row of `history` (N, T) at once.
+    start: (N,) index of each series' first real day (earlier days are ignored);
+    each series needs at least 2*m days after its start.
+    All PARAM_GRID combinations run side by side; each series keeps the one
+    with the lowest one-step-ahead squared error.
+    """
+    Y = np.asarray(history, dtype=np.float64)
+    n, T = Y.shape
+    start = np.zeros(n, dtype=np.int64) if start is None else np.asarray(start, dtype=np.int64)
+    rows = np.arange(n)
+
+    params = np.array(PARAM_GRID)                                             # (G, 3)
+    alpha, beta, gamma = (params[:, i][:, None] for i in range(3))            # (G, 1) each
+    G = len(params)
+
+    # Initial state from each series' first two seasons
+    window = start[:, None] + np.arange(2 * m)[None, :]
+    first = np.take_along_axis(Y, window, axis=1)
+    level0 = first[:, :m].mean(axis=1)
+    trend0 = (first[:, m:].mean(axis=1) - level0) / m
+    season0 = np.zeros((n, m))
+    np.put_along_axis(season0, window[:, :m] % m, first[:, :m] - level0[:, None], axis=1)
+
+    level = np.broadcast_to(level0, (G, n)).copy()
+    trend = np.broadcast_to(trend0, (G, n)).copy()
+    season = np.broadcast_to(season0, (G, n, m)).copy()
+    sse = np.zeros((G, n))
+    count = np.zeros(n)
+
+    for t in range(T):
+        active = t >= start                       # (N,)
+        if not active.any():
+            continue
+        scored = t >= start + m                   # Skip the initialisation season when scoring
+        slot = t % m
+        y = Y[:, t]
+        s = season[:, :, slot]
+
+        err = y - (level + DAMPING * trend + s)
+        sse += np.where(scored, err * err, 0.0)
+        count += scored
+
+        new_level = alpha * (y - s) + (1 - alpha) * (level + DAMPING * trend)
+        new_trend = beta * (new_level - level) + (1 - beta) * DAMPING * trend
+        new_season = gamma * (y - new_level) + (1 - gamma) * s
+
+        level = np.where(active, new_level, level)
+        trend = np.where(active, new_trend, trend)
+        season[:, :, slot] = np.where(active, new_season, s)
+
+    best = np.argmin(sse, axis=0)                 # (N,)
+    return HoltWintersFit(
+        level=level[best, rows],
+        trend=trend[best, rows],
+        season=season[best, rows],
+        alpha=params[best, 0],
+        sigma=np.sqrt(sse[best, rows] / np.maximum(count, 1)),
+        n_obs=T
+    )
+
+
+def baseline_forecast(sku: str, dates: list, recent_daily: float = None) -> list:
+    """
+    Deterministic fallback: recent average (or the category base) with a weekend boost.
+    Returns [(predicted, lower, upper, confidence)] per date.
+    """
+    base = recent_daily
+    if base is None:
+        base = next((val for key, val in CATEGORY_BASE.items() if key in sku.upper()), DEFAULT_BASE)
+    rows = []
+    for day in dates:
+        predicted = base * (WEEKEND_MULTIPLIER if day.weekday() >= 5 else 1.0)
+        rows.append((predicted, predicted * 0.8, predicted * 1.2, BASELINE_CONFIDENCE))
+    return rows
+
+
+def _confidence(mean: np.ndarray, half_width: np.ndarray) -> np.ndarray:
+    """Interval tightness as a 50-99 score (narrow interval relative to the forecast = high)."""
+    relative = half_width / np.maximum(mean, 1.0)
+    return np.clip(np.round(100 * (1 - relative / 2)), 50, 99).astype(int)
+
+
+# --- Storage ---
+
+def record_order(sku: str, qty: int, order_date: date = None, lead_id: int = None, customer_zip: str = None):
+    """Adds one order to the history the models train on."""
+    conn = connect(SCHEMA)
+    try:
+        conn.execute(
+            "INSERT INTO order_history (sku, qty, order_date, lead_id, customer_zip) VALUES (?, ?, ?, ?, ?)",
+            (sku, int(qty), (order_date or date.today()).isoformat(), lead_id, customer_zip)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def load_history(end: date, days: int = FORECAST_HISTORY_DAYS, skus: list = None):
+    """
+    Daily demand matrix for the `days` days ending the day before `end`.
+    Returns (skus, Y (N, days), start (N,)) where start is each SKU's first day with orders.
+    """
+    first_day = end - timedelta(days=days)
+    query = """
+        SELECT sku, order_date, SUM(qty) AS qty FROM order_history
+        WHERE order_date >= ? AND order_date < ?
+    """
+    args = [first_day.isoformat(), end.isoformat()]
+    if skus is not None:
+        query += f" AND sku IN ({','.join('?' * len(skus))})"
+        args += list(skus)
+    query += " GROUP BY sku, order_date"
+
+    conn = connect(SCHEMA)
+    try:
+        rows = conn.execute(query, args).fetchall()
+    finally:
+        conn.close()
+    if not rows:
+        return [], np.zeros((0, days)), np.zeros(0, dtype=np.int64)
+
+    names, sku_idx = np.unique(np.array([r["sku"] for r in rows], dtype=str), return_inverse=True)
+    day_idx = np.array([(date.fromisoformat(r["order_date"]) - first_day).days for r in rows])
+    Y = np.zeros((len(names), days))
+    np.add.at(Y, (sku_idx, day_idx), np.array([r["qty"] for r in rows], dtype=np.float64))
+
+    start = np.full(len(names), days, dtype=np.int64)
+    np.minimum.at(start, sku_idx, day_idx)
+    return list(names), Y, start
+
+
+def compute_forecasts(skus: list, Y: np.ndarray, start: np.ndarray, today: date, horizon: int) -> list:
+    """
+    Forecast rows for every SKU: [(sku, date, predicted, lower, upper, confidence, model)].
+    Dates run from `today` for `horizon` + 1 days (history ends yesterday).
+    """
+    dates = [today + timedelta(days=h) for h in range(horizon + 1)]
+    rows = []
+    if not skus:
+        return rows
+
+    T = Y.shape[1]
+    enough = (T - start) >= MIN_HISTORY_DAYS
+    fitted = np.flatnonzero(enough)
+    if len(fitted):
+        fit = fit_holt_winters(Y[fitted], start[fitted])
+        mean, half = fit.forecast(len(dates))
+        conf = _confidence(mean, half)
+        lower = np.maximum(mean - half, 0.0)
+        upper = mean + half
+        for k, i in enumerate(fitted):
+            sku = skus[i]
+            for h, day in enumerate(dates):
+                rows.append((sku, day.isoformat(), float(mean[k, h]), float(lower[k, h]),
+                             float(upper[k, h]), int(conf[k, h]), "holt_winters"))
+
+    for i in np.flatnonzero(~enough):
+        observed = Y[i, start[i]:]
+        recent = float(observed.mean()) if len(observed) else None
+        for day, (pred, lo, hi, conf) in zip(dates, baseline_forecast(skus[i], dates, recent)):
+            rows.append((skus[i], day.isoformat(), pred, lo, hi, conf, "baseline"))
+    return rows
+
+
+def _store(rows: list, generated_at: str):
+    conn = connect(SCHEMA)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany("""
+            INSERT INTO demand_forecasts (sku, forecast_date, predicted, lower, upper, confidence, model, generated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(sku, forecast_date) DO UPDATE SET
+                predicted = excluded.predicted, lower = excluded.lower, upper = excluded.upper,
+                confidence = excluded.confidence, model = excluded.model, generated_at = excluded.generated_at
+        """, [row + (generated_at,) for row in rows])
+        # Past days are never served again
+        conn.execute("DELETE FROM demand_forecasts WHERE forecast_date < ?", (rows[0][1],))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def run_batch(today: date = None, horizon: int = FORECAST_HORIZON) -> dict:
+    """Fits every SKU with history and stores its forecasts. Returns run stats."""
+    today = today or date.today()
+    t0 = time.perf_counter()
+    skus, Y, start = load_history(today)
+    t1 = time.perf_counter()
+    rows = compute_forecasts(skus, Y, start, today, horizon)
+    t2 = time.perf_counter()
+    if rows:
+        _store(rows, datetime.now().isoformat(timespec="seconds"))
+    t3 = time.perf_counter()
+    stats = {
+        "skus": len(skus),
+        "rows": len(rows),
+        "load_s": round(t1 - t0, 3),
+        "fit_s": round(t2 - t1, 3),
+        "store_s": round(t3 - t2, 3)
+    }
+    print(f"📈 Demand forecasts refreshed: {stats}")
+    return stats
+
+
+def get_forecast(sku: str, days_ahead: int = 7, today: date = None) -> dict:
+    """
+    Forecast for the next `days_ahead` days (tomorrow onwards), in the
+    get_demand_forecast JSON shape. Served from demand_forecasts; a SKU the
+    nightly batch hasn't covered is fitted on demand and stored.
+    """
+    today = today or date.today()
+    conn = connect(SCHEMA)
+    try:
+        rows = conn.execute("""
+            SELECT forecast_date, predicted, confidence, model, generated_at FROM demand_forecasts
+            WHERE sku = ? AND forecast_date > ? ORDER BY forecast_date LIMIT ?
+        """, (sku, today.isoformat(), days_ahead)).fetchall()
+    finally:
+        conn.close()
+
+    if len(rows) < days_ahead:
+        names, Y, start = load_history(today, skus=[sku])
+        if not names:
+            names, Y, start = [sku], np.zeros((1, FORECAST_HISTORY_DAYS)), np.array([FORECAST_HISTORY_DAYS])
+        computed = compute_forecasts(names, Y, start, today, max(days_ahead, FORECAST_HORIZON))
+        generated_at = datetime.now().isoformat(timespec="seconds")
+        _store(computed, generated_at)
+        rows = [
+            {"forecast_date": r[1], "predicted": r[2], "confidence": r[5], "model": r[6], "generated_at": generated_at}
+            for r in computed if r[1] > today.isoformat()
+        ][:days_ahead]
+
+    forecasts = []
+    for r in rows:
+        day = date.fromisoformat(r["forecast_date"])
+        forecasts.append({
+            "date": r["forecast_date"],
+            "day_name": day.strftime("%A"),
+            "predicted_orders": int(round(r["predicted"])),
+            "confidence": int(r["confidence"])
+        })
+
+    total_predicted = sum(f["predicted_orders"] for f in forecasts)
+    peak_day = max(forecasts, key=lambda x: x["predicted_orders"])
+    return {
+        "sku": sku,
+        "forecast_period": f"Next {days_ahead} days",
+        "total_predicted_orders": total_predicted,
+        "avg_daily": round(total_predicted / days_ahead, 1),
+        "peak_day": peak_day["day_name"],
+        "peak_orders": peak_day["predicted_orders"],
+        "daily_forecast": forecasts,
+        "recommendation": "STOCK UP" if total_predicted > 200 else "NORMAL LEVELS",
+        "model": rows[0]["model"],
+        "generated_at": rows[0]["generated_at"]
+    }
+
+
+# --- Nightly scheduler ---
+
+_scheduler = None
+
+
+def _seconds_until_next_run(now: datetime) -> float:
+    run_at = now.replace(hour=FORECAST_RUN_HOUR, minute=0, second=0, microsecond=0)
+    if run_at <= now:
+        run_at += timedelta(days=1)
+    return (run_at - now).total_seconds()
+
+
+def _latest_generation() -> str | None:
+    conn = connect(SCHEMA)
+    try:
+        row = conn.execute("SELECT MAX(generated_at) AS latest FROM demand_forecasts").fetchone()
+        return row["latest"]
+    finally:
+        conn.close()
+
+
+def _scheduler_loop(stop: threading.Event):
+    # Catch up at startup if tonight's batch hasn't run yet
+    latest = _latest_generation()
+    if latest is None or latest[:10] < date.today().isoformat():
+        try:
+            run_batch()
+        except Exception as e:
+            print(f"⚠️ Forecast batch failed: {e}")
+    while not stop.wait(_seconds_until_next_run(datetime.now())):
+        try:
+            run_batch()
+        except Exception as e:
+            print(f"⚠️ Forecast batch failed: {e}")
+
+
+def start_scheduler() -> threading.Event:
+    """Starts the nightly batch thread (idempotent). Set the returned event to stop it."""
+    global _scheduler
+    if _scheduler is None or not _scheduler[0].is_alive():
+        stop = threading.Event()
+        thread = threading.Thread(target=_scheduler_loop, args=(stop,), name="forecast-batch", daemon=True)
+        thread.start()
+        _scheduler = (thread, stop)
+    return _scheduler[1]
@@ -0,0 +1,134 @@
+"""
+Vectorized distance engine for the logistics tools.
+
+Replaces per-call `geopy.distance.geodesic` (pure-Python Karney) with numpy:
+- `vincenty_matrix`: ellipsoidal (WGS-84) distances, many-to-many in one shot
+- `haversine_matrix`: spherical approximation, cheaper still (~0.3% error)
+- `distance_miles`: memoized single-pair lookup, so the same warehouse x ZIP
+  pair is only ever computed once per process
+See benchmarks/bench_geo.py for accuracy and throughput against geopy.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+# Mean Earth radius (IUGG) used by the haversine formula
+EARTH_RADIUS_MILES = 3958.7613
+KM_PER_MILE = 1.609344
+
+# WGS-84 ellipsoid (same model geopy uses by default)
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = (1 - WGS84_F) * WGS84_A
+METERS_PER_MILE = 1609.344
+
+VINCENTY_MAX_ITER = 200
+VINCENTY_TOLERANCE = 1e-12
+
+
+def _as_coords(points) -> np.ndarray:
+    return np.asarray(points, dtype=np.float64).reshape(-1, 2)
+
+
+def haversine_matrix(origins, destinations) -> np.ndarray:
+    """
+    Great-circle distance in miles between every origin and every destination.
+    origins: sequence/array of (lat, lng) with shape (N, 2)
+    destinations: sequence/array of (lat, lng) with shape (M, 2)
+    Returns an (N, M) array computed in one vectorized pass.
+    """
+    a = np.radians(_as_coords(origins))
+    b = np.radians(_as_coords(destinations))
+
+    lat1 = a[:, 0][:, None]
+    lat2 = b[:, 0][None, :]
+    dlat = lat2 - lat1
+    dlng = b[:, 1][None, :] - a[:, 1][:, None]
+
+    h = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def vincenty_matrix(origins, destinations) -> np.ndarray:
+    """
+    Vincenty inverse formula on the WGS-84 ellipsoid, in miles.
+    Same (N, 2) x (M, 2) -> (N, M) contract as `haversine_matrix`.
+    Agrees with geopy's geodesic to well under a millimetre for US routes;
+    the rare nearly-antipodal pairs that don't converge fall back to haversine.
+    """
+    a = np.radians(_as_coords(origins))
+    b = np.radians(_as_coords(destinations))
+
+    f = WGS84_F
+    U1 = np.arctan((1 - f) * np.tan(a[:, 0]))[:, None]
+    U2 = np.arctan((1 - f) * np.tan(b[:, 0]))[None, :]
+    L = b[:, 1][None, :] - a[:, 1][:, None]
+    L, U1, U2 = np.broadcast_arrays(L, U1, U2)
+
+    sinU1, cosU1 = np.sin(U1), np.cos(U1)
+    sinU2, cosU2 = np.sin(U2), np.cos(U2)
+
+    lam = L.copy()
+    active = np.ones(L.shape, dtype=bool)
+    sin_sigma = cos_sigma = sigma = cos2_alpha = cos_2sigma_m = np.zeros(L.shape)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for _ in range(VINCENTY_MAX_ITER):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(cosU2 * sin_lam, cosU1 * sinU2 - sinU1 * cosU2 * cos_lam)
+            cos_sigma = sinU1 * sinU2 + cosU1 * cosU2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cosU1 * cosU2 * sin_lam / sin_sigma)
+            cos2_alpha = 1 - sin_alpha ** 2
+            # Equatorial lines have cos2_alpha == 0
+            cos_2sigma_m = np.where(cos2_alpha == 0, 0.0, cos_sigma - 2 * sinU1 * sinU2 / cos2_alpha)
+            C = f / 16 * cos2_alpha * (4 + f * (4 - 3 * cos2_alpha))
+            lam_next = L + (1 - C) * f * sin_alpha * (
+                sigma + C * sin_sigma * (cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2))
+            )
+            active = np.abs(lam_next - lam) > VINCENTY_TOLERANCE
+            lam = lam_next
+            if not active.any():
+                break
+
+        u2 = cos2_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+        A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+        B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+        delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4 * (
+            cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+            - B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)
+        ))
+        miles = WGS84_B * A * (sigma - delta_sigma) / METERS_PER_MILE
+
+    failed = active | ~np.isfinite(miles)
+    if failed.any():
+        miles = np.where(failed, haversine_matrix(origins, destinations), miles)
+    return miles
+
+
+def distance_matrix(origins, destinations, method: str = "vincenty") -> np.ndarray:
+    """
+    Many-to-many distance matrix in miles.
+    method: 'vincenty' (ellipsoidal, default) or 'haversine' (spherical, faster)
+    """
+    if method == "haversine":
+        return haversine_matrix(origins, destinations)
+    return vincenty_matrix(origins, destinations)
+
+
+@lru_cache(maxsize=65536)
+def _pair_miles(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    return float(vincenty_matrix((lat1, lng1), (lat2, lng2))[0, 0])
+
+
+def distance_miles(coord_a, coord_b) -> float:
+    """
+    Memoized point-to-point distance in miles (drop-in for geodesic(a, b).miles).
+    Warehouse x ZIP pairs repeat constantly, so each is computed once.
+    """
+    return _pair_miles(float(coord_a[0]), float(coord_a[1]), float(coord_b[0]), float(coord_b[1]))
+
+
+def distance_km(coord_a, coord_b) -> float:
+    """Memoized point-to-point distance in kilometres."""
+    return distance_miles(coord_a, coord_b) * KM_PER_MILE
@@ -0,0 +1,401 @@
+"""
+Supplier inventory snapshot store.
+
+The supplier portal has no API, so stock levels are scraped from its HTML.
+Instead of re-scraping on every logistics run:
+- a background refresher re-scrapes every tracked SKU on a schedule and
+  upserts the result into `inventory_stock` (one row per SKU x warehouse)
+- reads are served from that snapshot with freshness metadata; a SKU that
+  was never scraped, or whose snapshot is older than INVENTORY_MAX_AGE, is
+  scraped on demand
+- reservations claim units atomically (BEGIN IMMEDIATE + a conditional
+  UPDATE), so two logistics runs can never allocate the same units
+- a reservation ends when its order ships (fulfil: the units leave on_hand
+  and reserved together, so the next scrape's lower count isn't subtracted
+  twice), when it is released, or when it is still ACTIVE after
+  INVENTORY_RESERVATION_TTL_HOURS (expired on each refresh); released and
+  expired reservations never shipped, so their carbon ledger rows are voided
+
+Parsing uses lxml when it is installed and falls back to BeautifulSoup.
+"""
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+import requests
+
+from database import connect
+from services import carbon
+
+try:
+    from lxml import html as lxml_html
+except ImportError:  # pragma: no cover - lxml is in requirements.txt
+    lxml_html = None
+
+INVENTORY_REFRESH_SECONDS = int(os.environ.get("INVENTORY_REFRESH_SECONDS", "300"))
+INVENTORY_MAX_AGE = int(os.environ.get("INVENTORY_MAX_AGE", "900"))  # Older snapshots are re-scraped on read
+SUPPLIER_PORTAL_URL = os.environ.get("SUPPLIER_PORTAL_URL")           # Unset = simulated portal
+INVENTORY_RESERVATION_TTL_HOURS = float(os.environ.get("INVENTORY_RESERVATION_TTL_HOURS", "336"))  # 14 days
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS inventory_stock (
+    sku TEXT NOT NULL,
+    warehouse TEXT NOT NULL,
+    on_hand INTEGER NOT NULL,
+    reserved INTEGER NOT NULL DEFAULT 0,
+    scraped_at REAL NOT NULL,
+    PRIMARY KEY (sku, warehouse)
+);
+CREATE TABLE IF NOT EXISTS inventory_reservations (
+    id TEXT NOT NULL,
+    reference TEXT,
+    sku TEXT NOT NULL,
+    warehouse TEXT NOT NULL,
+    qty INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'ACTIVE',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, sku, warehouse)
+);
+CREATE INDEX IF NOT EXISTS idx_inventory_reservations_reference ON inventory_reservations(reference);
+"""
+
+
+class InsufficientStock(Exception):
+    """Raised when a reservation asks for more units than are available."""
+
+    def __init__(self, sku: str, warehouse: str | None, requested: int, available: int):
+        self.sku = sku
+        self.warehouse = warehouse
+        self.requested = requested
+        self.available = available
+        where = f" at {warehouse}" if warehouse else ""
+        super().__init__(f"Insufficient stock for {sku}{where}: requested {requested}, available {available}")
+
+
+# --- Scraping ---
+
+def _simulated_portal_html(sku: str) -> str:
+    # The legacy intranet page (no API available) - the "Real World" messiness of logistics
+    return f"""
+    <html>
+        <body>
+            <h1>Supplier Stock Portal - {sku}</h1>
+            <table id="inventory-table">
+                <tr><th>Warehouse</th><th>Qty</th><th>Status</th></tr>
+                <tr class="row-nj"><td>New Jersey (NJ)</td><td>150</td><td>Active</td></tr>
+                <tr class="row-tx"><td>Texas (TX)</td><td>100</td><td>Active</td></tr>
+                <tr class="row-ca"><td>California (CA)</td><td>50</td><td>Active</td></tr>
+            </table>
+        </body>
+    </html>
+    """
+
+
+def fetch_portal_html(sku: str) -> str:
+    if SUPPLIER_PORTAL_URL:
+        response = requests.get(SUPPLIER_PORTAL_URL, params={"sku": sku}, timeout=10)
+        response.raise_for_status()
+        return response.text
+    return _simulated_portal_html(sku)
+
+
+def parse_inventory_html(raw_html: str) -> dict:
+    """{warehouse label: qty} from the portal's inventory table (header row skipped)."""
+    if lxml_html is not None:
+        doc = lxml_html.fromstring(raw_html)
+        rows = [[td.text_content() for td in tr.findall("td")] for tr in doc.iter("tr")]
+    else:
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(raw_html, "html.parser")
+        rows = [[td.text for td in tr.find_all("td")] for tr in soup.find_all("tr")]
+
+    stock = {}
+    for cols in rows:
+        if len(cols) < 2:
+            continue  # Header row uses <th>
+        stock[cols[0].strip()] = int(cols[1].strip())
+    return stock
+
+
+# --- Snapshot store ---
+
+class InventoryStore:
+    """SQLite-backed inventory snapshot with scheduled refresh and reservations."""
+
+    def __init__(self, max_age: float = INVENTORY_MAX_AGE, refresh_interval: float = INVENTORY_REFRESH_SECONDS):
+        self.max_age = max_age
+        self.refresh_interval = refresh_interval
+        self._scrape_locks = {}
+        self._scrape_locks_guard = threading.Lock()
+        self._refresher = None
+        self._stop = threading.Event()
+
+    def _conn(self) -> sqlite3.Connection:
+        # Autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE
+        return connect(SCHEMA, autocommit=True)
+
+    def refresh_sku(self, sku: str) -> dict:
+        """Scrapes one SKU and upserts it. Reserved counts are left untouched."""
+        stock = parse_inventory_html(fetch_portal_html(sku))
+        now = time.time()
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("""
+                INSERT INTO inventory_stock (sku, warehouse, on_hand, scraped_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(sku, warehouse) DO UPDATE SET
+                    on_hand = excluded.on_hand,
+                    scraped_at = excluded.scraped_at
+            """, [(sku, warehouse, qty, now) for warehouse, qty in stock.items()])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return stock
+
+    def refresh_all(self) -> int:
+        """Expires abandoned reservations, then re-scrapes every SKU in the snapshot. Returns how many succeeded."""
+        expired = self.expire_reservations()
+        if expired:
+            print(f"📦 Expired {expired} abandoned reservation(s)")
+        conn = self._conn()
+        try:
+            skus = [row["sku"] for row in conn.execute("SELECT DISTINCT sku FROM inventory_stock")]
+        finally:
+            conn.close()
+
+        refreshed = 0
+        for sku in skus:
+            try:
+                self.refresh_sku(sku)
+                refreshed += 1
+            except Exception as e:
+                print(f"⚠️ Inventory refresh failed for {sku}: {e}")
+        return refreshed
+
+    def _rows(self, sku: str) -> list:
+        conn = self._conn()
+        try:
+            return conn.execute(
+                "SELECT warehouse, on_hand, reserved, scraped_at FROM inventory_stock WHERE sku = ? ORDER BY rowid",
+                (sku,)
+            ).fetchall()
+        finally:
+            conn.close()
+
+    def snapshot(self, sku: str) -> dict:
+        """
+        Current stock for a SKU:
+        {"sku", "available", "reserved", "on_hand", "scraped_at", "age_seconds", "stale"}
+        `available` is on_hand minus active reservations.
+        If a needed re-scrape fails, the last snapshot is served with stale=True.
+        """
+        rows = self._rows(sku)
+        if not rows or time.time() - min(r["scraped_at"] for r in rows) > self.max_age:
+            # One scrape per SKU at a time; concurrent readers wait for it
+            with self._scrape_lock(sku):
+                rows = self._rows(sku)
+                if not rows or time.time() - min(r["scraped_at"] for r in rows) > self.max_age:
+                    try:
+                        self.refresh_sku(sku)
+                    except Exception as e:
+                        if not rows:
+                            raise
+                        print(f"⚠️ Inventory scrape failed for {sku}, serving last snapshot: {e}")
+                    rows = self._rows(sku)
+
+        scraped_at = min(r["scraped_at"] for r in rows)
+        age = max(time.time() - scraped_at, 0.0)
+        return {
+            "sku": sku,
+            "available": {r["warehouse"]: max(r["on_hand"] - r["reserved"], 0) for r in rows},
+            "reserved": {r["warehouse"]: r["reserved"] for r in rows},
+            "on_hand": {r["warehouse"]: r["on_hand"] for r in rows},
+            "scraped_at": datetime.fromtimestamp(scraped_at, timezone.utc).isoformat(timespec="seconds"),
+            "age_seconds": round(age, 1),
+            "stale": age > self.max_age
+        }
+
+    def _scrape_lock(self, sku: str) -> threading.Lock:
+        with self._scrape_locks_guard:
+            return self._scrape_locks.setdefault(sku, threading.Lock())
+
+    # --- Reservations ---
+
+    def reserve(self, allocations: list, reference: str = None) -> str:
+        """
+        Atomically reserves [(sku, warehouse, qty), ...] - all or nothing.
+        Returns the reservation id; raises InsufficientStock if any leg can't be covered.
+        """
+        reservation_id = uuid.uuid4().hex[:12]
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for sku, warehouse, qty in allocations:
+                if qty <= 0:
+                    continue
+                cursor = conn.execute("""
+                    UPDATE inventory_stock SET reserved = reserved + ?
+                    WHERE sku = ? AND warehouse = ? AND on_hand - reserved >= ?
+                """, (qty, sku, warehouse, qty))
+                if cursor.rowcount == 0:
+                    row = conn.execute(
+                        "SELECT on_hand - reserved AS available FROM inventory_stock WHERE sku = ? AND warehouse = ?",
+                        (sku, warehouse)
+                    ).fetchone()
+                    raise InsufficientStock(sku, warehouse, qty, max(row["available"], 0) if row else 0)
+                conn.execute("""
+                    INSERT INTO inventory_reservations (id, reference, sku, warehouse, qty)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(id, sku, warehouse) DO UPDATE SET qty = qty + excluded.qty
+                """, (reservation_id, reference, sku, warehouse, qty))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return reservation_id
+
+    def reserve_order(self, sku: str, qty: int, reference: str = None, preference: list = None) -> dict:
+        """
+        Reserves `qty` units of a SKU across warehouses in one transaction.
+        Warehouses are tried in `preference` order, then by most available.
+        Returns {"reservation_id", "sku", "allocations": {warehouse: qty}}.
+        """
+        self.snapshot(sku)  # Make sure the SKU has a fresh-enough snapshot
+        reservation_id = uuid.uuid4().hex[:12]
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT warehouse, on_hand - reserved AS available FROM inventory_stock WHERE sku = ?", (sku,)
+            ).fetchall()
+            available = {r["warehouse"]: max(r["available"], 0) for r in rows}
+            total = sum(available.values())
+            if total < qty:
+                raise InsufficientStock(sku, None, qty, total)
+
+            rank = {w: i for i, w in enumerate(preference or [])}
+            order = sorted(available, key=lambda w: (rank.get(w, len(rank)), -available[w]))
+            allocations, need = {}, qty
+            for warehouse in order:
+                take = min(need, available[warehouse])
+                if take <= 0:
+                    continue
+                # Still conditional: the snapshot can't change under BEGIN IMMEDIATE, but keep the guard
+                conn.execute("""
+                    UPDATE inventory_stock SET reserved = reserved + ?
+                    WHERE sku = ? AND warehouse = ? AND on_hand - reserved >= ?
+                """, (take, sku, warehouse, take))
+                conn.execute(
+                    "INSERT INTO inventory_reservations (id, reference, sku, warehouse, qty) VALUES (?, ?, ?, ?, ?)",
+                    (reservation_id, reference, sku, warehouse, take)
+                )
+                allocations[warehouse] = take
+                need -= take
+                if need == 0:
+                    break
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return {"reservation_id": reservation_id, "sku": sku, "allocations": allocations}
+
+    def release(self, reservation_id: str) -> int:
+        """Returns an active reservation's units to stock. Returns units released (0 if unknown/already closed)."""
+        return self._close(reservation_id, "RELEASED", shipped=False)
+
+    def fulfil(self, reservation_id: str) -> int:
+        """
+        The reserved units shipped: they leave on_hand and reserved together, so
+        the snapshot stays right until the portal's own count drops. Returns units
+        shipped (0 if unknown/already closed).
+        """
+        return self._close(reservation_id, "FULFILLED", shipped=True)
+
+    def fulfil_reference(self, reference: str) -> int:
+        """Fulfils every active reservation made for `reference` (e.g. "lead-42"). Returns units shipped."""
+        return sum(self.fulfil(r["id"]) for r in self.reservations(reference) if r["status"] == "ACTIVE")
+
+    def expire_reservations(self, ttl_hours: float = None) -> int:
+        """Releases reservations still ACTIVE after the TTL (orders that never shipped). Returns how many."""
+        ttl_hours = INVENTORY_RESERVATION_TTL_HOURS if ttl_hours is None else ttl_hours
+        conn = self._conn()
+        try:
+            ids = [row["id"] for row in conn.execute(
+                "SELECT DISTINCT id FROM inventory_reservations WHERE status = 'ACTIVE' AND created_at < datetime('now', ?)",
+                (f"-{ttl_hours} hours",)
+            )]
+        finally:
+            conn.close()
+        return sum(1 for reservation_id in ids if self._close(reservation_id, "EXPIRED", shipped=False))
+
+    def _close(self, reservation_id: str, status: str, shipped: bool) -> int:
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            legs = conn.execute(
+                "SELECT sku, warehouse, qty FROM inventory_reservations WHERE id = ? AND status = 'ACTIVE'",
+                (reservation_id,)
+            ).fetchall()
+            for leg in legs:
+                conn.execute("""
+                    UPDATE inventory_stock SET reserved = MAX(reserved - ?, 0), on_hand = MAX(on_hand - ?, 0)
+                    WHERE sku = ? AND warehouse = ?
+                """, (leg["qty"], leg["qty"] if shipped else 0, leg["sku"], leg["warehouse"]))
+            conn.execute("UPDATE inventory_reservations SET status = ? WHERE id = ? AND status = 'ACTIVE'",
+                         (status, reservation_id))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        if legs and not shipped:
+            carbon.void_reservation(reservation_id)
+        return sum(leg["qty"] for leg in legs)
+
+    def reservations(self, reference: str) -> list:
+        conn = self._conn()
+        try:
+            rows = conn.execute(
+                "SELECT * FROM inventory_reservations WHERE reference = ? ORDER BY created_at", (reference,)
+            ).fetchall()
+            return [dict(r) for r in rows]
+        finally:
+            conn.close()
+
+    # --- Scheduler ---
+
+    def start_refresher(self):
+        """Starts the background re-scrape loop (idempotent)."""
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+        self._stop.clear()
+        self._refresher = threading.Thread(target=self._refresh_loop, name="inventory-refresh", daemon=True)
+        self._refresher.start()
+
+    def stop_refresher(self):
+        self._stop.set()
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                count = self.refresh_all()
+                if count:
+                    print(f"📦 Inventory snapshot refreshed ({count} SKUs)")
+            except Exception as e:
+                print(f"⚠️ Inventory refresh loop error: {e}")
+
+
+# Process-wide store used by the logistics tools and endpoints
+inventory_store = InventoryStore()
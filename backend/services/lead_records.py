@@ -0,0 +1,210 @@
+"""
+Structured records for each pipeline stage of a lead.
+
+The Scout, Designer and Logistics savers used to overwrite the single
+`leads.draft_email` column with a pipe-delimited string, so every stage
+destroyed the one before it and numbers had to be scraped back out of text.
+Each stage now appends a typed row to its own table:
+- lead_strategies: strategy, email draft, sentiment, lead score
+- designs: image, cost per unit, colors, print technique, margin
+- logistics_plans: plan text, total cost, carbon, stock shortage flag
+Rows are versioned (a rejected-then-redone stage adds a new row); the latest
+row per lead is the current one. `leads` keeps only status and the email draft.
+"""
+import re
+
+from database import connect
+from services.tracing import traced
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lead_strategies (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    lead_id INTEGER NOT NULL,
+    strategy TEXT,
+    email_draft TEXT,
+    sentiment TEXT NOT NULL DEFAULT 'NEUTRAL',
+    lead_score INTEGER,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_lead_strategies_lead ON lead_strategies(lead_id, id);
+CREATE INDEX IF NOT EXISTS idx_lead_strategies_score ON lead_strategies(lead_score);
+CREATE TABLE IF NOT EXISTS designs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    lead_id INTEGER NOT NULL,
+    image_url TEXT,
+    cost_report TEXT,
+    cost_per_unit REAL,
+    color_count INTEGER,
+    print_technique TEXT,
+    profit_margin REAL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_designs_lead ON designs(lead_id, id);
+CREATE INDEX IF NOT EXISTS idx_designs_margin ON designs(profit_margin);
+CREATE TABLE IF NOT EXISTS logistics_plans (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    lead_id INTEGER NOT NULL,
+    plan_details TEXT,
+    total_cost REAL,
+    carbon_kg REAL,
+    insufficient_stock INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_logistics_plans_lead ON logistics_plans(lead_id, id);
+CREATE INDEX IF NOT EXISTS idx_logistics_plans_carbon ON logistics_plans(carbon_kg);
+"""
+
+# Latest row per lead (id order = save order)
+LATEST = "id IN (SELECT MAX(id) FROM {table} GROUP BY lead_id)"
+
+COST_PATTERN = re.compile(r"\$\s*(\d+(?:\.\d+)?)")
+
+
+def parse_cost_per_unit(cost_report: str) -> float | None:
+    """'Detected 4 Ink Colors. Est Cost: $8.00/shirt' -> 8.0"""
+    match = COST_PATTERN.search(cost_report or "")
+    return float(match.group(1)) if match else None
+
+
+# --- Writers (one per pipeline stage) ---
+
+@traced("db.save_strategy", kind="db", root=False)
+def save_strategy(lead_id: int, strategy: str, email_draft: str, sentiment: str, lead_score: int) -> int:
+    conn = connect(SCHEMA)
+    try:
+        cursor = conn.execute(
+            "INSERT INTO lead_strategies (lead_id, strategy, email_draft, sentiment, lead_score) VALUES (?, ?, ?, ?, ?)",
+            (lead_id, strategy, email_draft, (sentiment or "NEUTRAL").upper(), lead_score)
+        )
+        conn.execute(
+            "UPDATE leads SET status='DRAFTED', vibe_tags=?, draft_email=? WHERE id=?",
+            (strategy, email_draft, lead_id)
+        )
+        conn.commit()
+        return cursor.lastrowid
+    finally:
+        conn.close()
+
+
+@traced("db.save_design", kind="db", root=False)
+def save_design(lead_id: int, image_url: str, cost_report: str, color_count: int,
+                print_technique: str, profit_margin: float) -> int:
+    conn = connect(SCHEMA)
+    try:
+        cursor = conn.execute("""
+            INSERT INTO designs (lead_id, image_url, cost_report, cost_per_unit, color_count, print_technique, profit_margin)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (lead_id, image_url, cost_report, parse_cost_per_unit(cost_report), color_count, print_technique, profit_margin))
+        conn.execute("UPDATE leads SET status='DESIGN_READY' WHERE id=?", (lead_id,))
+        conn.commit()
+        return cursor.lastrowid
+    finally:
+        conn.close()
+
+
+@traced("db.save_logistics_plan", kind="db", root=False)
+def save_logistics_plan(lead_id: int, plan_details: str, total_cost: float, carbon_kg: float) -> int:
+    conn = connect(SCHEMA)
+    try:
+        cursor = conn.execute("""
+            INSERT INTO logistics_plans (lead_id, plan_details, total_cost, carbon_kg, insufficient_stock)
+            VALUES (?, ?, ?, ?, ?)
+        """, (lead_id, plan_details, total_cost, carbon_kg, int("insufficient" in (plan_details or "").lower())))
+        conn.execute("UPDATE leads SET status='SHIPPING_PLANNED' WHERE id=?", (lead_id,))
+        conn.commit()
+        return cursor.lastrowid
+    finally:
+        conn.close()
+
+
+# --- Readers ---
+
+def lead_records(lead_id: int, history: bool = False) -> dict:
+    """Current strategy, design and logistics plan for a lead (plus earlier versions if history)."""
+    conn = connect(SCHEMA)
+    try:
+        lead = conn.execute("SELECT id, title, organization, status FROM leads WHERE id = ?", (lead_id,)).fetchone()
+        result = {"lead": dict(lead) if lead else None}
+        for key, table in (("strategy", "lead_strategies"), ("design", "designs"), ("logistics_plan", "logistics_plans")):
+            rows = [dict(r) for r in conn.execute(
+                f"SELECT * FROM {table} WHERE lead_id = ? ORDER BY id DESC", (lead_id,)
+            ).fetchall()]
+            result[key] = rows[0] if rows else None
+            if history:
+                result[f"{key}_history"] = rows[1:]
+        return result
+    finally:
+        conn.close()
+
+
+def _query(table: str, filters: list, order_by: str, limit: int) -> list:
+    where = [LATEST.format(table=table)] + [clause for clause, _ in filters]
+    args = [value for _, value in filters]
+    conn = connect(SCHEMA)
+    try:
+        rows = conn.execute(
+            f"SELECT * FROM {table} WHERE {' AND '.join(where)} ORDER BY {order_by} LIMIT ?", (*args, limit)
+        ).fetchall()
+        return [dict(row) for row in rows]
+    finally:
+        conn.close()
+
+
+def query_strategies(min_score: int = None, sentiment: str = None, limit: int = 100) -> list:
+    filters = []
+    if min_score is not None:
+        filters.append(("lead_score >= ?", min_score))
+    if sentiment:
+        filters.append(("sentiment = ?", sentiment.upper()))
+    return _query("lead_strategies", filters, "lead_score DESC, id DESC", limit)
+
+
+def query_designs(min_margin: float = None, max_cost: float = None, technique: str = None, limit: int = 100) -> list:
+    filters = []
+    if min_margin is not None:
+        filters.append(("profit_margin >= ?", min_margin))
+    if max_cost is not None:
+        filters.append(("cost_per_unit <= ?", max_cost))
+    if technique:
+        filters.append(("print_technique = ?", technique))
+    return _query("designs", filters, "profit_margin DESC, id DESC", limit)
+
+
+def query_logistics_plans(max_carbon: float = None, max_cost: float = None, insufficient_stock: bool = None,
+                          limit: int = 100) -> list:
+    filters = []
+    if max_carbon is not None:
+        filters.append(("carbon_kg <= ?", max_carbon))
+    if max_cost is not None:
+        filters.append(("total_cost <= ?", max_cost))
+    if insufficient_stock is not None:
+        filters.append(("insufficient_stock = ?", int(insufficient_stock)))
+    return _query("logistics_plans", filters, "id DESC", limit)
+
+
+def pipeline_summary() -> dict:
+    """Dashboard aggregates over the current record of every lead."""
+    conn = connect(SCHEMA)
+    try:
+        strategies = conn.execute(f"""
+            SELECT COUNT(*) AS leads, AVG(lead_score) AS avg_score,
+                   SUM(sentiment = 'POSITIVE') AS positive, SUM(sentiment = 'NEGATIVE') AS negative
+            FROM lead_strategies WHERE {LATEST.format(table='lead_strategies')}
+        """).fetchone()
+        designs = conn.execute(f"""
+            SELECT COUNT(*) AS designs, AVG(cost_per_unit) AS avg_cost_per_unit,
+                   AVG(profit_margin) AS avg_margin, AVG(color_count) AS avg_colors
+            FROM designs WHERE {LATEST.format(table='designs')}
+        """).fetchone()
+        plans = conn.execute(f"""
+            SELECT COUNT(*) AS plans, SUM(total_cost) AS total_cost, SUM(carbon_kg) AS total_carbon_kg,
+                   SUM(insufficient_stock) AS stock_shortages
+            FROM logistics_plans WHERE {LATEST.format(table='logistics_plans')}
+        """).fetchone()
+    finally:
+        conn.close()
+
+    def rounded(row) -> dict:
+        return {k: round(v, 2) if isinstance(v, float) else v for k, v in dict(row).items()}
+
+    return {"strategies": rounded(strategies), "designs": rounded(designs), "logistics": rounded(plans)}
@@ -0,0 +1,87 @@
+"""
+One leader among the uvicorn workers for the background jobs that write to
+the shared database.
+
+The nightly forecast batch, the inventory re-scrape and the approval token
+sweep each started a thread in every worker, so with --workers 4 the portal
+was scraped four times per interval and the nightly batch fitted every SKU
+four times. Now each worker joins an election on startup: whoever holds an
+exclusive flock on LEADER_LOCK_FILE runs the jobs registered with
+on_elected(). The lock is released by the OS when the process exits, and
+the other workers retry every LEADER_RETRY_SECONDS, so a replacement leader
+takes over after a crash without any coordination service.
+
+Per-process caches (weather alerts, route payloads) keep refreshing in
+every worker; they are not registered here.
+"""
+import fcntl
+import os
+import threading
+
+from database import DB_NAME
+
+LEADER_LOCK_FILE = os.environ.get("LEADER_LOCK_FILE", DB_NAME + ".leader")
+LEADER_RETRY_SECONDS = float(os.environ.get("LEADER_RETRY_SECONDS", "10"))
+
+_jobs = []
+_jobs_lock = threading.Lock()
+_lock_file = None        # Held open for the life of the process once elected
+_elector = None
+
+
+def is_leader() -> bool:
+    return _lock_file is not None
+
+
+def _try_acquire() -> bool:
+    global _lock_file
+    f = open(LEADER_LOCK_FILE, "a+")
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return False
+    f.seek(0)
+    f.truncate()
+    f.write(f"{os.getpid()}\n")
+    f.flush()
+    with _jobs_lock:
+        _lock_file = f
+        jobs = list(_jobs)
+    print(f"👑 Worker {os.getpid()} is the background job leader")
+    for job in jobs:
+        job()
+    return True
+
+
+def on_elected(job):
+    """Runs `job` once this worker is (or as soon as it becomes) the leader."""
+    with _jobs_lock:
+        _jobs.append(job)
+        elected = _lock_file is not None
+    if elected:
+        job()
+
+
+def _elect_loop(stop: threading.Event):
+    while not stop.wait(LEADER_RETRY_SECONDS):
+        try:
+            if _try_acquire():
+                return
+        except Exception as e:
+            print(f"⚠️ Leader election failed: {e}")
+
+
+def start_election() -> threading.Event:
+    """
+    Tries for the lock now and, if another worker holds it, keeps retrying in
+    the background (idempotent). Set the returned event to stop retrying.
+    """
+    global _elector
+    if _elector is None:
+        stop = threading.Event()
+        if not _try_acquire():
+            thread = threading.Thread(target=_elect_loop, args=(stop,), name="leader-election", daemon=True)
+            thread.start()
+        _elector = stop
+    return _elector
@@ -0,0 +1,339 @@
+"""
+Per-run token, latency and cost accounting for the agents.
+
+`log_agent_step` only stores text, so there was no way to tell what a
+scout/designer/logistics run cost or which step was slow. Each agent run now
+gets a RunRecorder (a LangChain callback handler) that times every model call
+and tool call, takes token usage from the model responses, and counts DALL-E
+images generated inside tools. The recorder is also the run's context
+(contextvar), so tools calling the OpenAI client directly attribute their
+usage with record_completion / record_images.
+
+Rows are buffered in memory and written once when the run stops:
+- agent_runs     one row per run: outcome, wall time, tokens, tool calls, images, cost
+                 (a run resumed after approval adds a row for the resumed half)
+- agent_metrics  one row per model call / tool call / image batch in the run
+
+`prometheus_text()` serves /metrics from SQL aggregates (so every worker
+process reports the same totals) and `run_profile()` the per-lead breakdown.
+"""
+import contextvars
+from contextlib import contextmanager
+import threading
+import time
+import uuid
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from database import connect
+from services.tracing import traced
+
+# USD per million (input, output) tokens, matched on the model name prefix (longest first)
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+DEFAULT_MODEL = "gpt-4o"
+
+# USD per image (1024x1024, standard quality)
+IMAGE_PRICES = {"dall-e-3": 0.040}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS agent_runs (
+    run_id TEXT PRIMARY KEY,
+    agent TEXT NOT NULL,
+    lead_id INTEGER NOT NULL,
+    thread_id TEXT,
+    outcome TEXT,
+    seconds REAL,
+    llm_calls INTEGER NOT NULL DEFAULT 0,
+    input_tokens INTEGER NOT NULL DEFAULT 0,
+    output_tokens INTEGER NOT NULL DEFAULT 0,
+    tool_calls INTEGER NOT NULL DEFAULT 0,
+    images INTEGER NOT NULL DEFAULT 0,
+    cost_usd REAL NOT NULL DEFAULT 0,
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_agent_runs_lead ON agent_runs(lead_id, started_at);
+CREATE TABLE IF NOT EXISTS agent_metrics (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL,
+    agent TEXT NOT NULL,
+    lead_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,             -- 'llm', 'tool' or 'image'
+    name TEXT NOT NULL,             -- model or tool name
+    seconds REAL,
+    input_tokens INTEGER NOT NULL DEFAULT 0,
+    output_tokens INTEGER NOT NULL DEFAULT 0,
+    images INTEGER NOT NULL DEFAULT 0,
+    cost_usd REAL NOT NULL DEFAULT 0,
+    error INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_agent_metrics_run ON agent_metrics(run_id);
+CREATE INDEX IF NOT EXISTS idx_agent_metrics_kind ON agent_metrics(kind, agent, name);
+"""
+
+
+# --- Pricing ---
+
+def model_price(model_name: str) -> tuple:
+    for prefix in sorted(MODEL_PRICES, key=len, reverse=True):
+        if (model_name or "").startswith(prefix):
+            return MODEL_PRICES[prefix]
+    return MODEL_PRICES[DEFAULT_MODEL]
+
+
+def llm_cost(model_name: str, input_tokens: int, output_tokens: int) -> float:
+    input_price, output_price = model_price(model_name)
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+# --- Recording ---
+
+_current_run: contextvars.ContextVar = contextvars.ContextVar("agent_run", default=None)
+
+
+class RunRecorder(BaseCallbackHandler):
+    """
+    Collects the model calls, tool calls and images of one agent run. Pass it
+    in the graph config's callbacks and enter `active()` around the run; call
+    `finish(outcome)` once to write it out.
+    """
+
+    def __init__(self, agent: str, lead_id: int, thread_id: str):
+        self.run_id = uuid.uuid4().hex
+        self.agent, self.lead_id, self.thread_id = agent, lead_id, thread_id
+        self.started = time.perf_counter()
+        self.rows = []                  # (kind, name, seconds, input_tokens, output_tokens, images, cost_usd, error)
+        self._open = {}                 # callback run_id -> (name, start time)
+        self._lock = threading.Lock()   # sync tools report from worker threads
+
+    # Totals over the rows so far (the runtime checks budgets against these)
+    def _total(self, column: int) -> float:
+        with self._lock:
+            return sum(row[column] for row in self.rows)
+
+    @property
+    def input_tokens(self) -> int:
+        return self._total(3)
+
+    @property
+    def output_tokens(self) -> int:
+        return self._total(4)
+
+    @property
+    def images(self) -> int:
+        return self._total(5)
+
+    @property
+    def cost_usd(self) -> float:
+        return self._total(6)
+
+    def add(self, kind: str, name: str, seconds: float = None, input_tokens: int = 0, output_tokens: int = 0,
+            images: int = 0, cost_usd: float = 0.0, error: bool = False):
+        with self._lock:
+            self.rows.append((kind, name, seconds, input_tokens, output_tokens, images, cost_usd, int(error)))
+
+    @contextmanager
+    def active(self):
+        """Makes this the current run for record_completion / record_images."""
+        token = _current_run.set(self)
+        try:
+            yield self
+        finally:
+            _current_run.reset(token)
+
+    # -- LangChain callbacks --
+
+    def _start(self, run_id, name: str):
+        self._open[run_id] = (name, time.perf_counter())
+
+    def _stop(self, run_id) -> tuple:
+        name, started = self._open.pop(run_id, ("unknown", time.perf_counter()))
+        return name, time.perf_counter() - started
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        params = kwargs.get("invocation_params") or {}
+        self._start(run_id, params.get("model_name") or params.get("model") or DEFAULT_MODEL)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        name, seconds = self._stop(run_id)
+        input_tokens = output_tokens = 0
+        for generation in (response.generations[0] if response.generations else []):
+            message = getattr(generation, "message", None)
+            usage = getattr(message, "usage_metadata", None) or {}
+            input_tokens += usage.get("input_tokens", 0)
+            output_tokens += usage.get("output_tokens", 0)
+            name = (getattr(message, "response_metadata", None) or {}).get("model_name") or name
+        self.add("llm", name, seconds, input_tokens, output_tokens,
+                 cost_usd=llm_cost(name, input_tokens, output_tokens))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        name, seconds = self._stop(run_id)
+        self.add("llm", name, seconds, error=True)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._start(run_id, (serialized or {}).get("name") or kwargs.get("name") or "unknown")
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        name, seconds = self._stop(run_id)
+        self.add("tool", name, seconds)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        name, seconds = self._stop(run_id)
+        self.add("tool", name, seconds, error=True)
+
+    # -- Output --
+
+    def summary(self) -> dict:
+        with self._lock:
+            rows = list(self.rows)
+        return {
+            "seconds": round(time.perf_counter() - self.started, 3),
+            "llm_calls": sum(1 for r in rows if r[0] == "llm"),
+            "input_tokens": sum(r[3] for r in rows),
+            "output_tokens": sum(r[4] for r in rows),
+            "tool_calls": sum(1 for r in rows if r[0] == "tool"),
+            "images": sum(r[5] for r in rows),
+            "cost_usd": round(sum(r[6] for r in rows), 6)
+        }
+
+    @traced("db.record_run", kind="db", root=False)
+    def finish(self, outcome: str) -> dict:
+        """Writes the run and its rows in one transaction; returns the run totals."""
+        totals = self.summary()
+        with self._lock:
+            rows = list(self.rows)
+        conn = connect(SCHEMA)
+        try:
+            conn.execute("""
+                INSERT INTO agent_runs (run_id, agent, lead_id, thread_id, outcome, seconds, llm_calls,
+                                        input_tokens, output_tokens, tool_calls, images, cost_usd)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (self.run_id, self.agent, self.lead_id, self.thread_id, outcome, totals["seconds"],
+                  totals["llm_calls"], totals["input_tokens"], totals["output_tokens"], totals["tool_calls"],
+                  totals["images"], totals["cost_usd"]))
+            conn.executemany("""
+                INSERT INTO agent_metrics (run_id, agent, lead_id, kind, name, seconds, input_tokens,
+                                           output_tokens, images, cost_usd, error)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [(self.run_id, self.agent, self.lead_id, *row) for row in rows])
+            conn.commit()
+        finally:
+            conn.close()
+        return totals
+
+
+def record_completion(response, seconds: float = None):
+    """Token usage of a raw OpenAI chat completion made inside a tool (no-op outside a run)."""
+    recorder = _current_run.get()
+    usage = getattr(response, "usage", None)
+    if recorder is None or usage is None:
+        return
+    model = getattr(response, "model", None) or DEFAULT_MODEL
+    recorder.add("llm", model, seconds, usage.prompt_tokens, usage.completion_tokens,
+                 cost_usd=llm_cost(model, usage.prompt_tokens, usage.completion_tokens))
+
+
+def record_images(count: int, model: str = "dall-e-3"):
+    """Images generated inside a tool (no-op outside a run)."""
+    recorder = _current_run.get()
+    if recorder is None or count <= 0:
+        return
+    recorder.add("image", model, images=count, cost_usd=count * IMAGE_PRICES.get(model, 0.0))
+
+
+# --- Readers ---
+
+def run_profile(lead_id: int, limit: int = 10) -> dict:
+    """Latest runs for a lead with a per-step breakdown, slowest steps first."""
+    conn = connect(SCHEMA)
+    try:
+        runs = [dict(r) for r in conn.execute(
+            "SELECT * FROM agent_runs WHERE lead_id = ? ORDER BY started_at DESC, rowid DESC LIMIT ?", (lead_id, limit)
+        ).fetchall()]
+        for run in runs:
+            run["steps"] = [dict(r) for r in conn.execute("""
+                SELECT kind, name, COUNT(*) AS calls, ROUND(SUM(seconds), 3) AS total_seconds,
+                       ROUND(MAX(seconds), 3) AS max_seconds, SUM(input_tokens) AS input_tokens,
+                       SUM(output_tokens) AS output_tokens, SUM(images) AS images,
+                       ROUND(SUM(cost_usd), 6) AS cost_usd, SUM(error) AS errors
+                FROM agent_metrics WHERE run_id = ?
+                GROUP BY kind, name ORDER BY total_seconds DESC
+            """, (run["run_id"],)).fetchall()]
+    finally:
+        conn.close()
+    return {
+        "lead_id": lead_id,
+        "runs": runs,
+        "total": {
+            key: round(sum(run[key] or 0 for run in runs), 6)
+            for key in ("seconds", "input_tokens", "output_tokens", "images", "cost_usd")
+        }
+    }
+
+
+def _label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _series(name: str, labels: dict, value) -> str:
+    rendered = ",".join(f'{key}="{_label_value(val)}"' for key, val in labels.items())
+    return f"{name}{{{rendered}}} {value}"
+
+
+def prometheus_text() -> str:
+    """All recorded runs as Prometheus text exposition (version 0.0.4)."""
+    conn = connect(SCHEMA)
+    try:
+        runs = conn.execute("""
+            SELECT agent, outcome, COUNT(*) AS n, SUM(seconds) AS seconds FROM agent_runs GROUP BY agent, outcome
+        """).fetchall()
+        steps = conn.execute("""
+            SELECT agent, kind, name, COUNT(*) AS n, SUM(seconds) AS seconds, SUM(error) AS errors,
+                   SUM(input_tokens) AS input_tokens, SUM(output_tokens) AS output_tokens,
+                   SUM(images) AS images, SUM(cost_usd) AS cost_usd
+            FROM agent_metrics GROUP BY agent, kind, name
+        """).fetchall()
+    finally:
+        conn.close()
+
+    lines = []
+
+    def metric(name: str, kind: str, help_text: str, samples: list):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(samples)
+
+    metric("fresh_prints_agent_runs_total", "counter", "Agent runs by outcome.",
+           [_series("fresh_prints_agent_runs_total", {"agent": r["agent"], "outcome": r["outcome"]}, r["n"]) for r in runs])
+    run_seconds = {}
+    for r in runs:
+        count, total = run_seconds.get(r["agent"], (0, 0.0))
+        run_seconds[r["agent"]] = (count + r["n"], total + (r["seconds"] or 0))
+    metric("fresh_prints_agent_run_seconds", "summary", "Wall time of agent runs.",
+           [s for agent, (count, total) in run_seconds.items() for s in (
+               _series("fresh_prints_agent_run_seconds_sum", {"agent": agent}, round(total, 6)),
+               _series("fresh_prints_agent_run_seconds_count", {"agent": agent}, count))])
+
+    llm = [r for r in steps if r["kind"] == "llm"]
+    tools = [r for r in steps if r["kind"] == "tool"]
+    images = [r for r in steps if r["kind"] == "image"]
+    metric("fresh_prints_llm_calls_total", "counter", "Model calls.",
+           [_series("fresh_prints_llm_calls_total", {"agent": r["agent"], "model": r["name"]}, r["n"]) for r in llm])
+    metric("fresh_prints_llm_tokens_total", "counter", "Model tokens by direction.",
+           [_series("fresh_prints_llm_tokens_total", {"agent": r["agent"], "model": r["name"], "type": direction}, r[column])
+            for r in llm for direction, column in (("input", "input_tokens"), ("output", "output_tokens"))])
+    metric("fresh_prints_cost_usd_total", "counter", "Estimated model and image spend in USD.",
+           [_series("fresh_prints_cost_usd_total", {"agent": r["agent"], "model": r["name"]}, round(r["cost_usd"], 6))
+            for r in llm + images])
+    metric("fresh_prints_tool_seconds", "summary", "Wall time of tool calls.",
+           [s for r in tools for s in (
+               _series("fresh_prints_tool_seconds_sum", {"agent": r["agent"], "tool": r["name"]}, round(r["seconds"] or 0, 6)),
+               _series("fresh_prints_tool_seconds_count", {"agent": r["agent"], "tool": r["name"]}, r["n"]))])
+    metric("fresh_prints_tool_errors_total", "counter", "Tool calls that raised.",
+           [_series("fresh_prints_tool_errors_total", {"agent": r["agent"], "tool": r["name"]}, r["errors"]) for r in tools])
+    metric("fresh_prints_images_generated_total", "counter", "Images generated by tools.",
+           [_series("fresh_prints_images_generated_total", {"agent": r["agent"], "model": r["name"]}, r["images"])
+            for r in images])
+    return "\n".join(lines) + "\n"
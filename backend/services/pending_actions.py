@@ -0,0 +1,232 @@
+"""
+Pending human-approval actions, recorded when an agent pauses.
+
+The approval endpoints are polled every few seconds per open tab. They used
+to load the whole LangGraph checkpoint, dig the tool call out of the last
+message (two formats, args re-encoded and decoded) and, for designs, re-parse
+every tool message in the history. Now the agent loops record the paused
+tool call (and any tool results the UI shows) once, at interrupt time, in
+`pending_actions`, and the pollers do a primary-key lookup.
+
+One row per (agent, lead_id):
+- RUNNING   the agent is working, nothing to review yet
+- WAITING   paused before gated tools (save_*) until a human approves
+- DONE      the run finished (the gated tool executed, or nothing was gated)
+- FAILED    the run stopped early; `outcome` says why (Timeout, Over Budget, Error)
+"""
+import json
+
+from database import connect
+from services.tracing import traced
+
+RUNNING, WAITING, DONE, FAILED = "RUNNING", "WAITING", "DONE", "FAILED"
+
+# Tool result fields the design review modal shows, keyed by a field that identifies the tool
+DESIGN_RESULT_KEYS = {
+    "palette": "color_palette",
+    "recommended_technique": "print_technique",
+    "margin_percent": "profitability"
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pending_actions (
+    agent TEXT NOT NULL,
+    lead_id INTEGER NOT NULL,
+    thread_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    tool_name TEXT,
+    tool_call_id TEXT,
+    tool_args TEXT,
+    tool_results TEXT,
+    outcome TEXT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (agent, lead_id)
+);
+"""
+
+
+# --- Tool call helpers ---
+
+def _decode_args(args) -> dict:
+    if isinstance(args, str):
+        try:
+            args = json.loads(args) if args else {}
+        except json.JSONDecodeError:
+            return {}
+    return args if isinstance(args, dict) else {}
+
+
+def normalize_tool_calls(message) -> list:
+    """
+    Tool calls on an AI message as [{"id", "name", "args"}], whether they sit in
+    `message.tool_calls` (parsed) or `additional_kwargs["tool_calls"]` (OpenAI wire format).
+    """
+    calls = getattr(message, "tool_calls", None) or getattr(message, "additional_kwargs", {}).get("tool_calls", [])
+    normalized = []
+    for call in calls:
+        if isinstance(call, dict):
+            function = call.get("function") or {}
+            name = function.get("name") or call.get("name", "")
+            args = function.get("arguments") if function else call.get("args", {})
+            call_id = call.get("id")
+        else:
+            name, args, call_id = getattr(call, "name", ""), getattr(call, "args", {}), getattr(call, "id", None)
+        normalized.append({"id": call_id, "name": name or "unknown", "args": _decode_args(args)})
+    return normalized
+
+
+def pending_tool_calls(state) -> list:
+    """Normalized tool calls the graph is paused on ([] if it isn't paused)."""
+    if not state.next or not state.values.get("messages"):
+        return []
+    return normalize_tool_calls(state.values["messages"][-1])
+
+
+def extract_tool_results(messages, result_keys: dict) -> dict:
+    """Latest JSON tool output for each identifying key: {result name: parsed output or None}."""
+    results = dict.fromkeys(result_keys.values())
+    for msg in messages:
+        if getattr(msg, "type", None) != "tool":
+            continue
+        content = str(msg.content).lstrip()
+        if not content.startswith("{"):
+            continue
+        try:
+            data = json.loads(content)
+        except json.JSONDecodeError:
+            continue
+        for key, name in result_keys.items():
+            if key in data:
+                results[name] = data
+                break
+    return results
+
+
+# --- Storage ---
+
+@traced("db.pending_actions.upsert", kind="db", root=False)
+def _upsert(agent: str, lead_id: int, thread_id: str, status: str, call: dict = None, results: dict = None,
+            new_run: bool = False):
+    """
+    Writes the lead's row. Only a new run (start) may move it to another
+    thread; a late write from an older run on a replaced thread is ignored.
+    """
+    conn = connect(SCHEMA)
+    try:
+        conn.execute(f"""
+            INSERT INTO pending_actions (agent, lead_id, thread_id, status, tool_name, tool_call_id, tool_args, tool_results,
+                                         outcome, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, NULL, CURRENT_TIMESTAMP)
+            ON CONFLICT(agent, lead_id) DO UPDATE SET
+                thread_id = excluded.thread_id, status = excluded.status, tool_name = excluded.tool_name,
+                tool_call_id = excluded.tool_call_id, tool_args = excluded.tool_args,
+                tool_results = excluded.tool_results, outcome = NULL, updated_at = excluded.updated_at
+            {"" if new_run else "WHERE pending_actions.thread_id = excluded.thread_id"}
+        """, (
+            agent, lead_id, thread_id, status,
+            call["name"] if call else None,
+            call["id"] if call else None,
+            json.dumps(call["args"]) if call else None,
+            json.dumps(results) if results else None
+        ))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def start(agent: str, lead_id: int, thread_id: str):
+    """A run (or a rerun after rejection) began on `thread_id`; any earlier pending action is void."""
+    _upsert(agent, lead_id, thread_id, RUNNING, new_run=True)
+
+
+def record_interrupt(agent: str, lead_id: int, thread_id: str, executor, gated_tools: set,
+                     result_keys: dict = None) -> list:
+    """
+    Reads the stopped checkpoint once and records what it's waiting on. The
+    agent graphs only interrupt before a turn of gated calls, so any pending
+    call here awaits approval. Returns the pending calls ([] = finished).
+    """
+    state = executor.get_state({"configurable": {"thread_id": thread_id}})
+    calls = [c for c in pending_tool_calls(state) if c["name"] in gated_tools]
+    if not calls:
+        _upsert(agent, lead_id, thread_id, DONE)
+        return []
+
+    results = extract_tool_results(state.values["messages"], result_keys) if result_keys else None
+    _upsert(agent, lead_id, thread_id, WAITING, calls[0], results)
+    return calls
+
+
+@traced("db.pending_actions.claim", kind="db", root=False)
+def claim(agent: str, lead_id: int, thread_id: str) -> bool:
+    """
+    Takes a WAITING action for execution (WAITING -> RUNNING). A single
+    conditional UPDATE, so when an approval is double-clicked or lands on two
+    workers at once exactly one caller gets True and resumes the graph.
+    """
+    conn = connect(SCHEMA)
+    try:
+        claimed = conn.execute(
+            "UPDATE pending_actions SET status = ?, updated_at = CURRENT_TIMESTAMP "
+            "WHERE agent = ? AND lead_id = ? AND thread_id = ? AND status = ?",
+            (RUNNING, agent, lead_id, thread_id, WAITING)
+        ).rowcount == 1
+        conn.commit()
+    finally:
+        conn.close()
+    return claimed
+
+
+@traced("db.pending_actions.reopen", kind="db", root=False)
+def reopen(agent: str, lead_id: int, thread_id: str):
+    """
+    An approved resume failed (model error, timeout, cancelled request): the
+    action waits for approval again, so a retry can claim it. The recorded
+    call is kept, and a newer run on another thread is left alone.
+    """
+    conn = connect(SCHEMA)
+    try:
+        conn.execute(
+            "UPDATE pending_actions SET status = ?, outcome = NULL, updated_at = CURRENT_TIMESTAMP "
+            "WHERE agent = ? AND lead_id = ? AND thread_id = ? AND tool_name IS NOT NULL",
+            (WAITING, agent, lead_id, thread_id)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+@traced("db.pending_actions.finish", kind="db", root=False)
+def finish(agent: str, lead_id: int, thread_id: str, outcome: str = None):
+    """
+    The run on `thread_id` ended - nothing left to review. With an outcome
+    (the run stopped early) it is recorded as FAILED. A newer run on another
+    thread is left alone.
+    """
+    conn = connect(SCHEMA)
+    try:
+        conn.execute(
+            "UPDATE pending_actions SET status = ?, outcome = ?, updated_at = CURRENT_TIMESTAMP "
+            "WHERE agent = ? AND lead_id = ? AND thread_id = ?",
+            (FAILED if outcome else DONE, outcome, agent, lead_id, thread_id)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def get(agent: str, lead_id: int) -> dict | None:
+    """Primary-key lookup of a lead's pending action, args and tool results decoded."""
+    conn = connect(SCHEMA)
+    try:
+        row = conn.execute(
+            "SELECT * FROM pending_actions WHERE agent = ? AND lead_id = ?", (agent, lead_id)
+        ).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    action = dict(row)
+    action["tool_args"] = json.loads(action["tool_args"]) if action["tool_args"] else {}
+    action["tool_results"] = json.loads(action["tool_results"]) if action["tool_results"] else {}
+    return action
@@ -0,0 +1,164 @@
+"""
+Memoized carrier rate quotes for get_live_shipping_rates.
+
+Shippo quotes for the same lane and parcel class are stable for hours, so
+requests are bucketed and cached instead of hitting the API every time:
+- key: (origin ZIP, destination ZIP3, weight bucket, dimension bucket)
+- fresh for QUOTE_TTL; served stale for up to QUOTE_STALE_TTL while a
+  background refresh runs (stale-while-revalidate)
+- API failures are negatively cached for QUOTE_NEGATIVE_TTL so an outage
+  doesn't turn every request into a 10s timeout
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+QUOTE_TTL = 6 * 3600             # Seconds a quote is served without refreshing
+QUOTE_STALE_TTL = 24 * 3600      # Seconds a quote may be served while refreshing
+QUOTE_NEGATIVE_TTL = 300         # Seconds a failed lookup is remembered
+QUOTE_MAX_ENTRIES = 10000
+
+DIM_STEP_IN = 2                  # Parcel dimensions round up to 2" steps
+
+
+def weight_bucket(weight_lbs: float) -> float:
+    """Rounds weight UP so a cached quote never under-prices a heavier parcel."""
+    if weight_lbs <= 10:
+        return float(max(1, math.ceil(weight_lbs)))
+    if weight_lbs <= 70:
+        return float(math.ceil(weight_lbs / 5) * 5)
+    return float(math.ceil(weight_lbs / 10) * 10)
+
+
+def dims_bucket(length: float, width: float, height: float) -> tuple:
+    """Rounds each side UP to DIM_STEP_IN and ignores orientation."""
+    sides = (max(DIM_STEP_IN, math.ceil(d / DIM_STEP_IN) * DIM_STEP_IN) for d in (length, width, height))
+    return tuple(sorted(sides, reverse=True))
+
+
+def quote_key(origin_zip: str, dest_zip: str, weight_lbs: float, length: float, width: float, height: float) -> tuple:
+    return (
+        str(origin_zip).strip()[:5],
+        str(dest_zip).strip()[:3],
+        weight_bucket(weight_lbs),
+        dims_bucket(length, width, height)
+    )
+
+
+class _Entry:
+    __slots__ = ("value", "fetched_at", "failed_at")
+
+    def __init__(self, value=None, fetched_at=0.0, failed_at=0.0):
+        self.value = value
+        self.fetched_at = fetched_at
+        self.failed_at = failed_at
+
+
+class QuoteCache:
+    """
+    Thread-safe LRU of quotes with TTL, stale-while-revalidate and negative caching.
+    `fetch` callables return the quote, or None / raise on failure.
+    """
+
+    def __init__(self, ttl=QUOTE_TTL, stale_ttl=QUOTE_STALE_TTL, negative_ttl=QUOTE_NEGATIVE_TTL,
+                 max_entries=QUOTE_MAX_ENTRIES, clock=time.monotonic):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self.stats = {"hit": 0, "stale": 0, "miss": 0, "negative": 0, "refresh": 0, "error": 0}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._refreshing = set()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="quote-refresh")
+
+    def get(self, key, fetch):
+        """Returns (value or None, status) where status is hit/stale/miss/negative/error."""
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                status = self._classify(entry, now)
+                if status == "hit":
+                    self.stats["hit"] += 1
+                    return entry.value, "hit"
+                if status == "stale":
+                    self.stats["stale"] += 1
+                    if key not in self._refreshing and not self._recently_failed(entry, now):
+                        self._refreshing.add(key)
+                        self._executor.submit(self._refresh, key, fetch)
+                    return entry.value, "stale"
+                if status == "negative":
+                    self.stats["negative"] += 1
+                    return None, "negative"
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Miss: one fetch per key, concurrent callers wait for it (no dogpile)
+        with key_lock:
+            with self._lock:
+                # Another caller may have just fetched (or failed) this key
+                entry = self._entries.get(key)
+                status = self._classify(entry, self.clock()) if entry is not None else "expired"
+                if status != "expired":
+                    self.stats[status] += 1
+                    return entry.value, status
+            self.stats["miss"] += 1
+            value = self._fetch(key, fetch)
+        with self._lock:
+            self._key_locks.pop(key, None)
+        return value, ("miss" if value is not None else "error")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _classify(self, entry, now) -> str:
+        if entry.value is not None:
+            age = now - entry.fetched_at
+            if age < self.ttl:
+                return "hit"
+            if age < self.stale_ttl:
+                return "stale"
+        if self._recently_failed(entry, now):
+            return "negative"
+        return "expired"
+
+    def _recently_failed(self, entry, now) -> bool:
+        return entry.failed_at > 0 and now - entry.failed_at < self.negative_ttl
+
+    def _fetch(self, key, fetch):
+        try:
+            value = fetch()
+        except Exception:
+            value = None
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key) or _Entry()
+            if value is not None:
+                entry.value, entry.fetched_at, entry.failed_at = value, now, 0.0
+            else:
+                # Keep any older value around; just remember the failure
+                self.stats["error"] += 1
+                entry.failed_at = now
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def _refresh(self, key, fetch):
+        try:
+            self.stats["refresh"] += 1
+            self._fetch(key, fetch)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+
+# Process-wide cache used by get_live_shipping_rates
+live_rate_cache = QuoteCache()
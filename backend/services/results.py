@@ -0,0 +1,116 @@
+"""
+Typed results for the logistics tools.
+
+Internal callers (optimize_split_shipment, batch routing, the HTTP endpoints)
+use these objects directly; only the MCP/LLM boundary serializes them, via
+`to_json()`. This replaces the old str(dict) -> ast.literal_eval round trip.
+"""
+import json
+from dataclasses import dataclass, field
+
+
+def _dumps(data) -> str:
+    return json.dumps(data, ensure_ascii=False)
+
+
+@dataclass(slots=True)
+class InventoryReport:
+    sku: str
+    stock: dict  # {warehouse label: available qty}
+    reserved: dict = field(default_factory=dict)
+    scraped_at: str | None = None  # ISO timestamp of the snapshot
+    age_seconds: float = 0.0
+    stale: bool = False
+
+    @property
+    def total(self) -> int:
+        return sum(self.stock.values())
+
+    def to_dict(self) -> dict:
+        return {
+            "sku": self.sku,
+            "stock": dict(self.stock),
+            "reserved": dict(self.reserved),
+            "scraped_at": self.scraped_at,
+            "age_seconds": self.age_seconds,
+            "stale": self.stale
+        }
+
+    def to_json(self) -> str:
+        return _dumps(self.to_dict())
+
+
+@dataclass(slots=True, frozen=True)
+class ShippingQuote:
+    carrier: str
+    zone: int
+    miles: int
+    cost: float
+    eta_days: int
+
+    def to_dict(self) -> dict:
+        return {
+            "carrier": self.carrier,
+            "zone": self.zone,
+            "miles": self.miles,
+            "cost": self.cost,
+            "eta_days": self.eta_days
+        }
+
+    def to_json(self) -> str:
+        return _dumps(self.to_dict())
+
+
+@dataclass(slots=True, frozen=True)
+class CarbonEstimate:
+    carbon_kg: float
+    distance_km: float
+    shipping_mode: str
+    trees_to_offset: float
+    eco_rating: str
+
+    def to_dict(self) -> dict:
+        return {
+            "carbon_kg": self.carbon_kg,
+            "distance_km": self.distance_km,
+            "shipping_mode": self.shipping_mode,
+            "trees_to_offset": self.trees_to_offset,
+            "eco_rating": self.eco_rating
+        }
+
+    def to_json(self) -> str:
+        return _dumps(self.to_dict())
+
+
+@dataclass(slots=True, frozen=True)
+class CarrierRate:
+    carrier: str
+    service: str
+    price: float
+    days: int | str
+    carrier_logo: str
+    currency: str | None = None  # Only live quotes carry a currency
+
+    def to_dict(self) -> dict:
+        data = {
+            "carrier": self.carrier,
+            "service": self.service,
+            "price": self.price,
+            "days": self.days,
+            "carrier_logo": self.carrier_logo
+        }
+        if self.currency is not None:
+            data["currency"] = self.currency
+        return data
+
+
+@dataclass(slots=True)
+class RateComparison:
+    source: str  # "LIVE_API" or "SIMULATED"
+    rates: list = field(default_factory=list)  # list[CarrierRate], cheapest first
+
+    def to_dict(self) -> dict:
+        return {"source": self.source, "rates": [rate.to_dict() for rate in self.rates]}
+
+    def to_json(self) -> str:
+        return _dumps(self.to_dict())
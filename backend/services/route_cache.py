@@ -0,0 +1,87 @@
+"""
+Precomputed map payloads for /logistics-route-data.
+
+The route map asks for the same few (customer ZIP, active warehouses)
+combinations over and over, so each payload is built once, serialized once
+and kept as bytes with a content hash:
+- key: (5-digit ZIP, frozenset of active warehouse codes, or None = all)
+- value: JSON body + strong ETag, so unchanged map data can be answered
+  with 304 Not Modified without touching the body at all
+Bump `invalidate()` whenever WAREHOUSE_DATA changes.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+ROUTE_CACHE_MAX_ENTRIES = 4096
+
+
+@dataclass(slots=True, frozen=True)
+class RoutePayload:
+    body: bytes
+    etag: str
+
+    def matches(self, if_none_match: str | None) -> bool:
+        """True if an If-None-Match header already names this payload."""
+        if not if_none_match:
+            return False
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or self.etag in tags
+
+
+def _normalize_zip(customer_zip: str) -> str:
+    return str(customer_zip).strip()[:5]
+
+
+def _normalize_active(active_warehouses) -> frozenset | None:
+    if active_warehouses is None:
+        return None
+    return frozenset(code.strip().upper() for code in active_warehouses if code and code.strip())
+
+
+class RoutePayloadCache:
+    """Thread-safe LRU of serialized route payloads."""
+
+    def __init__(self, build, max_entries: int = ROUTE_CACHE_MAX_ENTRIES):
+        self.build = build  # (customer_zip, active list | None) -> dict
+        self.max_entries = max_entries
+        self.stats = {"hit": 0, "miss": 0}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def get(self, customer_zip: str, active_warehouses=None) -> RoutePayload:
+        key = (_normalize_zip(customer_zip), _normalize_active(active_warehouses))
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+                self.stats["hit"] += 1
+                return payload
+            generation = self._generation
+
+        # Build outside the lock; a duplicate build on a race is harmless
+        zip_code, active = key
+        data = self.build(zip_code, sorted(active) if active is not None else None)
+        body = json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode()
+        payload = RoutePayload(body=body, etag=f'"{hashlib.sha1(body).hexdigest()[:20]}"')
+
+        with self._lock:
+            self.stats["miss"] += 1
+            if generation == self._generation:
+                self._entries[key] = payload
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return payload
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def warm(self, zip_codes):
+        """Precomputes the all-warehouses payload for each ZIP (e.g. recent customers)."""
+        for zip_code in zip_codes:
+            self.get(zip_code)
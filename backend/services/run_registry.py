@@ -0,0 +1,139 @@
+"""
+Current agent run per (agent, lead): thread id, order context and status.
+
+main.py and scout_agent.py tracked these in module-level dicts
+(scout_thread_map, lead_thread_map, logistics_thread_map,
+logistics_order_context) that grew with every lead and were private to one
+uvicorn worker, so an approval or rejection served by another worker fell
+back to the wrong thread and lost the order being routed. Now:
+- one row per (agent, lead_id) in `run_registry`, upserted when a run (or a
+  rerun after rejection) starts and updated with the run's outcome
+- the order context survives reruns: register() without a context keeps it
+- reads go through a bounded LRU cache (RUN_REGISTRY_CACHE_SIZE entries,
+  each trusted for RUN_REGISTRY_CACHE_SECONDS) so pollers and approval
+  handlers don't hit SQLite every time, while another worker's rerun is
+  picked up within a few seconds
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from database import connect
+from services.tracing import traced
+
+RUN_REGISTRY_CACHE_SIZE = int(os.environ.get("RUN_REGISTRY_CACHE_SIZE", "10000"))
+RUN_REGISTRY_CACHE_SECONDS = float(os.environ.get("RUN_REGISTRY_CACHE_SECONDS", "2"))
+
+RUNNING = "Running"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS run_registry (
+    agent TEXT NOT NULL,
+    lead_id INTEGER NOT NULL,
+    thread_id TEXT NOT NULL,
+    context TEXT,
+    status TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (agent, lead_id)
+) WITHOUT ROWID;
+"""
+
+
+# --- LRU cache ---
+
+_cache: OrderedDict = OrderedDict()      # (agent, lead_id) -> (expires, entry or None)
+_cache_lock = threading.Lock()
+
+
+def _cached(key: tuple):
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit is None or hit[0] < time.monotonic():
+            return False, None
+        _cache.move_to_end(key)
+        return True, hit[1]
+
+
+def _remember(key: tuple, entry: dict | None):
+    with _cache_lock:
+        _cache[key] = (time.monotonic() + RUN_REGISTRY_CACHE_SECONDS, entry)
+        _cache.move_to_end(key)
+        while len(_cache) > RUN_REGISTRY_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def _forget(key: tuple):
+    with _cache_lock:
+        _cache.pop(key, None)
+
+
+# --- Registry ---
+
+@traced("db.run_registry.register", kind="db", root=False)
+def register(agent: str, lead_id: int, thread_id: str, context: dict = None):
+    """A run (or a rerun) of `agent` for the lead started on `thread_id`; keeps the stored context if none is given."""
+    conn = connect(SCHEMA)
+    try:
+        conn.execute("""
+            INSERT INTO run_registry (agent, lead_id, thread_id, context, status)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(agent, lead_id) DO UPDATE SET
+                thread_id = excluded.thread_id, context = COALESCE(excluded.context, run_registry.context),
+                status = excluded.status, updated_at = CURRENT_TIMESTAMP
+        """, (agent, lead_id, thread_id, json.dumps(context) if context is not None else None, RUNNING))
+        conn.commit()
+    finally:
+        conn.close()
+    _forget((agent, lead_id))
+
+
+@traced("db.run_registry.set_status", kind="db", root=False)
+def set_status(agent: str, lead_id: int, thread_id: str, status: str):
+    """Records a run's outcome; ignored if the lead has since moved to a newer thread."""
+    conn = connect(SCHEMA)
+    try:
+        conn.execute(
+            "UPDATE run_registry SET status = ?, updated_at = CURRENT_TIMESTAMP "
+            "WHERE agent = ? AND lead_id = ? AND thread_id = ?",
+            (status, agent, lead_id, thread_id)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    _forget((agent, lead_id))
+
+
+def get(agent: str, lead_id: int) -> dict | None:
+    """The lead's current run: thread_id, context (decoded), status and timestamps."""
+    key = (agent, lead_id)
+    hit, entry = _cached(key)
+    if hit:
+        return entry
+    conn = connect(SCHEMA)
+    try:
+        row = conn.execute(
+            "SELECT thread_id, context, status, created_at, updated_at FROM run_registry WHERE agent = ? AND lead_id = ?",
+            key
+        ).fetchone()
+    finally:
+        conn.close()
+    entry = None
+    if row is not None:
+        entry = dict(row)
+        entry["context"] = json.loads(entry["context"]) if entry["context"] else {}
+    _remember(key, entry)
+    return entry
+
+
+def thread_id(agent: str, lead_id: int) -> str:
+    """The lead's current thread (the lead id itself before any run was registered)."""
+    entry = get(agent, lead_id)
+    return entry["thread_id"] if entry else str(lead_id)
+
+
+def context(agent: str, lead_id: int) -> dict:
+    entry = get(agent, lead_id)
+    return entry["context"] if entry else {}
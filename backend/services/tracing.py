@@ -0,0 +1,305 @@
+"""
+Span-based tracing across the API, agent runs, model calls, MCP tools and DB writes.
+
+A lead goes listener.py -> /run-scout -> LangGraph -> mcp_server tools ->
+SQLite, and the only thing tying those together was `lead_id` in free-text
+logs. Each unit of work now opens a span (OpenTelemetry shape: trace_id,
+span_id, parent_id, name, kind, start, duration, attributes, status); the
+current span lives in a contextvar, so it follows the work into background
+tasks, asyncio tasks and the worker threads sync tools run in.
+
+- HTTP requests: middleware in main.py; W3C `traceparent` headers are read
+  and returned, so listener.py (or any OTel client) joins the same trace
+- agent runs: agents/runtime.py; model calls: the SpanCallback handler
+- tools: wrapped with `traced` in tools/mcp_bridge.py
+- DB writes: `traced` on the service writers and log_agent_step
+
+Finished spans go to an in-process collector (the last TRACE_MAX_TRACES traces,
+served by /traces) and, if TRACE_EXPORT_FILE is set, to a JSONL file written
+by a background thread so request paths never wait on disk.
+"""
+import functools
+import inspect
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field, asdict
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+TRACING_ENABLED = os.environ.get("TRACING_ENABLED", "1") != "0"
+TRACE_MAX_TRACES = int(os.environ.get("TRACE_MAX_TRACES", "500"))
+TRACE_MAX_SPANS = int(os.environ.get("TRACE_MAX_SPANS", "2000"))     # per trace
+TRACE_EXPORT_FILE = os.environ.get("TRACE_EXPORT_FILE", "")         # e.g. "traces.jsonl"
+# Request paths not traced (scrapes and the viewer itself)
+TRACE_SKIP_PREFIXES = tuple(p for p in os.environ.get("TRACE_SKIP_PREFIXES", "/metrics,/traces").split(",") if p)
+
+
+@dataclass(slots=True)
+class Span:
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    name: str
+    kind: str = "internal"          # server, client, agent, llm, tool, db, internal
+    start_ns: int = field(default_factory=time.time_ns)
+    duration_ms: float | None = None
+    attributes: dict = field(default_factory=dict)
+    status: str = "ok"
+    _started: float = field(default_factory=time.perf_counter, repr=False)
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self, error: BaseException = None):
+        if self.duration_ms is not None:
+            return
+        self.duration_ms = round((time.perf_counter() - self._started) * 1000, 3)
+        if error is not None:
+            self.status = "error"
+            self.attributes["error"] = f"{type(error).__name__}: {error}"
+        collector.add(self)
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data.pop("_started")
+        return data
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+
+_current_span: ContextVar = ContextVar("current_span", default=None)
+
+
+# --- Collector / exporter ---
+
+class TraceCollector:
+    """Finished spans grouped by trace, newest traces kept; optional JSONL export."""
+
+    def __init__(self, max_traces: int, export_file: str = ""):
+        self.max_traces = max_traces
+        self._traces: OrderedDict[str, list] = OrderedDict()
+        self._lock = threading.Lock()
+        self._export_queue = None
+        if export_file:
+            self._export_queue = queue.SimpleQueue()
+            threading.Thread(target=self._export_loop, args=(export_file,), daemon=True, name="trace-export").start()
+
+    def add(self, span: Span):
+        with self._lock:
+            spans = self._traces.get(span.trace_id)
+            if spans is None:
+                spans = self._traces[span.trace_id] = []
+                while len(self._traces) > self.max_traces:
+                    self._traces.popitem(last=False)
+            if len(spans) < TRACE_MAX_SPANS:
+                spans.append(span)
+        if self._export_queue is not None:
+            self._export_queue.put(span.to_dict())
+
+    def _export_loop(self, path: str):
+        while True:
+            batch = [self._export_queue.get()]
+            while len(batch) < 500:
+                try:
+                    batch.append(self._export_queue.get_nowait())
+                except queue.Empty:
+                    break
+            with open(path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(span, default=str) + "\n" for span in batch)
+
+    def spans(self, trace_id: str) -> list:
+        with self._lock:
+            return list(self._traces.get(trace_id, []))
+
+    def trace_ids(self) -> list:
+        with self._lock:
+            return list(reversed(self._traces))
+
+    def clear(self):
+        with self._lock:
+            self._traces.clear()
+
+
+collector = TraceCollector(TRACE_MAX_TRACES, TRACE_EXPORT_FILE)
+
+
+# --- Span API ---
+
+def _new_id(n_bytes: int) -> str:
+    return secrets.token_hex(n_bytes)
+
+
+def parse_traceparent(header: str | None) -> tuple | None:
+    """'00-<32 hex trace id>-<16 hex parent id>-<flags>' -> (trace_id, parent_id)"""
+    parts = (header or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2]
+
+
+def start_span(name: str, kind: str = "internal", parent: Span = None, traceparent: str = None,
+               **attributes) -> Span:
+    """A span under `parent` (default: the current span), a remote traceparent, or a new trace."""
+    parent = parent or _current_span.get()
+    if parent is not None:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    else:
+        trace_id, parent_id = parse_traceparent(traceparent) or (_new_id(16), None)
+    return Span(trace_id, _new_id(8), parent_id, name, kind, attributes=attributes)
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", traceparent: str = None, root: bool = True, **attributes):
+    """
+    Runs the block inside a new child span of the current one. With root=False
+    nothing is recorded outside a trace (for DB writes and other leaf work).
+    """
+    if not TRACING_ENABLED or (not root and _current_span.get() is None):
+        yield None
+        return
+    current = start_span(name, kind, traceparent=traceparent, **attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.end(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+
+def inject_headers(headers: dict = None) -> dict:
+    """Adds the current span's traceparent to outgoing HTTP headers."""
+    headers = dict(headers or {})
+    current = _current_span.get()
+    if current is not None:
+        headers["traceparent"] = current.traceparent
+    return headers
+
+
+def traced(name: str = None, kind: str = "internal", root: bool = True):
+    """Decorator: run the function (sync or async) in a span, named after it by default."""
+    def decorate(fn):
+        span_name = name or fn.__qualname__
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name, kind, root=root):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name, kind, root=root):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class SpanCallback(BaseCallbackHandler):
+    """Model-call spans under the agent run span (callbacks start and end them, not a with-block)."""
+
+    def __init__(self, parent: Span | None):
+        self.parent = parent
+        self._open = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        if not TRACING_ENABLED:
+            return
+        params = kwargs.get("invocation_params") or {}
+        self._open[run_id] = start_span(
+            "llm.chat", "llm", parent=self.parent, model=params.get("model_name") or params.get("model"),
+            messages=sum(len(batch) for batch in messages)
+        )
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        current = self._open.pop(run_id, None)
+        if current is None:
+            return
+        generations = response.generations[0] if response.generations else []
+        message = getattr(generations[0], "message", None) if generations else None
+        usage = getattr(message, "usage_metadata", None) or {}
+        current.set(input_tokens=usage.get("input_tokens", 0), output_tokens=usage.get("output_tokens", 0),
+                    tool_calls=[c["name"] for c in getattr(message, "tool_calls", None) or []])
+        current.end()
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        current = self._open.pop(run_id, None)
+        if current is not None:
+            current.end(error)
+
+
+# --- Viewer ---
+
+def recent_traces(limit: int = 50, lead_id: int = None) -> list:
+    """Newest traces: root span, duration, span count, errors and the lead they touched."""
+    summaries = []
+    for trace_id in collector.trace_ids():
+        spans = collector.spans(trace_id)
+        if not spans:
+            continue
+        leads = {s.attributes.get("lead_id") for s in spans} - {None}
+        if lead_id is not None and lead_id not in leads:
+            continue
+        start = min(s.start_ns for s in spans)
+        end = max(s.start_ns + (s.duration_ms or 0) * 1e6 for s in spans)
+        root = next((s for s in spans if s.parent_id is None), min(spans, key=lambda s: s.start_ns))
+        summaries.append({
+            "trace_id": trace_id,
+            "root": root.name,
+            "started_at": start / 1e9,
+            "duration_ms": round((end - start) / 1e6, 3),
+            "spans": len(spans),
+            "errors": sum(s.status == "error" for s in spans),
+            "lead_ids": sorted(leads)
+        })
+        if len(summaries) >= limit:
+            break
+    return summaries
+
+
+def trace_tree(trace_id: str) -> dict | None:
+    """One trace as a waterfall: spans in start order with depth and offset from the trace start."""
+    spans = collector.spans(trace_id)
+    if not spans:
+        return None
+    by_id = {s.span_id: s for s in spans}
+    start = min(s.start_ns for s in spans)
+
+    def depth(s: Span) -> int:
+        d = 0
+        while s.parent_id in by_id and d < 64:
+            s, d = by_id[s.parent_id], d + 1
+        return d
+
+    rows = []
+    for s in sorted(spans, key=lambda s: s.start_ns):
+        row = s.to_dict()
+        row["depth"] = depth(s)
+        row["offset_ms"] = round((s.start_ns - start) / 1e6, 3)
+        rows.append(row)
+
+    by_name = {}
+    for s in spans:
+        by_name[s.name] = by_name.get(s.name, 0.0) + (s.duration_ms or 0)
+    return {
+        "trace_id": trace_id,
+        "duration_ms": max(r["offset_ms"] + (r["duration_ms"] or 0) for r in rows),
+        "spans": rows,
+        "time_by_name_ms": dict(sorted(((k, round(v, 3)) for k, v in by_name.items()), key=lambda kv: -kv[1]))
+    }
@@ -0,0 +1,266 @@
+"""
+Weather-risk service for the logistics tools.
+
+Replaces a DuckDuckGo search per warehouse ZIP with structured alerts:
+- a provider returns active alerts as GeoJSON features (NWS `api.weather.gov`
+  by default, or a local file for dev/offline: WEATHER_PROVIDER=file)
+- alerts are indexed by state (from their NWS UGC zone codes) and swapped in
+  atomically by a background refresher every WEATHER_REFRESH_SECONDS
+- ZIP lookups are in-memory: ZIP -> (lat, lng, state) via the ZIP index, then
+  the state's alerts, narrowed by polygon when the alert has one
+"""
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import requests
+
+from services import zip_index
+
+WEATHER_PROVIDER = os.environ.get("WEATHER_PROVIDER", "nws")          # "nws" or "file"
+WEATHER_ALERTS_FILE = os.environ.get(
+    "WEATHER_ALERTS_FILE", str(Path(__file__).resolve().parent.parent / "data" / "weather_alerts.json")
+)
+WEATHER_REFRESH_SECONDS = int(os.environ.get("WEATHER_REFRESH_SECONDS", "300"))
+WEATHER_RETRY_SECONDS = 60     # Until the first load succeeds, lookups retry at most this often
+NWS_ALERTS_URL = os.environ.get("NWS_ALERTS_URL", "https://api.weather.gov/alerts/active")
+NWS_USER_AGENT = os.environ.get("NWS_USER_AGENT", "FreshPrintsOS/1.0 (logistics weather monitor)")
+
+# Event keywords that always make a lane CRITICAL (same list the search-based check used)
+RISK_KEYWORDS = ["hurricane", "blizzard", "flood", "tornado", "severe thunderstorm"]
+CRITICAL_SEVERITIES = {"Extreme", "Severe"}
+
+
+@dataclass(slots=True, frozen=True)
+class Alert:
+    id: str
+    event: str
+    severity: str
+    headline: str
+    states: tuple           # Two-letter state codes the alert covers
+    polygons: tuple         # Tuple of (K, 2) [lng, lat] arrays; empty = zone-based alert
+    expires: float | None   # Unix time, None = until cancelled
+
+    def covers(self, lat: float, lng: float) -> bool:
+        if not self.polygons:
+            return True  # Zone/county alert: state match is as precise as we get
+        return any(_point_in_polygon(lng, lat, ring) for ring in self.polygons)
+
+    def risks(self) -> list:
+        event = self.event.lower()
+        found = [r for r in RISK_KEYWORDS if r in event]
+        if not found and self.severity in CRITICAL_SEVERITIES:
+            found = [event]
+        return found
+
+
+def _point_in_polygon(x: float, y: float, ring: np.ndarray) -> bool:
+    """Even-odd ray casting over a closed ring of [x, y] vertices."""
+    xi, yi = ring[:, 0], ring[:, 1]
+    xj, yj = np.roll(xi, 1), np.roll(yi, 1)
+    crosses = (yi > y) != (yj > y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_hit = (xj - xi) * (y - yi) / (yj - yi) + xi
+    return bool(np.count_nonzero(crosses & (x < x_hit)) % 2)
+
+
+def _parse_time(value) -> float | None:
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def parse_alerts(payload: dict) -> list:
+    """NWS-style GeoJSON FeatureCollection -> [Alert]."""
+    alerts = []
+    for feature in payload.get("features", []):
+        props = feature.get("properties", {})
+        ugc = props.get("geocode", {}).get("UGC", [])
+        states = tuple(sorted({code[:2] for code in ugc if len(code) >= 2}))
+
+        polygons = ()
+        geometry = feature.get("geometry") or {}
+        if geometry.get("type") == "Polygon":
+            polygons = tuple(np.asarray(ring, dtype=np.float64) for ring in geometry["coordinates"][:1])
+        elif geometry.get("type") == "MultiPolygon":
+            polygons = tuple(np.asarray(poly[0], dtype=np.float64) for poly in geometry["coordinates"])
+
+        if polygons and not states:
+            # Polygon-only alert: index it under every state with ZIPs inside its bounding box
+            points = np.vstack(polygons)
+            (min_lng, min_lat), (max_lng, max_lat) = points.min(axis=0), points.max(axis=0)
+            states = zip_index.states_in_box(min_lat, min_lng, max_lat, max_lng)
+
+        alerts.append(Alert(
+            id=props.get("id") or feature.get("id", ""),
+            event=props.get("event", "Unknown"),
+            severity=props.get("severity", "Unknown"),
+            headline=props.get("headline") or props.get("event", ""),
+            states=states,
+            polygons=polygons,
+            expires=_parse_time(props.get("ends") or props.get("expires"))
+        ))
+    return alerts
+
+
+# --- Providers ---
+
+class NWSProvider:
+    """Active alerts from the National Weather Service (no API key, needs a User-Agent)."""
+
+    def __init__(self, url: str = NWS_ALERTS_URL, user_agent: str = NWS_USER_AGENT):
+        self.url = url
+        self.user_agent = user_agent
+
+    def fetch(self) -> list:
+        response = requests.get(
+            self.url,
+            params={"status": "actual", "message_type": "alert"},
+            headers={"User-Agent": self.user_agent, "Accept": "application/geo+json"},
+            timeout=15
+        )
+        response.raise_for_status()
+        return parse_alerts(response.json())
+
+
+class FileProvider:
+    """Alerts from a local GeoJSON file in the NWS format (fixtures, offline demos)."""
+
+    def __init__(self, path: str = WEATHER_ALERTS_FILE):
+        self.path = Path(path)
+
+    def fetch(self) -> list:
+        with open(self.path, encoding="utf-8") as f:
+            return parse_alerts(json.load(f))
+
+
+PROVIDERS = {
+    "nws": NWSProvider,
+    "file": FileProvider
+}
+
+
+# --- Cache ---
+
+@dataclass(slots=True, frozen=True)
+class WeatherRisk:
+    zip: str
+    status: str             # CRITICAL / CLEAR / UNKNOWN
+    risks: tuple
+    alerts: tuple           # Headlines of matching alerts
+
+    def message(self) -> str:
+        """Same strings check_weather_risk has always returned."""
+        if self.status == "CRITICAL":
+            return f"CRITICAL: Weather Alert Detected ({', '.join(self.risks)}). Shipping delays likely."
+        if self.status == "CLEAR":
+            return "CLEAR: No major alerts found."
+        return "WARNING: Could not verify weather."
+
+    def to_dict(self) -> dict:
+        return {"zip": self.zip, "status": self.status, "risks": list(self.risks),
+                "alerts": list(self.alerts), "message": self.message()}
+
+
+class WeatherRiskCache:
+    """State-indexed alert snapshot, refreshed in the background and read lock-free."""
+
+    def __init__(self, provider=None, refresh_interval: float = WEATHER_REFRESH_SECONDS):
+        self.provider = provider or PROVIDERS.get(WEATHER_PROVIDER, NWSProvider)()
+        self.refresh_interval = refresh_interval
+        self.loaded_at = None
+        self.last_error = None
+        self._last_attempt = 0.0
+        self._by_state = {}
+        self._load_lock = threading.Lock()
+        self._refresher = None
+        self._stop = threading.Event()
+
+    def refresh(self) -> int:
+        """Fetches alerts and swaps in a new index. Keeps the old one on failure."""
+        self._last_attempt = time.time()
+        try:
+            alerts = self.provider.fetch()
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"⚠️ Weather alert refresh failed: {e}")
+            return -1
+
+        by_state = {}
+        for alert in alerts:
+            for state in alert.states:
+                by_state.setdefault(state, []).append(alert)
+        self._by_state = by_state  # Single reference swap - readers never see a half-built index
+        self.loaded_at = time.time()
+        self.last_error = None
+        return len(alerts)
+
+    def _ensure_loaded(self):
+        if self.loaded_at is None and time.time() - self._last_attempt > WEATHER_RETRY_SECONDS:
+            with self._load_lock:
+                if self.loaded_at is None and time.time() - self._last_attempt > WEATHER_RETRY_SECONDS:
+                    self.refresh()
+
+    def risk_for_zip(self, zip_code: str) -> WeatherRisk:
+        self._ensure_loaded()
+        return self._risk(zip_code, self._by_state, time.time())
+
+    def _risk(self, zip_code: str, by_state: dict, now: float) -> WeatherRisk:
+        info = zip_index.lookup(zip_code)
+        if self.loaded_at is None or info is None:
+            return WeatherRisk(zip=str(zip_code), status="UNKNOWN", risks=(), alerts=())
+
+        matching = [
+            alert for alert in by_state.get(info["state"], [])
+            if (alert.expires is None or alert.expires > now) and alert.covers(info["lat"], info["lng"])
+        ]
+        risks = []
+        for alert in matching:
+            risks.extend(r for r in alert.risks() if r not in risks)
+        return WeatherRisk(
+            zip=str(zip_code),
+            status="CRITICAL" if risks else "CLEAR",
+            risks=tuple(risks),
+            alerts=tuple(alert.headline for alert in matching)
+        )
+
+    def risk_for_zips(self, zip_codes) -> dict:
+        """Batch lookup: {zip: WeatherRisk} against one snapshot of the index."""
+        self._ensure_loaded()
+        by_state, now = self._by_state, time.time()  # A refresh mid-batch swaps self._by_state, not this one
+        return {str(z): self._risk(z, by_state, now) for z in zip_codes}
+
+    def status(self) -> dict:
+        return {
+            "provider": type(self.provider).__name__,
+            "loaded_at": datetime.fromtimestamp(self.loaded_at, timezone.utc).isoformat(timespec="seconds")
+            if self.loaded_at else None,
+            "states_with_alerts": len(self._by_state),
+            "alerts": len({a.id for alerts in self._by_state.values() for a in alerts}),
+            "last_error": self.last_error
+        }
+
+    def start_refresher(self):
+        """Starts the background refresh loop (idempotent)."""
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+        self._stop.clear()
+        self._refresher = threading.Thread(target=self._refresh_loop, name="weather-refresh", daemon=True)
+        self._refresher.start()
+
+    def stop_refresher(self):
+        self._stop.set()
+
+    def _refresh_loop(self):
+        self._ensure_loaded()
+        while not self._stop.wait(self.refresh_interval):
+            self.refresh()
+
+
+# Process-wide cache used by check_weather_risk and the weather endpoints
+weather_cache = WeatherRiskCache()
@@ -0,0 +1,226 @@
+"""
+US ZIP geocoding index.
+
+All ~42k US ZIP codes as a sorted numpy struct array, memory-mapped from
+data/zip_index.npy (16 bytes/ZIP) with city names in data/zip_cities.npy.
+- `lookup` / `lookup_coords`: O(log n) binary search on a single ZIP
+- `bulk_lookup`: vectorized searchsorted over many ZIPs at once
+- ZIPs missing from the table fall back to their ZIP3 (first 3 digits) centroid
+Nothing is read from disk until the first lookup, so startup is unaffected.
+
+Rebuild the data files (needs `pip install zipcodes`, MIT licensed):
+    python -m services.zip_index
+"""
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+INDEX_FILE = DATA_DIR / "zip_index.npy"
+CITIES_FILE = DATA_DIR / "zip_cities.npy"
+
+ZIP_DTYPE = np.dtype([
+    ("zip", "<u4"),
+    ("lat", "<f4"),
+    ("lng", "<f4"),
+    ("city", "<u2"),   # Row in zip_cities.npy
+    ("state", "S2")
+])
+
+DEFAULT_COORDS = (40.0, -100.0)  # Center of the US - last resort only
+
+# Precision levels reported by bulk_lookup
+PRECISION_NONE, PRECISION_ZIP3, PRECISION_ZIP = 0, 1, 2
+
+
+class ZipIndex:
+    """Read-only view over the memory-mapped ZIP table."""
+
+    def __init__(self, records: np.ndarray, cities: np.ndarray):
+        self.records = records
+        self.cities = cities
+        self.zips = records["zip"]
+
+        # ZIP3 centroids (mean of member ZIPs), sorted by prefix
+        prefixes = self.zips // 100
+        self.zip3, first, inverse = np.unique(prefixes, return_index=True, return_inverse=True)
+        counts = np.bincount(inverse)
+        self.zip3_lat = np.bincount(inverse, weights=records["lat"]) / counts
+        self.zip3_lng = np.bincount(inverse, weights=records["lng"]) / counts
+        self.zip3_state = records["state"][first]
+
+    @classmethod
+    def load(cls) -> "ZipIndex":
+        return cls(np.load(INDEX_FILE, mmap_mode="r"), np.load(CITIES_FILE, mmap_mode="r"))
+
+    def find(self, zip_int: int) -> int:
+        """Row of an exact ZIP match, or -1."""
+        i = int(np.searchsorted(self.zips, zip_int))
+        if i < len(self.zips) and self.zips[i] == zip_int:
+            return i
+        return -1
+
+    def find_zip3(self, zip_int: int) -> int:
+        i = int(np.searchsorted(self.zip3, zip_int // 100))
+        if i < len(self.zip3) and self.zip3[i] == zip_int // 100:
+            return i
+        return -1
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> ZipIndex:
+    """Loads the index on first use (thread-safe)."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = ZipIndex.load()
+    return _index
+
+
+def _parse_zip(zip_code) -> int | None:
+    """'10001', '10001-1234', 10001 -> 10001; anything else -> None."""
+    digits = str(zip_code).strip()[:5]
+    if len(digits) == 5 and digits.isdigit():
+        return int(digits)
+    return None
+
+
+def lookup(zip_code) -> dict | None:
+    """
+    Geocodes one ZIP: {"zip", "lat", "lng", "city", "state", "precision"}.
+    precision is 'zip' for an exact match, 'zip3' for a regional centroid.
+    Returns None if the ZIP is malformed or its region is unknown.
+    """
+    zip_int = _parse_zip(zip_code)
+    if zip_int is None:
+        return None
+
+    index = get_index()
+    row = index.find(zip_int)
+    if row >= 0:
+        rec = index.records[row]
+        return {
+            "zip": f"{zip_int:05d}",
+            "lat": round(float(rec["lat"]), 4),
+            "lng": round(float(rec["lng"]), 4),
+            "city": index.cities[rec["city"]].decode(),
+            "state": rec["state"].decode(),
+            "precision": "zip"
+        }
+
+    row = index.find_zip3(zip_int)
+    if row >= 0:
+        return {
+            "zip": f"{zip_int:05d}",
+            "lat": round(float(index.zip3_lat[row]), 4),
+            "lng": round(float(index.zip3_lng[row]), 4),
+            "city": None,
+            "state": index.zip3_state[row].decode(),
+            "precision": "zip3"
+        }
+    return None
+
+
+@lru_cache(maxsize=65536)
+def _coords(zip_int: int) -> tuple | None:
+    index = get_index()
+    row = index.find(zip_int)
+    if row >= 0:
+        return (round(float(index.records["lat"][row]), 4), round(float(index.records["lng"][row]), 4))
+    row = index.find_zip3(zip_int)
+    if row >= 0:
+        return (round(float(index.zip3_lat[row]), 4), round(float(index.zip3_lng[row]), 4))
+    return None
+
+
+def lookup_coords(zip_code, default=DEFAULT_COORDS) -> tuple:
+    """(lat, lng) for a ZIP, falling back to its ZIP3 centroid, then `default`."""
+    zip_int = _parse_zip(zip_code)
+    coords = _coords(zip_int) if zip_int is not None else None
+    return coords if coords is not None else default
+
+
+def bulk_lookup(zip_codes, default=DEFAULT_COORDS):
+    """
+    Vectorized geocoding of many ZIPs.
+    Returns (coords (N, 2) float array, precision (N,) int array) where
+    precision is PRECISION_ZIP, PRECISION_ZIP3 or PRECISION_NONE (-> default).
+    """
+    parsed = [_parse_zip(z) for z in zip_codes]
+    valid = np.array([z is not None for z in parsed], dtype=bool)
+    zips = np.array([z if z is not None else 0 for z in parsed], dtype=np.int64)
+
+    index = get_index()
+    coords = np.empty((len(zips), 2), dtype=np.float64)
+    coords[:] = default
+    precision = np.full(len(zips), PRECISION_NONE, dtype=np.int8)
+    if len(zips) == 0:
+        return coords, precision
+
+    # Exact matches
+    pos = np.minimum(np.searchsorted(index.zips, zips), len(index.zips) - 1)
+    exact = valid & (index.zips[pos] == zips)
+    hit = pos[exact]
+    coords[exact, 0] = index.records["lat"][hit]
+    coords[exact, 1] = index.records["lng"][hit]
+    precision[exact] = PRECISION_ZIP
+
+    # ZIP3 centroid fallback for the rest
+    prefixes = zips // 100
+    pos3 = np.minimum(np.searchsorted(index.zip3, prefixes), len(index.zip3) - 1)
+    regional = valid & ~exact & (index.zip3[pos3] == prefixes)
+    coords[regional, 0] = index.zip3_lat[pos3[regional]]
+    coords[regional, 1] = index.zip3_lng[pos3[regional]]
+    precision[regional] = PRECISION_ZIP3
+
+    return coords, precision
+
+
+def states_in_box(min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> tuple:
+    """Sorted state codes of every ZIP inside a lat/lng bounding box."""
+    records = get_index().records
+    inside = (
+        (records["lat"] >= min_lat) & (records["lat"] <= max_lat)
+        & (records["lng"] >= min_lng) & (records["lng"] <= max_lng)
+    )
+    return tuple(sorted(s.decode() for s in np.unique(records["state"][inside])))
+
+
+def build_index(records, out_dir: Path = DATA_DIR):
+    """
+    Writes zip_index.npy / zip_cities.npy from an iterable of
+    (zip, lat, lng, city, state) tuples.
+    """
+    rows = sorted({int(z): (float(lat), float(lng), city, state) for z, lat, lng, city, state in records}.items())
+    cities = sorted({city for _, (_, _, city, _) in rows})
+    city_ids = {city: i for i, city in enumerate(cities)}
+
+    table = np.empty(len(rows), dtype=ZIP_DTYPE)
+    table["zip"] = [z for z, _ in rows]
+    table["lat"] = [r[0] for _, r in rows]
+    table["lng"] = [r[1] for _, r in rows]
+    table["city"] = [city_ids[r[2]] for _, r in rows]
+    table["state"] = [r[3].encode() for _, r in rows]
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    np.save(out_dir / INDEX_FILE.name, table)
+    np.save(out_dir / CITIES_FILE.name, np.array([c.encode() for c in cities]))
+    return len(table), len(cities)
+
+
+if __name__ == "__main__":
+    import zipcodes
+
+    source = (
+        (z["zip_code"], z["lat"], z["long"], z["city"], z["state"])
+        for z in zipcodes.list_all()
+        if z["lat"] and z["long"]
+    )
+    n_zips, n_cities = build_index(source)
+    print(f"✅ ZIP index written to {DATA_DIR}: {n_zips} ZIPs, {n_cities} cities")
@@ -0,0 +1,268 @@
+"""
+Local stand-in for the OpenAI API (chat completions, images, embeddings).
+
+Plays the three agents through their workflows so the app can be load-tested
+without an API key: a chat request that offers tools gets the next turn of
+tool calls for the workflow its save_* tool belongs to (same batching as the
+agent prompts), then the save, then a final answer. Arguments are filled from
+the prompt (lead id, SKU, ZIP, quantity) and earlier tool results (image URL,
+inventory). Plain chat requests (sentiment, vision check) get fixed answers.
+Every response carries token usage so cost accounting has something to count.
+
+Run from backend/:
+    python -m stubs.openai_server --port 8200 --chat-latency-ms 800 --image-latency-ms 4000
+Then point the app at it:
+    OPENAI_BASE_URL=http://localhost:8200/v1 OPENAI_API_KEY=sk-stub python main.py
+
+GET /_stats returns request counts; POST /_config changes latencies on the fly.
+"""
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import re
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+from PIL import Image
+from pydantic import BaseModel
+
+app = FastAPI(title="OpenAI Stand-in")
+
+config = {"chat_latency_ms": 0.0, "image_latency_ms": 0.0, "embedding_latency_ms": 0.0, "base_url": ""}
+stats = {"chat": 0, "tool_turns": 0, "images": 0, "embeddings": 0}
+
+# Tool-call turns per agent (keyed by its approval-gated tool), as batched in the agent prompts
+WORKFLOWS = {
+    "save_lead_strategy": [
+        ["search_university_news", "find_organization_socials", "check_existing_apparel", "analyze_visual_vibe"],
+        ["analyze_news_sentiment", "get_email_template"],
+    ],
+    "save_final_design": [
+        ["generate_apparel_image"],
+        ["check_copyright_safety", "extract_color_palette", "calculate_manufacturing_cost"],
+        ["recommend_print_technique", "calculate_profitability"],
+    ],
+    "save_logistics_plan": [
+        ["scrape_supplier_inventory", "check_weather_risk_batch", "check_all_factory_loads"],
+        ["optimize_split_shipment"],
+        ["get_live_shipping_rates", "calculate_carbon_footprint"],
+    ],
+}
+
+WAREHOUSE_ZIPS = ["07001", "78701", "90001"]
+
+
+def _text(message: dict) -> str:
+    content = message.get("content") or ""
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content
+
+
+def _context(messages: list) -> dict:
+    """Values the tool arguments are filled from: prompt fields and earlier tool results."""
+    prompt = " ".join(_text(m) for m in messages if m.get("role") in ("user", "system"))
+    results = {}
+    names = {}
+    for m in messages:
+        for call in m.get("tool_calls") or []:
+            names[call["id"]] = call["function"]["name"]
+        if m.get("role") == "tool":
+            results[names.get(m.get("tool_call_id"), "")] = _text(m)
+
+    def find(pattern: str, default: str) -> str:
+        match = re.search(pattern, prompt)
+        return match.group(1) if match else default
+
+    image = re.search(r"https?://\S+?\.png", " ".join(results.values()))
+    return {
+        "lead_id": int(find(r"Lead ID: (\d+)", find(r"ID: (\d+)", "1"))),
+        "sku": find(r"units of '([^']+)'", find(r"SKU: (\S+)", "TSHIRT-BLK-M")),
+        "order_qty": int(find(r"Route (\d+) units", find(r"Quantity: (\d+)", "100"))),
+        "customer_zip": find(r"Customer ZIP (\d{5})", find(r"Customer ZIP: (\d{5})", "10001")),
+        "image_url": image.group(0) if image else f"{config['base_url']}/_images/stub.png",
+        "results": results,
+    }
+
+
+def _argument(name: str, schema: dict, ctx: dict):
+    known = {
+        "lead_id": ctx["lead_id"],
+        "sku": ctx["sku"],
+        "order_qty": ctx["order_qty"],
+        "customer_zip": ctx["customer_zip"],
+        "dest_zip": ctx["customer_zip"],
+        "origin_zip": WAREHOUSE_ZIPS[0],
+        "location_zips": WAREHOUSE_ZIPS,
+        "image_url": ctx["image_url"],
+        "design_url": ctx["image_url"],
+        "inventory_data": ctx["results"].get("scrape_supplier_inventory", "NJ: 500, TX: 500, CA: 500"),
+        "news_content": ctx["results"].get("search_university_news", "The team won the championship."),
+        "template_type": "congratulatory",
+        "num_colors": 3,
+        "cost_per_unit": 8.0,
+        "weight_lbs": round(ctx["order_qty"] * 0.5, 1),
+        "total_cost": 42.5,
+        "carbon_kg": 3.2,
+    }
+    if name in known:
+        return known[name]
+    kind = schema.get("type")
+    if kind == "integer":
+        return 1
+    if kind == "number":
+        return 1.0
+    if kind == "boolean":
+        return False
+    if kind == "array":
+        return []
+    return f"stub {name.replace('_', ' ')}"
+
+
+def _tool_turn(tools: list, messages: list) -> list | None:
+    """Next batch of tool calls, or None when the workflow is finished."""
+    offered = {t["function"]["name"]: t["function"].get("parameters", {}) for t in tools}
+    gated = next((name for name in WORKFLOWS if name in offered), None)
+    if gated is None:
+        return None
+
+    # Done once the save has actually run (a deferred save comes back as "Not executed")
+    last = messages[-1]
+    if last.get("role") == "tool" and _text(last) and not _text(last).startswith("Not executed"):
+        called = {c["function"]["name"] for m in messages for c in m.get("tool_calls") or []}
+        if gated in called and messages[-2].get("tool_calls") and \
+                messages[-2]["tool_calls"][0]["function"]["name"] == gated:
+            return None
+
+    turns = [turn for turn in WORKFLOWS[gated] if all(name in offered for name in turn)]
+    done = sum(1 for m in messages if m.get("role") == "assistant" and m.get("tool_calls"))
+    names = turns[done] if done < len(turns) else [gated]
+
+    ctx = _context(messages)
+    calls = []
+    for name in names:
+        params = offered[name]
+        properties = params.get("properties", {})
+        args = {arg: _argument(arg, properties.get(arg, {}), ctx) for arg in params.get("required", list(properties))}
+        calls.append({
+            "id": f"call_{uuid.uuid4().hex[:24]}",
+            "type": "function",
+            "function": {"name": name, "arguments": json.dumps(args)}
+        })
+    return calls
+
+
+def _plain_answer(messages: list) -> str:
+    prompt = _text(messages[-1])
+    if "SENTIMENT" in prompt:
+        return "SENTIMENT: POSITIVE\nREASONING: The organization just won.\nRECOMMENDED_TONE: congratulatory"
+    if "SAFE" in prompt:
+        return "SAFE"
+    return "Done."
+
+
+def _usage(messages: list, completion: str) -> dict:
+    prompt_tokens = sum(len(json.dumps(m)) for m in messages) // 4
+    completion_tokens = max(1, len(completion) // 4)
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    if config["chat_latency_ms"]:
+        await asyncio.sleep(config["chat_latency_ms"] / 1000)
+    stats["chat"] += 1
+    messages = body.get("messages", [])
+    calls = _tool_turn(body.get("tools") or [], messages) if body.get("tools") else None
+    if calls:
+        stats["tool_turns"] += 1
+        message = {"role": "assistant", "content": None, "tool_calls": calls}
+        finish_reason = "tool_calls"
+    else:
+        message = {"role": "assistant", "content": _plain_answer(messages) if not body.get("tools") else "Done."}
+        finish_reason = "stop"
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "gpt-4o"),
+        "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+        "usage": _usage(messages, json.dumps(message))
+    }
+
+
+@app.post("/v1/images/generations")
+async def images_generations(request: Request):
+    body = await request.json()
+    if config["image_latency_ms"]:
+        await asyncio.sleep(config["image_latency_ms"] / 1000)
+    n = int(body.get("n", 1))
+    stats["images"] += n
+    return {
+        "created": int(time.time()),
+        "data": [{"url": f"{config['base_url']}/_images/{uuid.uuid4().hex}.png"} for _ in range(n)]
+    }
+
+
+@app.get("/_images/{name}")
+def image(name: str):
+    """A small four-colour PNG, different per name, for the colour-counting tools."""
+    seed = hashlib.sha256(name.encode()).digest()
+    img = Image.new("RGB", (64, 64), (255, 255, 255))
+    for i in range(3):
+        img.paste(tuple(seed[i * 3:i * 3 + 3]), (i * 16, i * 16, i * 16 + 24, i * 16 + 24))
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return Response(content=buffer.getvalue(), media_type="image/png")
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    if config["embedding_latency_ms"]:
+        await asyncio.sleep(config["embedding_latency_ms"] / 1000)
+    inputs = body.get("input", [])
+    inputs = inputs if isinstance(inputs, list) else [inputs]
+    stats["embeddings"] += len(inputs)
+    data = []
+    for i, text in enumerate(inputs):
+        digest = hashlib.sha256(str(text).encode()).digest()
+        data.append({"object": "embedding", "index": i, "embedding": [b / 255 for b in digest] * 48})
+    return {"object": "list", "data": data, "model": body.get("model", "text-embedding-3-small"),
+            "usage": {"prompt_tokens": len(inputs), "total_tokens": len(inputs)}}
+
+
+class StubConfig(BaseModel):
+    chat_latency_ms: float | None = None
+    image_latency_ms: float | None = None
+    embedding_latency_ms: float | None = None
+
+
+@app.get("/_stats")
+def get_stats():
+    return {**stats, **config}
+
+
+@app.post("/_config")
+def set_config(payload: StubConfig):
+    for field, value in payload.model_dump(exclude_none=True).items():
+        config[field] = value
+    return config
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local OpenAI stand-in")
+    parser.add_argument("--port", type=int, default=8200)
+    parser.add_argument("--chat-latency-ms", type=float, default=0.0)
+    parser.add_argument("--image-latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    config.update(chat_latency_ms=args.chat_latency_ms, image_latency_ms=args.image_latency_ms,
+                  base_url=f"http://127.0.0.1:{args.port}")
+    uvicorn.run(app, host="127.0.0.1", port=args.port)
@@ -0,0 +1,30 @@
+"""
+Local stand-in for the DuckDuckGo search tool used by the Scout.
+
+DuckDuckGoSearchRun has no endpoint to redirect, so the load test swaps the
+module-level `mcp_server.search` for this object (same `.run(query)` call).
+Results are deterministic per query and mention a win, so the sentiment
+and template steps take their usual path.
+"""
+import hashlib
+import threading
+import time
+
+
+class StubSearch:
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def run(self, query: str) -> str:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        with self._lock:
+            self.calls += 1
+        tag = hashlib.sha256(query.encode()).hexdigest()[:6]
+        return (
+            f"[{tag}] {query}: the team won the regional championship this weekend. "
+            f"Students celebrated on campus; the club posts on instagram.com/club_{tag}. "
+            "No official merchandise store found."
+        )
@@ -0,0 +1,106 @@
+"""
+Local stand-in for the Shippo shipments API.
+
+Answers POST /shipments/ with deterministic carrier rates so the rate cache
+and get_live_shipping_rates can be exercised without a real Shippo account.
+
+Run from backend/:
+    python -m stubs.shippo_server --port 8100 --latency-ms 800
+Then point the app at it:
+    SHIPPO_API_URL=http://localhost:8100 SHIPPO_API_KEY=shippo_test_stub python main.py
+
+GET /_stats returns how many quotes were served; POST /_config changes
+latency / failure rate on the fly.
+"""
+import argparse
+import asyncio
+import random
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Header
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+app = FastAPI(title="Shippo Stand-in")
+
+config = {"latency_ms": 0.0, "failure_rate": 0.0}
+stats = {"shipments": 0, "failures": 0}
+
+# (provider, service, base $, $/lb, $/zone, days)
+SERVICES = [
+    ("USPS", "Priority Mail", 7.50, 0.35, 0.60, 2),
+    ("USPS", "Ground Advantage", 5.00, 0.25, 0.45, 4),
+    ("FedEx", "Ground", 9.00, 0.40, 0.70, 4),
+    ("FedEx", "Express Saver", 18.00, 0.80, 1.20, 2),
+    ("UPS", "Ground", 8.50, 0.38, 0.65, 4),
+    ("UPS", "3 Day Select", 15.00, 0.60, 1.00, 3),
+]
+
+
+def _zone(origin_zip: str, dest_zip: str) -> int:
+    """Crude zone from the distance between ZIP3 prefixes (1-8)."""
+    try:
+        gap = abs(int(origin_zip[:3]) - int(dest_zip[:3]))
+    except ValueError:
+        return 5
+    return min(8, 1 + gap // 120)
+
+
+class StubConfig(BaseModel):
+    latency_ms: float | None = None
+    failure_rate: float | None = None
+
+
+@app.post("/shipments/")
+async def create_shipment(shipment: dict, authorization: str = Header(default="")):
+    if not authorization.startswith("ShippoToken"):
+        return JSONResponse({"detail": "Invalid token"}, status_code=401)
+
+    if config["latency_ms"]:
+        await asyncio.sleep(config["latency_ms"] / 1000)
+    if random.random() < config["failure_rate"]:
+        stats["failures"] += 1
+        return JSONResponse({"detail": "Simulated carrier outage"}, status_code=503)
+
+    stats["shipments"] += 1
+    origin = shipment.get("address_from", {}).get("zip", "00000")
+    dest = shipment.get("address_to", {}).get("zip", "00000")
+    parcel = (shipment.get("parcels") or [{}])[0]
+    weight = float(parcel.get("weight", 1))
+    zone = _zone(origin, dest)
+
+    rates = [
+        {
+            "object_id": uuid.uuid4().hex,
+            "provider": provider,
+            "servicelevel": {"name": service},
+            "amount": f"{base + per_lb * weight + per_zone * zone:.2f}",
+            "currency": "USD",
+            "estimated_days": days + zone // 4
+        }
+        for provider, service, base, per_lb, per_zone, days in SERVICES
+    ]
+    return JSONResponse({"object_id": uuid.uuid4().hex, "status": "SUCCESS", "rates": rates}, status_code=201)
+
+
+@app.get("/_stats")
+def get_stats():
+    return {**stats, **config}
+
+
+@app.post("/_config")
+def set_config(payload: StubConfig):
+    for field, value in payload.model_dump(exclude_none=True).items():
+        config[field] = value
+    return config
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Shippo stand-in")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    config.update(latency_ms=args.latency_ms, failure_rate=args.failure_rate)
+    uvicorn.run(app, host="127.0.0.1", port=args.port)
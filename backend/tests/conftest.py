@@ -0,0 +1,34 @@
+"""
+Shared fixtures. Run from backend/ (pytest.ini puts it on sys.path).
+"""
+import pytest
+
+import database
+from stubs import shippo_server
+from stubs.serving import free_port, serve
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A fresh fresh_prints.db in a scratch directory (the test's working directory)."""
+    monkeypatch.chdir(tmp_path)
+    database.init_db()
+    return tmp_path / database.DB_NAME
+
+
+@pytest.fixture(scope="session")
+def shippo_url():
+    """stubs/shippo_server.py on a local port for the whole session."""
+    port = free_port()
+    server = serve(shippo_server.app, port)
+    yield f"http://127.0.0.1:{port}"
+    server.should_exit = True
+
+
+@pytest.fixture
+def shippo(shippo_url):
+    """The Shippo stand-in with no latency or failures and zeroed stats; yields its module."""
+    shippo_server.config.update(latency_ms=0.0, failure_rate=0.0)
+    shippo_server.stats.update(shipments=0, failures=0)
+    yield shippo_server
+    shippo_server.config.update(failure_rate=0.0)
@@ -0,0 +1,117 @@
+"""
+Stock reservations in services/inventory.py against a scratch database.
+
+The simulated supplier portal stocks every SKU at NJ 150 / TX 100 / CA 50.
+
+Run from backend/:
+    python -m pytest tests/test_inventory.py
+"""
+import sqlite3
+
+import pytest
+
+from services import carbon, inventory
+from services.inventory import InsufficientStock, InventoryStore
+
+SKU = "TSHIRT-BLK-M"
+NJ, TX, CA = "New Jersey (NJ)", "Texas (TX)", "California (CA)"
+
+
+@pytest.fixture
+def store(db):
+    store = InventoryStore()
+    store.refresh_sku(SKU)
+    return store
+
+
+def age_reservation(db, reservation_id: str, hours: float):
+    conn = sqlite3.connect(db)
+    conn.execute("UPDATE inventory_reservations SET created_at = datetime('now', ?) WHERE id = ?",
+                 (f"-{hours} hours", reservation_id))
+    conn.commit()
+    conn.close()
+
+
+def test_reserve_is_all_or_nothing(store):
+    with pytest.raises(InsufficientStock) as error:
+        store.reserve([(SKU, NJ, 100), (SKU, TX, 40), (SKU, CA, 60)], reference="lead-1")
+    assert error.value.warehouse == CA
+    assert error.value.available == 50
+
+    # The NJ and TX legs were rolled back with the CA one
+    snapshot = store.snapshot(SKU)
+    assert snapshot["reserved"] == {NJ: 0, TX: 0, CA: 0}
+    assert store.reservations("lead-1") == []
+
+    reservation_id = store.reserve([(SKU, NJ, 100), (SKU, CA, 50)], reference="lead-1")
+    assert store.snapshot(SKU)["available"] == {NJ: 50, TX: 100, CA: 0}
+    assert {r["id"] for r in store.reservations("lead-1")} == {reservation_id}
+
+
+def test_reserve_order_spreads_across_warehouses(store):
+    reservation = store.reserve_order(SKU, 200, reference="lead-2", preference=[TX])
+    assert reservation["allocations"] == {TX: 100, NJ: 100}
+
+    with pytest.raises(InsufficientStock):
+        store.reserve_order(SKU, 101)
+    assert store.snapshot(SKU)["available"] == {NJ: 50, TX: 0, CA: 50}
+
+
+def test_release_returns_units_once(store):
+    reservation = store.reserve_order(SKU, 120, reference="lead-3")
+
+    assert store.release(reservation["reservation_id"]) == 120
+    assert store.release(reservation["reservation_id"]) == 0
+    snapshot = store.snapshot(SKU)
+    assert snapshot["available"] == snapshot["on_hand"] == {NJ: 150, TX: 100, CA: 50}
+    assert [r["status"] for r in store.reservations("lead-3")] == ["RELEASED"]
+
+
+def test_fulfil_reference_ships_every_active_reservation(store):
+    first = store.reserve_order(SKU, 100, reference="lead-4")
+    second = store.reserve_order(SKU, 30, reference="lead-4")
+    released = store.reserve_order(SKU, 10, reference="lead-4")
+    store.release(released["reservation_id"])
+
+    assert store.fulfil_reference("lead-4") == 130
+    assert store.fulfil_reference("lead-4") == 0
+
+    # Shipped units leave on_hand and reserved together
+    snapshot = store.snapshot(SKU)
+    assert sum(snapshot["on_hand"].values()) == 300 - 130
+    assert sum(snapshot["reserved"].values()) == 0
+    statuses = {r["id"]: r["status"] for r in store.reservations("lead-4")}
+    assert statuses == {first["reservation_id"]: "FULFILLED", second["reservation_id"]: "FULFILLED",
+                        released["reservation_id"]: "RELEASED"}
+
+
+def test_reservations_expire_after_the_ttl(db, store, monkeypatch):
+    monkeypatch.setattr(inventory, "INVENTORY_RESERVATION_TTL_HOURS", 48)
+    old = store.reserve_order(SKU, 40, reference="lead-5")
+    recent = store.reserve_order(SKU, 60, reference="lead-6")
+    age_reservation(db, old["reservation_id"], 49)
+    age_reservation(db, recent["reservation_id"], 47)
+
+    assert store.refresh_all() == 1    # Expires first, then re-scrapes the SKU
+    assert [r["status"] for r in store.reservations("lead-5")] == ["EXPIRED"]
+    assert [r["status"] for r in store.reservations("lead-6")] == ["ACTIVE"]
+    assert sum(store.snapshot(SKU)["reserved"].values()) == 60
+
+    assert store.expire_reservations(ttl_hours=24) == 1
+    assert sum(store.snapshot(SKU)["reserved"].values()) == 0
+
+
+def test_unshipped_reservation_leaves_the_carbon_ledger(store):
+    kept = store.reserve_order(SKU, 10, reference="lead-7")
+    dropped = store.reserve_order(SKU, 10, reference="lead-7")
+    carbon.record_shipments([
+        {"shipment_ref": f"{r['reservation_id']}:NJ", "lead_id": 7, "customer": "MIT",
+         "origin_zip": "07001", "dest_zip": "02139", "weight_lbs": 5}
+        for r in (kept, dropped)
+    ])
+
+    store.fulfil(kept["reservation_id"])
+    store.release(dropped["reservation_id"])
+
+    assert [s["shipment_ref"] for s in carbon.shipments_for_lead(7)] == [f"{kept['reservation_id']}:NJ"]
+    assert carbon.report("customer")["total"]["shipments"] == 1
@@ -0,0 +1,98 @@
+"""
+Approval claims on pending_actions: one winner per approval, retries after a
+failed resume, and runs on a replaced thread leaving the rerun's row alone.
+
+Run from backend/:
+    python -m pytest tests/test_pending_actions.py
+"""
+import threading
+
+import pytest
+
+from services import pending_actions
+
+CALL = {"id": "call-1", "name": "save_logistics_plan", "args": {"plan_details": "NJ -> 10001", "total_cost": 120.0}}
+
+
+@pytest.fixture
+def waiting(db):
+    """A logistics run for lead 1 paused on thread "1" before its gated save."""
+    pending_actions.start("logistics", 1, "1")
+    pending_actions._upsert("logistics", 1, "1", pending_actions.WAITING, CALL)
+    return pending_actions.get("logistics", 1)
+
+
+def test_concurrent_claims_have_one_winner(waiting):
+    barrier = threading.Barrier(8)
+    results = []
+
+    def approve():
+        barrier.wait()
+        results.append(pending_actions.claim("logistics", 1, "1"))
+
+    threads = [threading.Thread(target=approve) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results.count(True) == 1
+    assert pending_actions.get("logistics", 1)["status"] == pending_actions.RUNNING
+
+
+def test_claim_needs_the_paused_thread(waiting):
+    assert not pending_actions.claim("logistics", 1, "other-thread")
+    assert pending_actions.claim("logistics", 1, "1")
+    assert not pending_actions.claim("logistics", 1, "1")
+
+
+def test_failed_resume_can_be_retried(waiting):
+    assert pending_actions.claim("logistics", 1, "1")
+    pending_actions.finish("logistics", 1, "1", "Error")    # What the runtime records when the resume fails...
+    pending_actions.reopen("logistics", 1, "1")             # ...before resume_agent hands the approval back
+
+    action = pending_actions.get("logistics", 1)
+    assert action["status"] == pending_actions.WAITING
+    assert action["outcome"] is None
+    assert action["tool_args"] == CALL["args"]
+
+    assert pending_actions.claim("logistics", 1, "1")
+    pending_actions.finish("logistics", 1, "1")
+    assert pending_actions.get("logistics", 1)["status"] == pending_actions.DONE
+    assert not pending_actions.claim("logistics", 1, "1")
+
+
+def test_reopen_ignores_a_newer_thread(waiting):
+    assert pending_actions.claim("logistics", 1, "1")
+    pending_actions.start("logistics", 1, "1_logistics_v2")    # Rejected: the rerun took over
+
+    pending_actions.reopen("logistics", 1, "1")
+
+    action = pending_actions.get("logistics", 1)
+    assert action["thread_id"] == "1_logistics_v2"
+    assert action["status"] == pending_actions.RUNNING
+
+
+def test_older_run_cannot_overwrite_the_rerun(waiting):
+    pending_actions.start("logistics", 1, "1_logistics_v2")
+
+    # The replaced run pauses again, then ends, after the rerun started
+    pending_actions._upsert("logistics", 1, "1", pending_actions.WAITING, CALL)
+    pending_actions.finish("logistics", 1, "1", "Timeout")
+
+    action = pending_actions.get("logistics", 1)
+    assert action["thread_id"] == "1_logistics_v2"
+    assert action["status"] == pending_actions.RUNNING
+    assert action["tool_name"] is None
+
+
+def test_run_that_stopped_early_is_failed(db):
+    pending_actions.start("logistics", 2, "2")
+    pending_actions.finish("logistics", 2, "2", "Over Budget")
+
+    action = pending_actions.get("logistics", 2)
+    assert action["status"] == pending_actions.FAILED
+    assert action["outcome"] == "Over Budget"
+    # Nothing was recorded for approval, so there is nothing to reopen
+    pending_actions.reopen("logistics", 2, "2")
+    assert pending_actions.get("logistics", 2)["status"] == pending_actions.FAILED
@@ -0,0 +1,101 @@
+"""
+Live carrier quotes (mcp_server.compare_carrier_rates) through QuoteCache,
+against the Shippo stand-in (stubs/shippo_server.py).
+
+The real fetch path runs with SHIPPO_API_URL pointed at the stub; the cache
+gets a fake clock, so TTL expiry is stepped instead of waited for.
+
+Run from backend/:
+    python -m pytest tests/test_rate_cache.py
+"""
+import importlib
+
+import pytest
+
+from services.rate_cache import QuoteCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(scope="module")
+def mcp_server(tmp_path_factory):
+    # Importing mcp_server builds an OpenAI client and opens ./chroma_db: keep both off the network and out of backend/
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("OPENAI_API_KEY", "sk-test")
+        mp.setenv("OPENAI_BASE_URL", "http://127.0.0.1:9/v1")
+        mp.chdir(tmp_path_factory.mktemp("mcp"))
+        yield importlib.import_module("mcp_server")
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def cache(mcp_server, shippo, shippo_url, monkeypatch, clock):
+    """A fresh cache in place of live_rate_cache, with live quotes from the stub."""
+    monkeypatch.setenv("SHIPPO_API_URL", shippo_url)
+    monkeypatch.setenv("SHIPPO_API_KEY", "shippo_test_stub")
+    cache = QuoteCache(ttl=60, stale_ttl=600, negative_ttl=30, clock=clock)
+    monkeypatch.setattr(mcp_server, "live_rate_cache", cache)
+    yield cache
+    cache._executor.shutdown(wait=True)
+
+
+def test_bucketed_requests_share_one_quote(mcp_server, shippo, cache):
+    first = mcp_server.compare_carrier_rates("07001", "10001", 3.2, 11, 10, 8)
+    assert first.source == "LIVE_API"
+    assert cache.stats["miss"] == 1
+
+    # Same origin, destination ZIP3, weight bucket (4 lb) and dimension bucket (12x10x8)
+    second = mcp_server.compare_carrier_rates("07001", "10016", 3.9, 9.5, 12, 7.5)
+    assert second.source == "LIVE_API"
+    assert second.rates == first.rates
+    assert cache.stats["hit"] == 1
+    assert shippo.stats["shipments"] == 1
+
+    # A heavier parcel falls in the next bucket and is quoted separately
+    mcp_server.compare_carrier_rates("07001", "10001", 4.1, 11, 10, 8)
+    assert cache.stats["miss"] == 2
+    assert shippo.stats["shipments"] == 2
+
+
+def test_stale_quote_is_served_while_refreshing(mcp_server, shippo, cache, clock):
+    first = mcp_server.compare_carrier_rates("07001", "94105", 12)
+
+    clock.now += 61
+    stale = mcp_server.compare_carrier_rates("07001", "94105", 12)
+    assert stale.source == "LIVE_API" and stale.rates == first.rates
+    assert cache.stats["stale"] == 1
+    cache._executor.shutdown(wait=True)    # Let the background refresh finish
+    assert cache.stats["refresh"] == 1
+    assert shippo.stats["shipments"] == 2
+
+    mcp_server.compare_carrier_rates("07001", "94105", 12)
+    assert cache.stats["hit"] == 1
+    assert shippo.stats["shipments"] == 2
+
+
+def test_api_error_is_negatively_cached_then_retried(mcp_server, shippo, cache, clock):
+    shippo.config["failure_rate"] = 1.0
+    assert mcp_server.compare_carrier_rates("07001", "60601", 2).source == "SIMULATED"
+    assert cache.stats["error"] == 1
+    assert shippo.stats["failures"] == 1
+
+    # Inside negative_ttl the outage is remembered; the stub is not called again
+    clock.now += 29
+    assert mcp_server.compare_carrier_rates("07001", "60601", 2).source == "SIMULATED"
+    assert cache.stats["negative"] == 1
+    assert shippo.stats["failures"] == 1
+
+    shippo.config["failure_rate"] = 0.0
+    clock.now += 2
+    assert mcp_server.compare_carrier_rates("07001", "60601", 2).source == "LIVE_API"
+    assert shippo.stats["shipments"] == 1
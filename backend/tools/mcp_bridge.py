@@ -1,4 +1,5 @@
 from langchain_core.tools import StructuredTool
+from services.tracing import traced
 # Import ALL functions from the unified server
 from mcp_server import (
     search_university_news, 
@@ -27,7 +28,9 @@ from mcp_server import (
     calculate_shipping_rates,
     optimize_split_shipment,
     check_weather_risk,     
+    check_weather_risk_batch,
     check_factory_load,     
+    check_all_factory_loads,
     save_logistics_plan,
     # New advanced logistics tools
     calculate_carbon_footprint,
@@ -35,41 +38,48 @@ from mcp_server import (
     get_demand_forecast  # NEW: Demand forecasting
 )
 
+
+def _tool(fn) -> StructuredTool:
+    """LangChain tool for an MCP function, run inside a "tool.<name>" span."""
+    return StructuredTool.from_function(traced(f"tool.{fn.__name__}", kind="tool")(fn))
+
 # Scout gets these (enhanced with 4 new tools)
 scout_tools = [
-    StructuredTool.from_function(search_university_news),
-    StructuredTool.from_function(analyze_visual_vibe),
-    StructuredTool.from_function(find_organization_socials),
-    StructuredTool.from_function(get_email_template),
-    StructuredTool.from_function(analyze_news_sentiment),
-    StructuredTool.from_function(check_existing_apparel),
-    StructuredTool.from_function(save_lead_strategy)
+    _tool(search_university_news),
+    _tool(analyze_visual_vibe),
+    _tool(find_organization_socials),
+    _tool(get_email_template),
+    _tool(analyze_news_sentiment),
+    _tool(check_existing_apparel),
+    _tool(save_lead_strategy)
 ]
 
 # Designer gets these (enhanced with 7 new tools)
 designer_tools = [
-    StructuredTool.from_function(generate_apparel_image),
-    StructuredTool.from_function(generate_design_variations),
-    StructuredTool.from_function(render_on_mockup),
-    StructuredTool.from_function(extract_color_palette),
-    StructuredTool.from_function(apply_style_reference),
-    StructuredTool.from_function(check_copyright_safety),
-    StructuredTool.from_function(calculate_manufacturing_cost),
-    StructuredTool.from_function(calculate_profitability),
-    StructuredTool.from_function(suggest_ab_test),
-    StructuredTool.from_function(recommend_print_technique),
-    StructuredTool.from_function(save_final_design)
+    _tool(generate_apparel_image),
+    _tool(generate_design_variations),
+    _tool(render_on_mockup),
+    _tool(extract_color_palette),
+    _tool(apply_style_reference),
+    _tool(check_copyright_safety),
+    _tool(calculate_manufacturing_cost),
+    _tool(calculate_profitability),
+    _tool(suggest_ab_test),
+    _tool(recommend_print_technique),
+    _tool(save_final_design)
 ]
 
 # Logistics Tools (Enhanced with carbon, live rates & forecasting)
 logistics_tools = [
-    StructuredTool.from_function(scrape_supplier_inventory),
-    StructuredTool.from_function(calculate_shipping_rates),
-    StructuredTool.from_function(optimize_split_shipment),
-    StructuredTool.from_function(check_weather_risk),
-    StructuredTool.from_function(check_factory_load),
-    StructuredTool.from_function(calculate_carbon_footprint),
-    StructuredTool.from_function(get_live_shipping_rates),
-    StructuredTool.from_function(get_demand_forecast),  # NEW
-    StructuredTool.from_function(save_logistics_plan)
+    _tool(scrape_supplier_inventory),
+    _tool(calculate_shipping_rates),
+    _tool(optimize_split_shipment),
+    _tool(check_weather_risk),
+    _tool(check_weather_risk_batch),
+    _tool(check_factory_load),
+    _tool(check_all_factory_loads),
+    _tool(calculate_carbon_footprint),
+    _tool(get_live_shipping_rates),
+    _tool(get_demand_forecast),  # NEW
+    _tool(save_logistics_plan)
 ]
\ No newline at end of file
@@ -82,9 +82,9 @@ export default function LogisticsPage() {
         if (inventoryLog) {
           const msg = inventoryLog.log_message;
           // Extract stock values from log
-          const njMatch = msg.match(/New Jersey \(NJ\)':\s*(\d+)/);
-          const txMatch = msg.match(/Texas \(TX\)':\s*(\d+)/);
-          const caMatch = msg.match(/California \(CA\)':\s*(\d+)/);
+          const njMatch = msg.match(/New Jersey \(NJ\)['"]:\s*(\d+)/);
+          const txMatch = msg.match(/Texas \(TX\)['"]:\s*(\d+)/);
+          const caMatch = msg.match(/California \(CA\)['"]:\s*(\d+)/);
 
           if (njMatch || txMatch || caMatch) {
             setWarehouses(prev => prev.map(wh => {
@@ -233,6 +233,10 @@ export default function LogisticsPage() {
         const res = await axios.get(`http://localhost:8000/logistics-pending-plan/${activeLeadId}`);
         if (res.data.status === "waiting_for_approval") {
           setPendingPlan(res.data);
+        } else if (res.data.status === "failed") {
+          // The run stopped without a plan: stop polling and re-enable Route Order
+          setActiveLeadId(null);
+          alert(`Logistics agent stopped: ${res.data.outcome}`);
         }
       } catch (e) {
         console.error("Poll error", e);
@@ -29,6 +29,9 @@ interface RouteData {
     }>;
 }
 
+// Payloads already fetched this session, keyed by ZIP (map data only changes with the warehouse list)
+const routeDataCache = new Map<string, RouteData>();
+
 export default function RouteMap({ customerZip }: { customerZip: string }) {
     const [routeData, setRouteData] = useState<RouteData | null>(null);
     const [loading, setLoading] = useState(false);
@@ -47,14 +50,23 @@ export default function RouteMap({ customerZip }: { customerZip: string }) {
 
     // Fetch route data when zip changes
     useEffect(() => {
-        if (!customerZip || customerZip.length < 5) return;
+        const zip = (customerZip || "").trim().slice(0, 5);
+        if (!/^\d{5}$/.test(zip)) return;
+
+        const cached = routeDataCache.get(zip);
+        if (cached) {
+            setRouteData(cached);
+            return;
+        }
 
         const fetchRouteData = async () => {
             setLoading(true);
             try {
-                const res = await axios.post("http://localhost:8000/logistics-route-data", {
-                    customer_zip: customerZip
+                // GET so the browser can revalidate with the ETag (304) instead of re-downloading
+                const res = await axios.get("http://localhost:8000/logistics-route-data", {
+                    params: { customer_zip: zip }
                 });
+                routeDataCache.set(zip, res.data);
                 setRouteData(res.data);
             } catch (e) {
                 console.error("Route data error:", e);